@@ -1,31 +1,77 @@
+from django.http import StreamingHttpResponse
 from ninja import Router
-from typing import List
+from typing import List, Optional
 from ninja.pagination import paginate, PageNumberPagination
 
-from .schemas import PayoutCreateSchema, PayoutUpdateSchema, PayoutResponseSchema
+from .schemas import (
+    PayoutCreateSchema,
+    PayoutUpdateSchema,
+    PayoutResponseSchema,
+    PayoutListItemSchema,
+    PayoutEventResponseSchema,
+    DeadLetterResponseSchema,
+    DeadLetterRequeueSchema,
+    DeadLetterRequeueResultSchema,
+    WebhookEndpointCreateSchema,
+    WebhookEndpointCreatedSchema,
+    WebhookEndpointResponseSchema,
+)
+from .models import Currency, Payout, Status
 from .services.payout_service import PayoutService
+from .services.dead_letter_service import DeadLetterService
+from .services.webhook_services import WebhookService
 
 router = Router(tags=["payouts-interface"])
+dead_letter_router = Router(tags=["payouts-dead-letters"])
+webhook_router = Router(tags=["payouts-webhooks"])
 
 
-@router.get("/", response=List[PayoutResponseSchema])
+@router.get("/", response=List[PayoutListItemSchema])
 @paginate(PageNumberPagination, page_size=10)
 def list_payouts(request):
-    """Список всех заявок"""
+    """Список всех заявок (без реквизитов получателя - они в ответе по ID)"""
     return PayoutService.get_list_payouts()
 
 
+@router.get("/stream/")
+async def stream_payouts(request, status: Optional[Status] = None, currency: Optional[Currency] = None):
+    """Поток смены статусов выплат (SSE) с фильтром по статусу и валюте"""
+    return _event_stream(PayoutService.stream_statuses(status=status, currency=currency))
+
+
+@router.get("/{payout_id}/stream/")
+async def stream_payout(request, payout_id: str):
+    """Поток статусов одной выплаты (SSE) до итогового статуса"""
+    payout = await Payout.objects.for_payout(payout_id).aget_by_id(payout_id)
+    return _event_stream(PayoutService.stream_statuses(payout=payout))
+
+
+def _event_stream(events):
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Отключает буферизацию ответа в nginx
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @router.get("/{payout_id}/", response=PayoutResponseSchema)
 def get_payout(request, payout_id: str):
     """Получение заявки по ID"""
     return PayoutService.get_payout(payout_id=payout_id)
 
 
+@router.get("/{payout_id}/history/", response=List[PayoutEventResponseSchema])
+@paginate(PageNumberPagination, page_size=50)
+def get_payout_history(request, payout_id: str):
+    """История статусов заявки"""
+    return PayoutService.get_payout_history(payout_id=payout_id)
+
+
 @router.post("/", response=PayoutResponseSchema)
 def create_payout(request, payload: PayoutCreateSchema):
     """Создание заявки"""
     payout = PayoutService.create_payout(payload=payload)
-    PayoutService.execute_payout(str(payout.id))
+    PayoutService.execute_payout(str(payout.id), amount=payout.amount, currency=payout.currency)
     return payout
 
 
@@ -38,4 +84,50 @@ def update_payout(request, payout_id: str, payload: PayoutUpdateSchema):
 @router.delete("/{payout_id}/")
 def delete_payout(request, payout_id: str):
     """Удаление заявки"""
-    return PayoutService.delete_payout(payout_id=payout_id)
\ No newline at end of file
+    return PayoutService.delete_payout(payout_id=payout_id)
+
+
+@dead_letter_router.get("/", response=List[DeadLetterResponseSchema])
+@paginate(PageNumberPagination, page_size=50)
+def list_dead_letters(request, error_class: Optional[str] = None, include_requeued: bool = False):
+    """Список выплат, исчерпавших попытки обработки"""
+    return DeadLetterService.get_list_dead_letters(error_class=error_class, include_requeued=include_requeued)
+
+
+@dead_letter_router.get("/{int:dead_letter_id}/", response=DeadLetterResponseSchema)
+def get_dead_letter(request, dead_letter_id: int):
+    """Запись dead letter с историей ошибок"""
+    return DeadLetterService.get_dead_letter(dead_letter_id=dead_letter_id)
+
+
+@dead_letter_router.post("/requeue/", response=DeadLetterRequeueResultSchema)
+def requeue_dead_letters(request, payload: DeadLetterRequeueSchema):
+    """Массовая повторная постановка в обработку"""
+    ids = DeadLetterService.requeue(ids=payload.ids, error_class=payload.error_class, limit=payload.limit)
+    return {"requeued": len(ids), "ids": ids}
+
+
+@webhook_router.get("/", response=List[WebhookEndpointResponseSchema])
+@paginate(PageNumberPagination, page_size=50)
+def list_webhooks(request):
+    """Список подписок на уведомления"""
+    return WebhookService.get_list_endpoints()
+
+
+@webhook_router.post("/", response=WebhookEndpointCreatedSchema)
+def create_webhook(request, payload: WebhookEndpointCreateSchema):
+    """Регистрация получателя уведомлений о смене статуса выплат"""
+    return WebhookService.create_endpoint(url=str(payload.url), event_types=payload.event_types,
+                                          secret=payload.secret)
+
+
+@webhook_router.get("/{int:endpoint_id}/", response=WebhookEndpointResponseSchema)
+def get_webhook(request, endpoint_id: int):
+    """Подписка по ID с состоянием доставки"""
+    return WebhookService.get_endpoint(endpoint_id=endpoint_id)
+
+
+@webhook_router.delete("/{int:endpoint_id}/")
+def delete_webhook(request, endpoint_id: int):
+    """Отключение подписки"""
+    return WebhookService.delete_endpoint(endpoint_id=endpoint_id)
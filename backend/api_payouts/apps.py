@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api_payouts'
+
+    def ready(self):
+        from backend import db_pool  # noqa: F401 - метрики соединений и пулов БД
+        from .services.micro_cache_service import MicroCacheService
+        from .services.status_stream_service import PayoutStatusPublisher
+        from .services.webhook_services import WebhookService
+        from .signals import payout_status_changed
+
+        payout_status_changed.connect(
+            PayoutStatusPublisher.on_status_changed, dispatch_uid='payout_status_publisher'
+        )
+        payout_status_changed.connect(WebhookService.on_status_changed, dispatch_uid='webhook_events')
+        payout_status_changed.connect(MicroCacheService.on_status_changed, dispatch_uid='micro_cache')
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api_payouts.models import Payout, PayoutRecipient
+from backend.db_router import shard_aliases
+
+
+class Command(BaseCommand):
+    help = (
+        'Перенос реквизитов из колонки recipient_details в PayoutRecipient '
+        '(пачками, каждая в своей транзакции; повторный запуск продолжает с оставшихся)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--database', action='append', dest='databases',
+                            help='Алиас БД (можно несколько); по умолчанию - все БД выплат')
+        parser.add_argument('--check', action='store_true',
+                            help='Только проверить: ошибка, если остались неперенесенные выплаты')
+
+    def handle(self, *args, **options):
+        databases = options['databases'] or shard_aliases()
+        if options['check']:
+            remaining = {alias: self.pending(alias).count() for alias in databases}
+            self.stdout.write(', '.join(f'{alias}: {count}' for alias, count in remaining.items()))
+            if any(remaining.values()):
+                raise CommandError('Не все реквизиты перенесены - колонку recipient_details удалять рано')
+            return
+
+        for alias in databases:
+            copied = self.backfill(alias, options['batch_size'])
+            self.stdout.write(f'{alias}: перенесено {copied}')
+
+    @staticmethod
+    def pending(alias: str):
+        """Выплаты с реквизитами в старой колонке и без записи PayoutRecipient"""
+        return Payout.objects.using(alias).filter(
+            recipient__isnull=True, legacy_recipient_details__isnull=False,
+        )
+
+    def backfill(self, alias: str, batch_size: int) -> int:
+        copied = 0
+        last_id = None
+        while True:
+            queryset = self.pending(alias).order_by('pk')
+            if last_id is not None:
+                queryset = queryset.filter(pk__gt=last_id)
+            rows = list(queryset.values_list('pk', 'legacy_recipient_details')[:batch_size])
+            if not rows:
+                return copied
+            # Короткая транзакция на пачку; запись, созданная параллельно новым кодом, не перезаписывается
+            with transaction.atomic(using=alias):
+                PayoutRecipient.objects.using(alias).bulk_create(
+                    [PayoutRecipient(payout_id=payout_id, details=details) for payout_id, details in rows],
+                    ignore_conflicts=True,
+                )
+            copied += len(rows)
+            last_id = rows[-1][0]
@@ -0,0 +1,86 @@
+import json
+import math
+import platform
+from contextlib import nullcontext
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api_payouts.models import Payout
+from benchmarks.api_load import build_endpoints, run_endpoint
+from benchmarks.fixtures import sample_payout_ids, seed_payouts
+from benchmarks.server import LocalServer
+
+
+class Command(BaseCommand):
+    help = 'Нагрузочный тест API выплат: p50/p95/p99 и запросы в секунду по эндпоинтам в JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoints', nargs='+', default=['list_payouts', 'get_payout', 'create_payout'])
+        parser.add_argument('--concurrency', type=int, default=16, help='Параллельных клиентов')
+        parser.add_argument('--duration', type=float, default=10.0, help='Длительность нагрузки на эндпоинт, сек')
+        parser.add_argument('--requests', type=int, default=None, help='Ограничение числа запросов на эндпоинт')
+        parser.add_argument('--warmup', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0, help='Минимум выплат в БД; недостающие будут созданы')
+        parser.add_argument('--server', choices=['wsgi', 'asgi', 'none'], default='wsgi',
+                            help='Запустить локальный gunicorn; none - нагружать --url')
+        parser.add_argument('--url', default=None, help='Адрес уже запущенного сервера')
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--threads', type=int, default=1)
+        parser.add_argument('--output', default=None, help='Файл для JSON-отчета (по умолчанию - stdout)')
+
+    def handle(self, *args, **options):
+        if options['server'] == 'none' and not options['url']:
+            raise CommandError('Для --server none нужен --url')
+
+        existing = Payout.objects.count()
+        if existing < options['seed']:
+            seed_payouts(options['seed'] - existing, seed=existing)
+        total = max(existing, options['seed'])
+
+        payout_ids = sample_payout_ids()
+        if not payout_ids:
+            raise CommandError('В БД нет выплат: запустите seed_payouts или передайте --seed')
+
+        endpoints = build_endpoints(payout_ids, max_page=max(1, min(100, math.ceil(total / 10))))
+        unknown = set(options['endpoints']) - set(endpoints)
+        if unknown:
+            raise CommandError(f"Неизвестные эндпоинты: {', '.join(sorted(unknown))}")
+
+        server = (
+            LocalServer(kind=options['server'], workers=options['workers'], threads=options['threads'])
+            if options['server'] != 'none' else nullcontext()
+        )
+        results = {}
+        with server:
+            base_url = options['url'] or server.url
+            for name in options['endpoints']:
+                self.stderr.write(f"Нагрузка на {name}...")
+                results[name] = run_endpoint(
+                    base_url,
+                    endpoints[name],
+                    concurrency=options['concurrency'],
+                    duration=options['duration'],
+                    requests=options['requests'],
+                    warmup=options['warmup'],
+                )
+
+        report = {
+            'meta': {
+                'server': options['server'],
+                'workers': options['workers'],
+                'threads': options['threads'],
+                'concurrency': options['concurrency'],
+                'database': connection.vendor,
+                'payouts': total,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+            },
+            'endpoints': results,
+        }
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        self.stdout.write(output)
@@ -0,0 +1,46 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.worker_load import POOLS, WorkerBenchmark
+
+
+class Command(BaseCommand):
+    help = 'Пропускная способность payout_task под пулами solo/prefork/threads/gevent/eventlet в JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1000, help='Выплат на прогон')
+        parser.add_argument('--pools', nargs='+', default=['solo', 'prefork', 'threads', 'gevent'])
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--broker', default='filesystem',
+                            help="URL брокера (redis://...) или 'filesystem' - транспорт без сервера")
+        parser.add_argument('--result-backend', default=None, help='URL бэкенда результатов')
+        parser.add_argument('--gateway-latency', type=float, default=0.0,
+                            help='Задержка заглушки платежной системы, сек (0 - SimulatedGatewayClient)')
+        parser.add_argument('--prefetch-multiplier', type=int, default=None,
+                            help='По умолчанию 1 для Redis и 64 для файлового транспорта')
+        parser.add_argument('--timeout', type=float, default=600.0)
+        parser.add_argument('--output', default=None, help='Файл для JSON-отчета (по умолчанию - stdout)')
+
+    def handle(self, *args, **options):
+        unknown = set(options['pools']) - set(POOLS)
+        if unknown:
+            raise CommandError(f"Неизвестные пулы: {', '.join(sorted(unknown))}")
+
+        benchmark = WorkerBenchmark(
+            broker=options['broker'],
+            result_backend=options['result_backend'],
+            gateway_latency=options['gateway_latency'],
+            prefetch_multiplier=options['prefetch_multiplier'],
+            timeout=options['timeout'],
+        )
+        results = []
+        for pool in options['pools']:
+            self.stderr.write(f"Пул {pool}, concurrency={options['concurrency']}...")
+            results.append(benchmark.run(pool, options['concurrency'], options['count']))
+
+        output = json.dumps({'broker': options['broker'], 'results': results}, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        self.stdout.write(output)
@@ -0,0 +1,50 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.import_time import TARGETS, measure_imports, summarize_imports
+
+
+class Command(BaseCommand):
+    help = 'Время импорта при холодном старте (python -X importtime): web, worker или settings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('target', nargs='?', choices=sorted(TARGETS), default='web')
+        parser.add_argument('--top', type=int, default=20, help='Сколько модулей и пакетов показать')
+        parser.add_argument('--repeat', type=int, default=3, help='Запусков; в отчет идет самый быстрый')
+        parser.add_argument('--max-ms', type=float, default=None,
+                            help='Ошибка, если суммарное время импорта больше порога')
+        parser.add_argument('--forbid', nargs='+', default=[],
+                            help='Пакеты, которые цель не должна импортировать (например, celery redis)')
+        parser.add_argument('--json', action='store_true', help='Отчет в JSON')
+
+    def handle(self, *args, **options):
+        reports = [
+            summarize_imports(measure_imports(options['target']), top=options['top'])
+            for _ in range(max(1, options['repeat']))
+        ]
+        report = min(reports, key=lambda item: item['total_ms'])
+        report['target'] = options['target']
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+        else:
+            self.write_text(report)
+
+        errors = []
+        forbidden = sorted(set(options['forbid']) & set(report['imported']))
+        if forbidden:
+            errors.append(f"импортированы пакеты {', '.join(forbidden)}")
+        if options['max_ms'] is not None and report['total_ms'] > options['max_ms']:
+            errors.append(f"импорт {report['total_ms']} мс больше порога {options['max_ms']} мс")
+        if errors:
+            raise CommandError(f"Цель {options['target']}: {'; '.join(errors)}")
+
+    def write_text(self, report):
+        self.stdout.write(f"{report['target']}: {report['total_ms']} мс, модулей {report['modules']}")
+        self.stdout.write('\nМодули верхнего уровня (суммарно, мс):')
+        for item in report['top_modules']:
+            self.stdout.write(f"  {item['cumulative_ms']:>8} {item['module']}")
+        self.stdout.write('\nПакеты (собственное время, мс):')
+        for item in report['top_packages']:
+            self.stdout.write(f"  {item['self_ms']:>8} {item['package']}")
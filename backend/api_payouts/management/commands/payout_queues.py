@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api_payouts.services.celery_services.payout_queue_router import PayoutPriority, PayoutQueueRouter
+
+
+class Command(BaseCommand):
+    help = 'Список очередей выплат через запятую (для celery worker -Q)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('priority', nargs='?', choices=PayoutPriority.ALL, help='Приоритет очередей')
+        parser.add_argument('--with-default', action='store_true', help='Добавить очередь celery по умолчанию')
+        parser.add_argument('--shard', type=int, default=None,
+                            help='Только очереди шарда (воркер шарда БД при PAYOUT_SHARDS)')
+
+    def handle(self, *args, **options):
+        queues = PayoutQueueRouter.get_queues(options['priority'], shard=options['shard'])
+        if options['with_default']:
+            queues = ['celery', *queues]
+        self.stdout.write(','.join(queues))
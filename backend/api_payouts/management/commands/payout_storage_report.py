@@ -0,0 +1,44 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api_payouts.models import Payout
+from benchmarks.fixtures import seed_payouts
+from benchmarks.payout_storage import padded_recipient_details, storage_report
+
+
+class Command(BaseCommand):
+    help = 'Смена статуса, список и выплата по ID: реквизиты в строке выплаты против отдельной таблицы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help='Минимум выплат в БД; недостающие будут созданы')
+        parser.add_argument('--details-bytes', type=int, default=0,
+                            help='Дополнительный размер реквизитов создаваемых выплат, байт (адрес, данные KYC)')
+        parser.add_argument('--samples', type=int, default=2000, help='Операций каждого вида на раскладку')
+        parser.add_argument('--page-size', type=int, default=10)
+        parser.add_argument('--max-page', type=int, default=100, help='Страницы списка выбираются из первых N')
+        parser.add_argument('--output', default=None, help='Файл для JSON-отчета (по умолчанию - stdout)')
+
+    def handle(self, *args, **options):
+        existing = Payout.objects.count()
+        if existing < options['seed']:
+            seed_payouts(options['seed'] - existing, seed=existing,
+                         recipient_details=padded_recipient_details(options['details_bytes']))
+
+        report = storage_report(samples=options['samples'], page_size=options['page_size'],
+                                max_page=options['max_page'])
+        if not report:
+            raise CommandError('В БД нет выплат: запустите seed_payouts или передайте --seed')
+
+        report['meta'] = {
+            'database': connection.vendor,
+            'payouts': max(existing, options['seed']),
+            'details_bytes': options['details_bytes'],
+            'samples': options['samples'],
+        }
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        self.stdout.write(output)
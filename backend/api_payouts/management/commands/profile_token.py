@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from backend.profiling import MODES, make_token
+
+
+class Command(BaseCommand):
+    help = 'Подписанный токен для заголовка профилирования запроса (PROFILING["HEADER"])'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=MODES, default='cprofile',
+                            help='cprofile - .prof (pstats), sampling - .speedscope.json')
+
+    def handle(self, *args, **options):
+        self.stdout.write(make_token(options['mode']))
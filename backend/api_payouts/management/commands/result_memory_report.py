@@ -0,0 +1,41 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from benchmarks.result_memory import format_ratio, memory_report
+
+
+class Command(BaseCommand):
+    help = 'Память Redis под результаты payout_task на выплату и на миллион выплат: verbose против compact'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-ttl', type=int, default=24 * 3600, help='TTL результатов verbose, сек')
+        parser.add_argument('--compact-ttl', type=int, default=600, help='TTL результатов compact, сек')
+        parser.add_argument('--rate', type=float, default=100.0,
+                            help='Выплат в секунду для оценки памяти в установившемся режиме')
+        parser.add_argument('--redis', default=None,
+                            help='URL Redis для замера MEMORY USAGE (например, redis://localhost:6379/15); '
+                                 'без него - оценка по размеру значения')
+        parser.add_argument('--samples', type=int, default=1000, help='Ключей для замера в Redis')
+
+    def handle(self, *args, **options):
+        redis_client = None
+        if options['redis']:
+            import redis
+
+            redis_client = redis.Redis.from_url(options['redis'])
+
+        report = memory_report(
+            {'verbose': options['verbose_ttl'], 'compact': options['compact_ttl']},
+            rate=options['rate'],
+            redis_client=redis_client,
+            samples=options['samples'],
+        )
+        report['meta'] = {
+            'rate_per_second': options['rate'],
+            'verbose_to_compact': {
+                'bytes_written': format_ratio(report, 'bytes_written_per_payout'),
+                'memory': format_ratio(report, 'key_bytes'),
+            },
+        }
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from api_payouts.services.gateway_services.stub_gateway_server import StubGatewayServer
+
+
+class Command(BaseCommand):
+    help = 'Запуск локальной заглушки платежной системы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8090)
+        parser.add_argument('--latency', type=float, default=0.0, help='Задержка ответа, сек')
+        parser.add_argument('--reject-rate', type=float, default=0.0, help='Доля отклоняемых выплат')
+
+    def handle(self, *args, **options):
+        server = StubGatewayServer(
+            host=options['host'],
+            port=options['port'],
+            latency=options['latency'],
+            reject_rate=options['reject_rate'],
+        )
+        self.stdout.write(f"Заглушка платежной системы: {server.url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f"Соединений: {server.connections}, запросов: {server.requests}")
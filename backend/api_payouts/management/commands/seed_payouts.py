@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from api_payouts.models import Payout
+from benchmarks.fixtures import seed_payouts
+
+
+class Command(BaseCommand):
+    help = 'Наполнение БД выплатами для нагрузочного теста (запускать с --settings=benchmarks.settings)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('count', type=int, help='Количество выплат')
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--seed', type=int, default=0, help='Seed генератора случайных данных')
+        parser.add_argument('--truncate', action='store_true', help='Удалить существующие выплаты')
+
+    def handle(self, *args, **options):
+        if options['truncate']:
+            Payout.objects.all().delete()
+
+        elapsed = seed_payouts(options['count'], batch_size=options['batch_size'], seed=options['seed'])
+        self.stdout.write(
+            f"Создано {options['count']} выплат за {elapsed:.1f} с, всего в таблице: {Payout.objects.count()}"
+        )
@@ -0,0 +1,25 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from benchmarks.serialization import FORMATS, serialization_report
+
+
+class Command(BaseCommand):
+    help = 'Байты в брокере и время кодирования/декодирования задачи выплаты: json против msgpack и сжатия'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formats', nargs='+', default=list(FORMATS),
+                            help='Форматы <serializer>[+<compression>], например msgpack+zlib json+lzma')
+        parser.add_argument('--iterations', type=int, default=5000, help='Повторов для замера времени')
+        parser.add_argument('--retries', type=int, default=3, help='Записей в истории ошибок для сценария retry')
+        parser.add_argument('--no-results', action='store_true', help='Не замерять размер результатов задачи')
+
+    def handle(self, *args, **options):
+        report = serialization_report(
+            formats=options['formats'],
+            iterations=options['iterations'],
+            retries=options['retries'],
+            include_results=not options['no_results'],
+        )
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
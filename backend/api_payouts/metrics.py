@@ -0,0 +1,101 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+QUEUE_WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900)
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+PAYOUT_QUEUE_WAIT_SECONDS = Histogram(
+    'payout_queue_wait_seconds',
+    'Время ожидания задачи выплаты в очереди брокера',
+    ['queue'],
+    buckets=QUEUE_WAIT_BUCKETS,
+)
+
+PAYOUT_RATE_LIMIT_DECISIONS = Counter(
+    'payout_rate_limit_decisions_total',
+    'Запросы токенов rate limiter по корзинам',
+    ['bucket', 'result'],
+)
+
+PAYOUT_RATE_LIMIT_TOKENS = Gauge(
+    'payout_rate_limit_tokens',
+    'Остаток токенов в корзине после последнего запроса',
+    ['bucket'],
+    multiprocess_mode='livemin',
+)
+
+PAYOUT_RATE_LIMIT_UTILIZATION = Gauge(
+    'payout_rate_limit_utilization',
+    'Заполненность корзины rate limiter (0 - свободна, 1 - исчерпана)',
+    ['bucket'],
+    multiprocess_mode='livemax',
+)
+
+PAYOUT_SWEEPER_PAYOUTS = Counter(
+    'payout_sweeper_payouts_total',
+    'Зависшие выплаты, обработанные периодической задачей',
+    ['status', 'action'],
+)
+
+PAYOUT_TASK_SECONDS = Histogram(
+    'payout_task_duration_seconds',
+    'Длительность выполнения задач воркера',
+    ['task', 'state'],
+    buckets=STAGE_BUCKETS + (30, 60),
+)
+
+PAYOUT_TASK_RETRIES = Counter(
+    'payout_task_retries_total',
+    'Повторы задач по классам ошибок',
+    ['task', 'error_class'],
+)
+
+PAYOUT_DEAD_LETTERS = Counter(
+    'payout_dead_letters_total',
+    'Выплаты, перенесенные в dead letter',
+    ['error_class'],
+)
+
+# Замеры этапов копятся по корзинам в процессе (stage_timer) и выгружаются периодически
+PAYOUT_STAGE_SECONDS = Histogram(
+    'payout_stage_duration_seconds',
+    'Длительность этапов обработки выплаты',
+    ['stage'],
+    buckets=STAGE_BUCKETS,
+)
+
+PAYOUT_END_TO_END_SECONDS = Histogram(
+    'payout_end_to_end_seconds',
+    'Время от создания заявки до завершения выплаты',
+    ['currency'],
+    buckets=QUEUE_WAIT_BUCKETS + (1800, 3600),
+)
+
+PAYOUT_STATUS_EVENTS = Counter(
+    'payout_status_events_total',
+    'События смены статуса, опубликованные в Redis pub/sub',
+    ['result'],
+)
+
+PAYOUT_STATUS_SUBSCRIBERS = Gauge(
+    'payout_status_subscribers',
+    'Открытые подписки на поток статусов выплат (SSE)',
+    multiprocess_mode='livesum',
+)
+
+WEBHOOK_DELIVERIES = Counter(
+    'webhook_deliveries_total',
+    'События webhook по результату доставки',
+    ['result'],
+)
+
+WEBHOOK_DELIVERY_SECONDS = Histogram(
+    'webhook_delivery_seconds',
+    'Время отправки пачки событий получателю webhook',
+    buckets=STAGE_BUCKETS,
+)
+
+MICRO_CACHE_REFRESHES = Counter(
+    'micro_cache_refreshes_total',
+    'Обновления микрокэша nginx после изменения выплаты',
+    ['result'],
+)
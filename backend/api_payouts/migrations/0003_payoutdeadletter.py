@@ -0,0 +1,34 @@
+# Generated by Django 5.2.10 on 2026-10-19 06:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_payouts', '0002_rename_api_app_pay_status_6c6838_idx_api_payouts_status_f5fe30_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayoutDeadLetter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.CharField(blank=True, default='', max_length=255, verbose_name='ID задачи')),
+                ('error_class', models.CharField(max_length=100, verbose_name='Класс ошибки')),
+                ('error_message', models.TextField(blank=True, default='', verbose_name='Текст ошибки')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Количество попыток')),
+                ('history', models.JSONField(default=list, verbose_name='История ошибок')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('requeued_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата повторной постановки')),
+                ('payout', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dead_letters', to='api_payouts.payout', verbose_name='Выплата')),
+            ],
+            options={
+                'verbose_name': 'Необработанная выплата',
+                'verbose_name_plural': 'Необработанные выплаты',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['requeued_at', 'created_at'], name='api_payouts_requeue_706ecf_idx'), models.Index(fields=['error_class'], name='api_payouts_error_c_36c7b9_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.10 on 2026-10-19 06:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_payouts', '0003_payoutdeadletter'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payout',
+            index=models.Index(fields=['status', 'updated_at'], name='api_payouts_status_555352_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.10 on 2026-10-19 07:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_payouts', '0004_payout_status_updated_at_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookEndpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(max_length=500, verbose_name='URL получателя')),
+                ('secret', models.CharField(max_length=64, verbose_name='Секрет подписи')),
+                ('event_types', models.JSONField(default=list, verbose_name='Статусы для уведомления')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Активна')),
+                ('failure_count', models.PositiveIntegerField(default=0, verbose_name='Неудачных доставок подряд')),
+                ('next_attempt_at', models.DateTimeField(blank=True, null=True, verbose_name='Следующая попытка доставки')),
+                ('locked_until', models.DateTimeField(blank=True, null=True, verbose_name='Доставка выполняется до')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='Последняя ошибка доставки')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+            ],
+            options={
+                'verbose_name': 'Webhook',
+                'verbose_name_plural': 'Webhooks',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='WebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Ожидание'), ('processing', 'В обработке'), ('completed', 'Выплачено'), ('failed', 'Ошибка'), ('cancelled', 'Отменено')], max_length=20, verbose_name='Статус выплаты')),
+                ('payload', models.JSONField(verbose_name='Данные события')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Попыток доставки')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('delivered_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата доставки')),
+                ('failed_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата отказа от доставки')),
+                ('endpoint', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='api_payouts.webhookendpoint', verbose_name='Webhook')),
+                ('payout', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='webhook_events', to='api_payouts.payout', verbose_name='Выплата')),
+            ],
+            options={
+                'verbose_name': 'Событие webhook',
+                'verbose_name_plural': 'События webhook',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['endpoint', 'delivered_at', 'failed_at', 'id'], name='api_payouts_endpoin_5567c3_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.10 on 2026-10-19 07:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_payouts', '0005_webhooks'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payoutdeadletter',
+            name='payout',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='dead_letters', to='api_payouts.payout', verbose_name='Выплата'),
+        ),
+        migrations.AlterField(
+            model_name='webhookevent',
+            name='payout',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='webhook_events', to='api_payouts.payout', verbose_name='Выплата'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.10 on 2026-10-19 07:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_payouts', '0006_payout_relations_across_shards'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayoutEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(choices=[('pending', 'Ожидание'), ('processing', 'В обработке'), ('completed', 'Выплачено'), ('failed', 'Ошибка'), ('cancelled', 'Отменено')], max_length=20, verbose_name='Предыдущий статус')),
+                ('to_status', models.CharField(choices=[('pending', 'Ожидание'), ('processing', 'В обработке'), ('completed', 'Выплачено'), ('failed', 'Ошибка'), ('cancelled', 'Отменено')], max_length=20, verbose_name='Новый статус')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Текст ошибки')),
+                ('attempt', models.PositiveIntegerField(blank=True, null=True, verbose_name='Номер попытки обработки')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата перехода')),
+                ('payout', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='api_payouts.payout', verbose_name='Выплата')),
+            ],
+            options={
+                'verbose_name': 'Переход статуса выплаты',
+                'verbose_name_plural': 'История статусов выплат',
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['payout', 'created_at'], name='api_payouts_payout__b88e98_idx')],
+            },
+        ),
+    ]
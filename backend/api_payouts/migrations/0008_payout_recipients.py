@@ -0,0 +1,52 @@
+# Generated by Django 5.2.10 on 2026-10-19 08:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Расширение (expand): таблица реквизитов и колонка recipient_details, допускающая NULL.
+# Колонка остается - код пишет реквизиты в обе таблицы, пока ее читают экземпляры
+# предыдущей версии. Перенос данных - команда backfill_payout_recipients вне миграции,
+# удаление колонки (contract) - отдельной миграцией следующего релиза
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_payouts', '0007_payout_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayoutRecipient',
+            fields=[
+                ('payout', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recipient', serialize=False, to='api_payouts.payout', verbose_name='Выплата')),
+                ('details', models.JSONField(verbose_name='Реквизиты получателя')),
+            ],
+            options={
+                'verbose_name': 'Реквизиты получателя',
+                'verbose_name_plural': 'Реквизиты получателей',
+            },
+        ),
+        # Имя поля в модели занято свойством recipient_details - колонка та же, поле переименовано
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.AlterField(
+                    model_name='payout',
+                    name='recipient_details',
+                    field=models.JSONField(blank=True, null=True, verbose_name='Реквизиты получателя'),
+                ),
+            ],
+            state_operations=[
+                migrations.RenameField(
+                    model_name='payout',
+                    old_name='recipient_details',
+                    new_name='legacy_recipient_details',
+                ),
+                migrations.AlterField(
+                    model_name='payout',
+                    name='legacy_recipient_details',
+                    field=models.JSONField(blank=True, db_column='recipient_details', editable=False, null=True, verbose_name='Реквизиты получателя (до переноса)'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.10 on 2026-10-19 08:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_payouts', '0008_payout_recipients'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payout',
+            name='dispatched_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Дата постановки задачи'),
+        ),
+        migrations.AddField(
+            model_name='payout',
+            name='task_id',
+            field=models.CharField(blank=True, default='', max_length=36, verbose_name='ID задачи обработки'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.10 on 2026-10-19 08:18
+
+import backend.db_router
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_payouts', '0009_payout_dispatch'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payout',
+            name='id',
+            field=models.UUIDField(default=backend.db_router.new_payout_id, editable=False, primary_key=True, serialize=False, verbose_name='Идентификатор'),
+        ),
+    ]
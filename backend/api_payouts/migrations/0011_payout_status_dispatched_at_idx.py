@@ -0,0 +1,17 @@
+# Generated by Django 5.2.10 on 2026-10-19 08:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_payouts', '0010_payout_id_shard'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payout',
+            index=models.Index(fields=['status', 'dispatched_at', 'updated_at'], name='api_payouts_status_a26dd5_idx'),
+        ),
+    ]
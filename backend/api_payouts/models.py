@@ -1,9 +1,17 @@
 import logging
+from collections import defaultdict
+from typing import Dict, Optional
 
-from django.db import models
-from uuid import uuid4
+from django.db import DEFAULT_DB_ALIAS, models, router, transaction
+from django.db.models import Q
 
-from django.shortcuts import get_object_or_404
+from django.http import Http404
+from django.shortcuts import aget_object_or_404, get_object_or_404
+from django.utils import timezone
+
+from backend.db_router import ShardedQuerySet, get_replicas, get_shards, new_payout_id, shard_for
+
+from .signals import payout_status_changed
 
 logger = logging.getLogger(__name__)
 
@@ -22,24 +30,110 @@ class Currency(models.TextChoices):
 class PayoutQuerySet(models.QuerySet):
 
     def get_by_id(self, payout_id: str) -> 'Payout':
-        return get_object_or_404(self, id=payout_id)
+        """
+        Выплата по ID или 404
+
+        Реплика может еще не получить только что созданную выплату: если
+        чтение ушло на реплику и выплаты там нет, запрос повторяется на
+        основной БД - read-your-writes не зависит от cookie прилипания.
+        """
+        alias = self.db
+        try:
+            return self.using(alias).get(id=payout_id)
+        except self.model.DoesNotExist:
+            if alias not in get_replicas():
+                raise Http404(f"Выплата {payout_id} не найдена")
+        return get_object_or_404(self.using(DEFAULT_DB_ALIAS), id=payout_id)
+
+    async def aget_by_id(self, payout_id: str) -> 'Payout':
+        """Асинхронный get_by_id с тем же повтором на основной БД"""
+        alias = self.db
+        try:
+            return await self.using(alias).aget(id=payout_id)
+        except self.model.DoesNotExist:
+            if alias not in get_replicas():
+                raise Http404(f"Выплата {payout_id} не найдена")
+        return await aget_object_or_404(self.using(DEFAULT_DB_ALIAS), id=payout_id)
+
+    def create(self, **kwargs) -> 'Payout':
+        # Без явной БД выплата пишется в свой шард: ID нужен до вставки
+        if self._db is None and get_shards():
+            kwargs.setdefault('id', new_payout_id())
+            return self.using(shard_for(kwargs['id'])).create(**kwargs)
+        return super().create(**kwargs)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        if self._db is None and get_shards():
+            # Без явной БД - вставка пачками в шарды выплат
+            by_shard = defaultdict(list)
+            for payout in objs:
+                by_shard[shard_for(payout.pk)].append(payout)
+            for alias, payouts in by_shard.items():
+                self.using(alias).bulk_create(payouts, *args, **kwargs)
+            return objs
+
+        for payout in objs:
+            payout.copy_recipient_to_legacy()
+        super().bulk_create(objs, *args, **kwargs)
+        # Реквизиты - отдельной пачкой в ту же БД (save() при bulk_create не вызывается)
+        recipients = [payout.take_recipient() for payout in objs if payout.has_pending_recipient()]
+        if recipients:
+            PayoutRecipient.objects.using(self.db).bulk_create(recipients, batch_size=kwargs.get('batch_size'))
+        return objs
 
 
 class PayoutManager(models.Manager):
+    """
+    Менеджер выплат с учетом шардов
+
+    Запросы по ID идут в шард выплаты (for_payout), список - во все шарды
+    со слиянием по дате создания (list_payouts).
+    """
 
     def get_queryset(self):
         return PayoutQuerySet(self.model, using=self._db)
 
-
-    def get_payout(self, payout_id: str) -> 'Payout':
-        return self.get_queryset().get_by_id(payout_id)
+    def for_payout(self, payout_id) -> PayoutQuerySet:
+        """Выборка из БД, которой принадлежит выплата (без шардирования - как решат роутеры, с репликами)"""
+        if not get_shards():
+            return self.get_queryset()
+        return self.get_queryset().using(shard_for(payout_id))
+
+    def list_payouts(self):
+        """Все выплаты, новые первыми; при шардировании - слияние выборок шардов"""
+        ordering = ('-created_at', '-id')
+        if not get_shards():
+            return self.get_queryset().order_by(*ordering)
+        return ShardedQuerySet(self.get_queryset(), get_shards(), ordering)
+
+    def in_shards(self, payout_ids) -> Dict:
+        """Выплаты по ID ({id: выплата}) - по запросу на шард"""
+        by_shard = defaultdict(list)
+        for payout_id in payout_ids:
+            by_shard[shard_for(payout_id)].append(payout_id)
+        payouts = {}
+        for ids in by_shard.values():
+            payouts.update(self.for_payout(ids[0]).in_bulk(ids))
+        return payouts
+
+    def get_payout(self, payout_id: str, with_recipient: bool = False) -> 'Payout':
+        """Выплата по ID; with_recipient - реквизиты получателя тем же запросом (JOIN)"""
+        queryset = self.for_payout(payout_id)
+        if with_recipient:
+            queryset = queryset.select_related('recipient')
+        return queryset.get_by_id(payout_id)
+
+    def record_dispatch(self, payout_id: str, task_id: str) -> None:
+        """Запомнить поставленную задачу обработки: по ней поиск зависших отличает живую задачу"""
+        self.for_payout(payout_id).filter(pk=payout_id).update(task_id=task_id, dispatched_at=timezone.now())
 
     def create_payout(self, **kwargs) -> 'Payout':
         kwargs.setdefault('status', Status.PENDING)
         return self.create(**kwargs)
 
     def update_payout(self, payout_id: str, **kwargs) -> 'Payout':
-        payout = self.get_queryset().get_by_id(payout_id)
+        payout = self.get_payout(payout_id)
         for key, value in kwargs.items():
             if hasattr(payout, key):
                 setattr(payout, key, value)
@@ -47,14 +141,18 @@ class PayoutManager(models.Manager):
         return payout
 
     def delete_payout(self, payout_id: str) -> None:
-        payout = self.get_queryset().get_by_id(payout_id)
+        payout = self.get_payout(payout_id)
+        if payout._state.db != DEFAULT_DB_ALIAS:
+            # Связанные записи в default: каскад удаления работает только внутри одной БД
+            payout.dead_letters.all().delete()
+            payout.webhook_events.all().delete()
         payout.delete()
 
 class Payout(models.Model):
 
     id = models.UUIDField(
         primary_key=True,
-        default=uuid4,
+        default=new_payout_id,
         editable=False,
         verbose_name='Идентификатор'
     )
@@ -72,10 +170,6 @@ class Payout(models.Model):
         verbose_name='Валюта'
     )
 
-    recipient_details = models.JSONField(
-        verbose_name='Реквизиты получателя'
-    )
-
     status = models.CharField(
         max_length=20,
         choices=Status.choices,
@@ -99,6 +193,29 @@ class Payout(models.Model):
         verbose_name='Дата обновления'
     )
 
+    task_id = models.CharField(
+        max_length=36,
+        blank=True,
+        default='',
+        verbose_name='ID задачи обработки'
+    )
+
+    dispatched_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Дата постановки задачи'
+    )
+
+    # Колонка реквизитов до переноса в PayoutRecipient: пишется вместе с ней, пока
+    # колонку читают экземпляры предыдущей версии; удаляется миграцией следующего релиза
+    legacy_recipient_details = models.JSONField(
+        blank=True,
+        null=True,
+        editable=False,
+        db_column='recipient_details',
+        verbose_name='Реквизиты получателя (до переноса)'
+    )
+
     objects = PayoutManager()
 
     class Meta:
@@ -108,34 +225,150 @@ class Payout(models.Model):
         indexes = [
             models.Index(fields=['status']),
             models.Index(fields=['created_at']),
+            # Поиск зависших выплат: диапазон по updated_at внутри статуса
+            models.Index(fields=['status', 'updated_at']),
+            # Повторная постановка pending: отдельные диапазоны без постановки и с истекшей постановкой
+            models.Index(fields=['status', 'dispatched_at', 'updated_at']),
         ]
 
-    def mark_as_pending(self) -> None:
+    # Реквизиты, переданные в конструктор или присвоенные, до сохранения в PayoutRecipient
+    _pending_recipient_details = None
+
+    @property
+    def recipient_details(self):
+        """
+        Реквизиты получателя из PayoutRecipient - запрос при первом обращении
+
+        Выплата, созданная предыдущей версией и еще не перенесенная
+        (backfill_payout_recipients), читается из старой колонки.
+        """
+        if self._pending_recipient_details is not None:
+            return self._pending_recipient_details
+        try:
+            return self.recipient.details
+        except PayoutRecipient.DoesNotExist:
+            return self.legacy_recipient_details
+
+    @recipient_details.setter
+    def recipient_details(self, value) -> None:
+        self._pending_recipient_details = value
+
+    def has_pending_recipient(self) -> bool:
+        return self._pending_recipient_details is not None
+
+    def copy_recipient_to_legacy(self) -> None:
+        """Двойная запись: новые реквизиты - и в старую колонку строки выплаты"""
+        if self.has_pending_recipient():
+            self.legacy_recipient_details = self._pending_recipient_details
+
+    def take_recipient(self) -> 'PayoutRecipient':
+        """Запись реквизитов для вставки; выплата запоминает ее как загруженную"""
+        recipient = PayoutRecipient(payout=self, details=self._pending_recipient_details)
+        self._pending_recipient_details = None
+        return recipient
+
+    def save(self, *args, **kwargs):
+        """Сохранить выплату; новые реквизиты - в PayoutRecipient в той же транзакции"""
+        if not self.has_pending_recipient() or kwargs.get('update_fields') is not None:
+            return super().save(*args, **kwargs)
+
+        using = kwargs.pop('using', None) or router.db_for_write(type(self), instance=self)
+        adding = self._state.adding
+        with transaction.atomic(using=using, savepoint=False):
+            self.copy_recipient_to_legacy()
+            super().save(*args, using=using, **kwargs)
+            recipient = self.take_recipient()
+            if adding or not PayoutRecipient.objects.using(using).filter(payout_id=self.pk).update(
+                    details=recipient.details):
+                recipient.save(using=using, force_insert=True)
+
+    def mark_as_pending(self, attempt: Optional[int] = None) -> None:
+        """Отметить как ожидающую"""
+        self._change_status(Status.PENDING, attempt=attempt)
+
+    def mark_as_processing(self, attempt: Optional[int] = None) -> None:
         """Отметить как обрабатываемую"""
-        self.status = Status.PENDING
-        self.save(update_fields=['status', 'updated_at'])
+        self._change_status(Status.PROCESSING, attempt=attempt)
 
-    def mark_as_processing(self) -> None:
-        """Отметить как обрабатываемую"""
-        self.status = Status.PROCESSING
-        self.save(update_fields=['status', 'updated_at'])
-
-    def mark_as_completed(self) -> None:
+    def mark_as_completed(self, attempt: Optional[int] = None) -> None:
         """Отметить как завершенную"""
-        self.status = Status.COMPLETED
-        self.save(update_fields=['status', 'updated_at'])
+        self._change_status(Status.COMPLETED, attempt=attempt)
 
-    def mark_as_failed(self, error_message: str = None) -> None:
-        """Отметить как неудачную"""
-        self.status = Status.FAILED
-        if error_message:
-            self.description += f'\n {error_message}'
-        self.save(update_fields=['status', 'description', 'updated_at'])
+    def mark_as_failed(self, error_message: str = None, attempt: Optional[int] = None) -> None:
+        """Отметить как неудачную; текст ошибки - в истории статусов"""
+        self._change_status(Status.FAILED, error=str(error_message or ''), attempt=attempt)
 
     def mark_as_cancelled(self) -> None:
         """Отметить как отмененную"""
-        self.status = Status.CANCELLED
-        self.save(update_fields=['status', 'updated_at'])
+        self._change_status(Status.CANCELLED)
+
+    def claim_for_processing(self, task_id: str = '', attempt: Optional[int] = None) -> bool:
+        """
+        Захватить выплату для обработки задачей task_id
+
+        Условный UPDATE pending/failed -> processing (или повторная доставка
+        той же задачи) должен изменить ровно одну строку; иначе выплату уже
+        обрабатывает или завершила другая задача - статус перечитывается, False.
+        """
+        claimable = Q(status__in=[Status.PENDING, Status.FAILED])
+        if task_id:
+            claimable |= Q(status=Status.PROCESSING, task_id=task_id)
+
+        from_status = self.status
+        now = timezone.now()
+        with transaction.atomic(using=self._state.db, savepoint=False):
+            claimed = Payout.objects.using(self._state.db).filter(claimable, pk=self.pk).update(
+                status=Status.PROCESSING, task_id=task_id, updated_at=now
+            )
+            if claimed != 1:
+                self.refresh_from_db(fields=['status', 'task_id', 'updated_at'])
+                return False
+            self.status, self.task_id, self.updated_at = Status.PROCESSING, task_id, now
+            self._record_transition(from_status, attempt=attempt)
+        return True
+
+    def finish_processing(self, status: str, task_id: str = '', error: str = '',
+                          attempt: Optional[int] = None) -> bool:
+        """
+        Завершить обработку задачей task_id: processing -> status
+
+        Условный UPDATE, как в claim_for_processing: если выплату уже перевел
+        в ошибку поиск зависших или захватила другая задача, строка не меняется -
+        статус перечитывается, False.
+        """
+        from_status = self.status
+        now = timezone.now()
+        with transaction.atomic(using=self._state.db, savepoint=False):
+            finished = Payout.objects.using(self._state.db).filter(
+                pk=self.pk, status=Status.PROCESSING, task_id=task_id
+            ).update(status=status, updated_at=now)
+            if finished != 1:
+                self.refresh_from_db(fields=['status', 'task_id', 'updated_at'])
+                return False
+            self.status, self.updated_at = status, now
+            self._record_transition(from_status, error=error, attempt=attempt)
+        return True
+
+    def _change_status(self, status: str, error: str = '', attempt: Optional[int] = None) -> None:
+        """
+        Сменить статус и дописать переход в историю (PayoutEvent)
+
+        Строка выплаты, запись истории и события подписчиков - в одной
+        транзакции БД выплаты (внутри транзакции вызывающего - без savepoint).
+        """
+        from_status = self.status
+        self.status = status
+        with transaction.atomic(using=self._state.db, savepoint=False):
+            self.save(update_fields=['status', 'updated_at'])
+            self._record_transition(from_status, error=error, attempt=attempt)
+
+    def _record_transition(self, from_status: str, error: str = '', attempt: Optional[int] = None) -> None:
+        self.events.create(from_status=from_status, to_status=self.status, error=error, attempt=attempt)
+        self._status_changed()
+
+    def _status_changed(self) -> None:
+        """Уведомить подписчиков о смене статуса (поток статусов, SSE)"""
+        payout_status_changed.send(sender=Payout, payout=self, status=self.status)
 
     def can_be_processed(self) -> bool:
         """Можно ли обрабатывать выплату"""
@@ -163,3 +396,303 @@ class Payout(models.Model):
 
     def __str__(self):
         return f"Выплата {self.id} - {self.amount} {self.currency}"
+
+
+class PayoutRecipient(models.Model):
+    """
+    Реквизиты получателя выплаты
+
+    Вынесены из строки выплаты: смена статуса не переписывает реквизиты,
+    список их не читает. Ключ - ID выплаты (в строке выплаты ссылки нет),
+    запись лежит в БД выплаты и удаляется вместе с ней.
+    """
+
+    payout = models.OneToOneField(
+        Payout,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='recipient',
+        verbose_name='Выплата'
+    )
+
+    details = models.JSONField(
+        verbose_name='Реквизиты получателя'
+    )
+
+    class Meta:
+        verbose_name = 'Реквизиты получателя'
+        verbose_name_plural = 'Реквизиты получателей'
+
+    def __str__(self):
+        return f"Реквизиты выплаты {self.payout_id}"
+
+
+class PayoutEvent(models.Model):
+    """
+    Переход статуса выплаты
+
+    История только дописывается (Payout._change_status) и лежит в БД
+    выплаты - в шарде вместе с ней.
+    """
+
+    payout = models.ForeignKey(
+        Payout,
+        on_delete=models.CASCADE,
+        related_name='events',
+        verbose_name='Выплата'
+    )
+
+    from_status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        verbose_name='Предыдущий статус'
+    )
+
+    to_status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        verbose_name='Новый статус'
+    )
+
+    error = models.TextField(
+        blank=True,
+        default='',
+        verbose_name='Текст ошибки'
+    )
+
+    attempt = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        verbose_name='Номер попытки обработки'
+    )
+
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата перехода'
+    )
+
+    class Meta:
+        verbose_name = 'Переход статуса выплаты'
+        verbose_name_plural = 'История статусов выплат'
+        ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['payout', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Выплата {self.payout_id}: {self.from_status} -> {self.to_status}"
+
+
+class PayoutDeadLetterQuerySet(models.QuerySet):
+
+    def pending(self) -> 'PayoutDeadLetterQuerySet':
+        """Еще не отправленные на повторную обработку"""
+        return self.filter(requeued_at__isnull=True)
+
+
+class PayoutDeadLetterManager(models.Manager):
+
+    def get_queryset(self):
+        return PayoutDeadLetterQuerySet(self.model, using=self._db)
+
+    def pending(self) -> PayoutDeadLetterQuerySet:
+        return self.get_queryset().pending()
+
+
+class PayoutDeadLetter(models.Model):
+    """Выплата, исчерпавшая попытки обработки"""
+
+    payout = models.ForeignKey(
+        Payout,
+        on_delete=models.CASCADE,
+        related_name='dead_letters',
+        # Выплата может лежать в другом шарде - без внешнего ключа в БД
+        db_constraint=False,
+        verbose_name='Выплата'
+    )
+
+    task_id = models.CharField(
+        max_length=255,
+        blank=True,
+        default='',
+        verbose_name='ID задачи'
+    )
+
+    error_class = models.CharField(
+        max_length=100,
+        verbose_name='Класс ошибки'
+    )
+
+    error_message = models.TextField(
+        blank=True,
+        default='',
+        verbose_name='Текст ошибки'
+    )
+
+    attempts = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество попыток'
+    )
+
+    history = models.JSONField(
+        default=list,
+        verbose_name='История ошибок'
+    )
+
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата создания'
+    )
+
+    requeued_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Дата повторной постановки'
+    )
+
+    objects = PayoutDeadLetterManager()
+
+    class Meta:
+        verbose_name = 'Необработанная выплата'
+        verbose_name_plural = 'Необработанные выплаты'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['requeued_at', 'created_at']),
+            models.Index(fields=['error_class']),
+        ]
+
+    def __str__(self):
+        return f"Dead letter {self.payout_id} - {self.error_class}"
+
+
+class WebhookEndpoint(models.Model):
+    """Подписка мерчанта на уведомления о смене статуса выплат"""
+
+    url = models.URLField(
+        max_length=500,
+        verbose_name='URL получателя'
+    )
+
+    secret = models.CharField(
+        max_length=64,
+        verbose_name='Секрет подписи'
+    )
+
+    event_types = models.JSONField(
+        default=list,
+        verbose_name='Статусы для уведомления'
+    )
+
+    is_active = models.BooleanField(
+        default=True,
+        verbose_name='Активна'
+    )
+
+    failure_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Неудачных доставок подряд'
+    )
+
+    next_attempt_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Следующая попытка доставки'
+    )
+
+    locked_until = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Доставка выполняется до'
+    )
+
+    last_error = models.TextField(
+        blank=True,
+        default='',
+        verbose_name='Последняя ошибка доставки'
+    )
+
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата создания'
+    )
+
+    class Meta:
+        verbose_name = 'Webhook'
+        verbose_name_plural = 'Webhooks'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Webhook {self.id} - {self.url}"
+
+
+class WebhookEventQuerySet(models.QuerySet):
+
+    def pending(self) -> 'WebhookEventQuerySet':
+        """Еще не доставленные и не отброшенные"""
+        return self.filter(delivered_at__isnull=True, failed_at__isnull=True)
+
+
+class WebhookEvent(models.Model):
+    """Событие смены статуса выплаты в очереди доставки подписчику"""
+
+    endpoint = models.ForeignKey(
+        WebhookEndpoint,
+        on_delete=models.CASCADE,
+        related_name='events',
+        verbose_name='Webhook'
+    )
+
+    payout = models.ForeignKey(
+        Payout,
+        on_delete=models.CASCADE,
+        related_name='webhook_events',
+        # Выплата может лежать в другом шарде - без внешнего ключа в БД
+        db_constraint=False,
+        verbose_name='Выплата'
+    )
+
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        verbose_name='Статус выплаты'
+    )
+
+    payload = models.JSONField(
+        verbose_name='Данные события'
+    )
+
+    attempts = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Попыток доставки'
+    )
+
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата создания'
+    )
+
+    delivered_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Дата доставки'
+    )
+
+    failed_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Дата отказа от доставки'
+    )
+
+    objects = WebhookEventQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Событие webhook'
+        verbose_name_plural = 'События webhook'
+        ordering = ['id']
+        indexes = [
+            # Очередь доставки подписчика: недоставленные события по порядку
+            models.Index(fields=['endpoint', 'delivered_at', 'failed_at', 'id']),
+        ]
+
+    def __str__(self):
+        return f"Событие {self.status} выплаты {self.payout_id} для webhook {self.endpoint_id}"
@@ -1,8 +1,9 @@
 from decimal import Decimal
 from ninja import Schema, Field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
-from pydantic import UUID4, BaseModel
+from uuid import UUID
+from pydantic import AnyHttpUrl, BaseModel
 from .models import Currency, Status
 
 class CardSchema(Schema):
@@ -35,7 +36,8 @@ class PayoutTimestampMixin(BaseModel):
     updated_at: datetime
 
 class PayoutIdentifierMixin(Schema):
-    id: UUID4
+    # uuid4 или версия 8 с номером шарда (db_router.new_payout_id)
+    id: UUID
 
 class PayoutStatusMixin(Schema):
     status: Optional[Status] = Field(None, description="Статус заявки")
@@ -43,9 +45,11 @@ class PayoutStatusMixin(Schema):
 class PayoutDescriptionMixin(Schema):
     description: Optional[str] = Field(None, max_length=500, description="Описание")
 
-class PayoutDetailsMixin(Schema):
+class PayoutAmountMixin(Schema):
     amount: Decimal = Field(..., gt=0, decimal_places=2, max_digits=12 ,description="Сумма выплаты (должна быть больше 0)")
     currency: Currency = Field(..., description="Валюта выплаты")
+
+class PayoutDetailsMixin(PayoutAmountMixin):
     recipient_details: CardSchema = Field(..., description="Данные получателя")
 
 class PayoutCreateSchema(
@@ -69,6 +73,22 @@ class PayoutResponseSchema(
 ):
     pass
 
+class PayoutListItemSchema(
+    PayoutTimestampMixin,
+    PayoutStatusMixin,
+    PayoutDescriptionMixin,
+    PayoutIdentifierMixin,
+    PayoutAmountMixin
+):
+    """Выплата в списке - без реквизитов получателя (они не читаются из БД)"""
+
+class PayoutEventResponseSchema(Schema):
+    from_status: Status = Field(..., description="Предыдущий статус")
+    to_status: Status = Field(..., description="Новый статус")
+    error: str = Field(..., description="Текст ошибки (для перехода в failed)")
+    attempt: Optional[int] = Field(None, description="Номер попытки обработки")
+    created_at: datetime
+
 class ErrorSchema(Schema):
     detail: str
     code: Optional[str] = None
@@ -76,3 +96,46 @@ class ErrorSchema(Schema):
 
 class ValidationErrorSchema(Schema):
     detail: list[Dict[str, Any]]
+
+
+class DeadLetterResponseSchema(Schema):
+    id: int
+    payout_id: UUID
+    task_id: str
+    error_class: str
+    error_message: str
+    attempts: int
+    history: List[Dict[str, Any]]
+    created_at: datetime
+    requeued_at: Optional[datetime] = None
+
+
+class DeadLetterRequeueSchema(Schema):
+    ids: Optional[List[int]] = Field(None, description="ID записей; если не указаны - по фильтру")
+    error_class: Optional[str] = Field(None, description="Класс ошибки")
+    limit: int = Field(100, gt=0, le=1000, description="Максимум записей за один запрос")
+
+
+class DeadLetterRequeueResultSchema(Schema):
+    requeued: int
+    ids: List[int]
+
+
+class WebhookEndpointCreateSchema(Schema):
+    url: AnyHttpUrl = Field(..., description="URL получателя (POST пачки событий)")
+    event_types: Optional[List[Status]] = Field(None, min_length=1, description="Статусы для уведомления")
+    secret: Optional[str] = Field(None, min_length=16, max_length=64, description="Секрет подписи; если не задан - генерируется")
+
+
+class WebhookEndpointResponseSchema(Schema):
+    id: int
+    url: str
+    event_types: List[Status]
+    failure_count: int
+    next_attempt_at: Optional[datetime] = None
+    last_error: str
+    created_at: datetime
+
+
+class WebhookEndpointCreatedSchema(WebhookEndpointResponseSchema):
+    secret: str = Field(..., description="Секрет подписи X-Webhook-Signature, возвращается только при создании")
@@ -0,0 +1,119 @@
+import zlib
+from decimal import Decimal
+from typing import List, Optional
+
+from django.conf import settings
+
+from backend.db_router import get_shards, shard_index
+
+PAYOUT_TASK_NAME = 'api_payouts.tasks.payout_task'
+
+
+class PayoutSource:
+    """Источник постановки выплаты в очередь"""
+    API = 'api'
+    # Массовая повторная постановка: поиск зависших, повтор из dead letter
+    BATCH = 'batch'
+
+
+class PayoutPriority:
+    """Приоритет очереди выплат"""
+    HIGH = 'high'
+    DEFAULT = 'default'
+    BULK = 'bulk'
+
+    ALL = (HIGH, DEFAULT, BULK)
+
+
+class PayoutQueueRouter:
+    """
+    Маршрутизация задач выплат по приоритетным очередям
+
+    Приоритет определяется источником, суммой и валютой, шард - хэшем ID
+    выплаты, а при шардировании БД - шардом выплаты, чтобы воркеры очереди
+    работали с одной БД. Имя очереди: <prefix>.<priority>[.<shard>].
+    """
+
+    @staticmethod
+    def config() -> dict:
+        return settings.PAYOUT_ROUTING
+
+    @classmethod
+    def get_priority(cls, amount=None, currency: Optional[str] = None, source: str = PayoutSource.API) -> str:
+        """Приоритет выплаты: массовые выгрузки - bulk, небольшие разовые - high"""
+        config = cls.config()
+        if source in config['BULK_SOURCES']:
+            return PayoutPriority.BULK
+
+        limit = config['HIGH_PRIORITY_MAX_AMOUNT'].get(currency)
+        if amount is not None and limit is not None and Decimal(str(amount)) <= Decimal(str(limit)):
+            return PayoutPriority.HIGH
+        return PayoutPriority.DEFAULT
+
+    @classmethod
+    def get_shard(cls, payout_id) -> int:
+        """Номер шарда очереди по ID выплаты"""
+        if get_shards():
+            return shard_index(payout_id) % cls.config()['SHARDS']
+        return zlib.crc32(str(payout_id).encode()) % cls.config()['SHARDS']
+
+    @classmethod
+    def queue_name(cls, priority: str, shard: int = 0) -> str:
+        config = cls.config()
+        name = f"{config['QUEUE_PREFIX']}.{priority}"
+        if config['SHARDS'] > 1:
+            name = f"{name}.{shard}"
+        return name
+
+    @classmethod
+    def get_queue(cls, payout_id, amount=None, currency: Optional[str] = None,
+                  source: str = PayoutSource.API) -> str:
+        """Очередь для задачи выплаты"""
+        priority = cls.get_priority(amount=amount, currency=currency, source=source)
+        return cls.queue_name(priority, cls.get_shard(payout_id))
+
+    @classmethod
+    def get_queues(cls, priority: Optional[str] = None, shard: Optional[int] = None) -> List[str]:
+        """Все очереди приоритета (или все очереди выплат), при shard - только этого шарда"""
+        priorities = [priority] if priority else PayoutPriority.ALL
+        shards = [shard] if shard is not None else range(cls.config()['SHARDS'])
+        return [cls.queue_name(p, s) for p in priorities for s in shards]
+
+    @classmethod
+    def priority_of(cls, queue: Optional[str]) -> Optional[str]:
+        """Приоритет по имени очереди <prefix>.<priority>[.<shard>] (None для чужих очередей)"""
+        parts = (queue or '').split('.')
+        if len(parts) < 2 or parts[0] != cls.config()['QUEUE_PREFIX'] or parts[1] not in PayoutPriority.ALL:
+            return None
+        return parts[1]
+
+    @classmethod
+    def message_options(cls, queue: Optional[str]) -> dict:
+        """
+        Сериализатор и сжатие сообщения задачи для очереди (PAYOUT_MESSAGE_FORMAT)
+
+        Передаются в apply_async/retry явно: сериализатор задачи Celery подставляет
+        до маршрутизации, и роутер его не переопределяет.
+        """
+        message_format = settings.PAYOUT_MESSAGE_FORMAT
+        options = {
+            'serializer': message_format['SERIALIZER'],
+            'compression': message_format['COMPRESSION'],
+        }
+        overrides = message_format['QUEUES'].get(cls.priority_of(queue)) or {}
+        options.update({key.lower(): value for key, value in overrides.items()})
+        return options
+
+
+def route_task(name, args, kwargs, options, task=None, **kw):
+    """
+    Роутер Celery (task_routes)
+
+    Задачи выплат, отправленные без явной очереди, попадают
+    в шард очереди обычного приоритета.
+    """
+    if name != PAYOUT_TASK_NAME:
+        return None
+
+    payout_id = args[0] if args else (kwargs or {}).get('payout_id')
+    return {'queue': PayoutQueueRouter.queue_name(PayoutPriority.DEFAULT, PayoutQueueRouter.get_shard(payout_id))}
@@ -0,0 +1,110 @@
+import logging
+from datetime import timedelta
+from typing import Dict, List
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from backend.db_router import shard_aliases
+
+from ...metrics import PAYOUT_SWEEPER_PAYOUTS
+from ...models import Payout
+from .payout_queue_router import PayoutSource
+
+logger = logging.getLogger(__name__)
+
+
+class SweepAction:
+    """Действие с зависшей выплатой"""
+    REQUEUE = 'requeue'
+    FAIL = 'fail'
+
+
+class PayoutSweeperService:
+    """
+    Поиск и обработка зависших выплат
+
+    Выплата считается зависшей, если пробыла в статусе дольше порога из
+    settings.PAYOUT_SWEEPER. Выборка идет по индексам (status, updated_at) и
+    (status, dispatched_at, updated_at) пачками ограниченного размера в каждом
+    шарде, полный просмотр таблицы не выполняется. Повторно ставятся только
+    выплаты без живой задачи: последняя постановка (dispatched_at) старше
+    DISPATCH_TIMEOUT.
+    """
+
+    @staticmethod
+    def config() -> dict:
+        return settings.PAYOUT_SWEEPER
+
+    @classmethod
+    def sweep(cls) -> Dict[str, int]:
+        """Один проход по всем правилам, возвращает количество по статусам"""
+        counts = {}
+        for status, rule in cls.config()['RULES'].items():
+            counts[status] = cls.sweep_status(status, rule['AFTER'], rule['ACTION'])
+        return counts
+
+    @classmethod
+    def sweep_status(cls, status: str, after_seconds: int, action: str) -> int:
+        config = cls.config()
+        now = timezone.now()
+        cutoff = now - timedelta(seconds=after_seconds)
+        dispatch_cutoff = now - timedelta(seconds=config['DISPATCH_TIMEOUT'])
+        total = 0
+
+        for alias in shard_aliases():
+            for _ in range(config['MAX_BATCHES']):
+                processed = cls._sweep_batch(alias, status, cutoff, action, config['BATCH_SIZE'], dispatch_cutoff)
+                total += processed
+                if processed < config['BATCH_SIZE']:
+                    break
+
+        if total:
+            PAYOUT_SWEEPER_PAYOUTS.labels(status=status, action=action).inc(total)
+            logger.warning("Найдено зависших выплат в статусе %s: %s, действие: %s", status, total, action)
+        return total
+
+    @classmethod
+    def _sweep_batch(cls, alias: str, status: str, cutoff, action: str, batch_size: int, dispatch_cutoff) -> int:
+        with transaction.atomic(using=alias):
+            queryset = (
+                Payout.objects
+                .using(alias)
+                .select_for_update(skip_locked=True)
+                .filter(status=status, updated_at__lt=cutoff)
+            )
+            if action == SweepAction.REQUEUE:
+                payouts = cls._lost_dispatches(queryset, batch_size, dispatch_cutoff)
+            else:
+                payouts = list(queryset.order_by('updated_at')[:batch_size])
+            for payout in payouts:
+                if action == SweepAction.REQUEUE:
+                    cls._requeue(payout)
+                else:
+                    payout.mark_as_failed(error_message=f"Выплата зависла в статусе {status}")
+        return len(payouts)
+
+    @staticmethod
+    def _lost_dispatches(queryset, batch_size: int, dispatch_cutoff) -> List[Payout]:
+        """
+        Выплаты без живой задачи: никогда не ставились или постановка истекла
+
+        Два диапазона индекса (status, dispatched_at, updated_at) вместо фильтра
+        поверх (status, updated_at) - выплаты с живой задачей не просматриваются.
+        """
+        payouts = list(queryset.filter(dispatched_at__isnull=True).order_by('updated_at')[:batch_size])
+        if len(payouts) < batch_size:
+            expired = queryset.filter(dispatched_at__lt=dispatch_cutoff).order_by('dispatched_at')
+            payouts += list(expired[:batch_size - len(payouts)])
+        return payouts
+
+    @staticmethod
+    def _requeue(payout: Payout) -> None:
+        # Локальный импорт: сервис задач импортирует модуль tasks
+        from ..payout_task_service import PayoutTaskService
+
+        # Переводим в pending (обновляя updated_at), чтобы следующий проход не взял выплату повторно
+        payout.mark_as_pending()
+        PayoutTaskService.execute_payout(str(payout.id), amount=payout.amount, currency=payout.currency,
+                                         source=PayoutSource.BATCH)
@@ -1,19 +1,36 @@
 import logging
+import time
 from django.db import transaction
+from django.http import Http404
 
-from ...models import Payout
+from ...metrics import PAYOUT_END_TO_END_SECONDS
+from ...models import Payout, Status
+from ..gateway_services import GatewayError, get_gateway_client
+from .rate_limiter import get_rate_limiter
+from .stage_timer import StageTimer
+from .task_results import report_progress, task_result
 
 logger = logging.getLogger(__name__)
+# Построчные записи этапов - DEBUG, сэмплируются фильтром логгера (LOG_STAGE_SAMPLE_RATE)
+stage_logger = logging.getLogger('api_payouts.stages')
 
 
 class PayoutProcessingService:
     """Сервис для обработки выплат"""
 
-    def __init__(self, payout_id, task=None):
+    SEND_STAGE = "Отправка в платежную систему"
+
+    def __init__(self, payout_id, task=None, attempt=None):
         self.payout_id = payout_id
         self.payout = None
         self.result = {}
         self.task = task
+        # Номер попытки для истории статусов (история ошибок задачи + 1)
+        self.attempt = attempt
+        self.timer = StageTimer()
+        self.started_at = time.time()
+        # Выплата захвачена этой задачей - итоговый статус ставится условно (finish_processing)
+        self.claimed = False
 
     def process(self):
         """
@@ -21,128 +38,192 @@ class PayoutProcessingService:
         Возвращает результат выполнения
         """
         try:
-            self._setup()
-            self._validate()
-            self._set_processing()
-            self._simulate_processing()
-            self._complete()
+            with self.timer.stage('setup'):
+                self._setup()
+            with self.timer.stage('validation'):
+                self._validate()
+            with self.timer.stage('processing'):
+                self._acquire_rate_limit()
+                self._set_processing()
+            with self.timer.stage('gateway'):
+                self._simulate_processing()
+            with self.timer.stage('completion'):
+                self._complete()
             return self._success_result()
 
-        except Payout.DoesNotExist:
+        except (Payout.DoesNotExist, Http404):
             return self._not_found_result()
         except Exception as exc:
             return self._handle_error(exc)
 
     def _setup(self):
         """Этап 1: Получение объекта выплаты"""
-        logger.info(f"Начинаю обработку выплаты с ID: {self.payout_id}")
+        logger.info("Начинаю обработку выплаты с ID: %s", self.payout_id)
         self.payout = Payout.objects.get_payout(payout_id=self.payout_id)
 
         # Обновляем прогресс задачи если есть task
-        if self.task:
-            self.task.update_state(
-                state='PROGRESS',
-                meta={'current': 1, 'total': 4, 'stage': 'setup'}
-            )
+        report_progress(self.task, current=1, total=4, stage='setup')
 
     def _validate(self):
         """Этап 2: Валидация и проверка идемпотентности"""
         if self.payout.is_completed():
-            logger.info(f"Выплата {self.payout_id} уже выполнена ранее")
+            logger.info("Выплата %s уже выполнена ранее", self.payout_id)
             self.result = {'already_completed': True}
-            raise StopProcessing()
+            raise StopProcessing(result=task_result('skipped', {
+                'success': True,
+                'payout_id': self.payout_id,
+                'already_completed': True,
+                'message': 'Обработка уже была выполнена',
+            }, started_at=self.started_at))
 
-        elif self.payout.is_processing():
-            pass
+        elif self.payout.is_processing() and self.payout.task_id != self._task_id():
+            # Выплату обрабатывает другая задача (например, дубль после повторной постановки)
+            self._reject_in_progress()
 
         # Обновляем прогресс
-        if self.task:
-            self.task.update_state(
-                state='PROGRESS',
-                meta={'current': 2, 'total': 4, 'stage': 'validation'}
-            )
+        report_progress(self.task, current=2, total=4, stage='validation')
 
     def _set_processing(self):
         """Этап 3: Установка статуса 'в обработке'"""
-        with transaction.atomic():
-            self.payout.mark_as_processing()
-        logger.info(f"Выплата {self.payout_id} переведена в статус 'processing'")
+        with transaction.atomic(using=self.payout._state.db):
+            claimed = self.payout.claim_for_processing(task_id=self._task_id(), attempt=self.attempt)
+        if not claimed:
+            # Между чтением и захватом выплату взяла или завершила другая задача
+            self._reject_in_progress()
+        self.claimed = True
+        stage_logger.debug("Выплата %s переведена в статус 'processing'", self.payout_id)
 
         # Обновляем прогресс
-        if self.task:
-            self.task.update_state(
-                state='PROGRESS',
-                meta={'current': 3, 'total': 4, 'stage': 'processing'}
-            )
+        report_progress(self.task, current=3, total=4, stage='processing')
+
+    def _task_id(self) -> str:
+        return (self.task.request.id or '') if self.task is not None else ''
+
+    def _reject_in_progress(self):
+        logger.info("Выплата %s уже обрабатывается другой задачей (статус %s)", self.payout_id, self.payout.status)
+        raise StopProcessing(result=task_result('skipped', {
+            'success': False,
+            'payout_id': self.payout_id,
+            'status': self.payout.status,
+            'message': 'Выплата уже обрабатывается другой задачей',
+        }, started_at=self.started_at))
+
+    def _reject_lost_claim(self):
+        # Пока задача шла, выплату перевел в ошибку поиск зависших или захватила другая задача
+        logger.warning(
+            "Выплата %s не завершена: статус изменен до завершения обработки (%s), транзакция %s",
+            self.payout_id, self.payout.status, self.result.get('transaction_id'),
+        )
+        raise StopProcessing(result=task_result('skipped', {
+            'success': False,
+            'payout_id': self.payout_id,
+            'status': self.payout.status,
+            'transaction_id': self.result.get('transaction_id'),
+            'message': 'Статус выплаты изменен до завершения обработки',
+        }, started_at=self.started_at))
 
     def _simulate_processing(self):
         """Имитация обработки"""
-        logger.info(f"Имитация обработки выплаты {self.payout_id}...")
+        stage_logger.debug("Имитация обработки выплаты %s...", self.payout_id)
 
         stages = [
-            {"name": "Проверка данных", "duration": 0.5},
-            {"name": "Верификация баланса", "duration": 0.5},
-            {"name": "Резервирование средств", "duration": 0.5},
-            {"name": "Подготовка транзакции", "duration": 0.5},
-            {"name": "Отправка в платежную систему", "duration": 0.5}
+            {"name": "Проверка данных", "code": "check_data", "duration": 0.5},
+            {"name": "Верификация баланса", "code": "verify_balance", "duration": 0.5},
+            {"name": "Резервирование средств", "code": "reserve_funds", "duration": 0.5},
+            {"name": "Подготовка транзакции", "code": "prepare_transaction", "duration": 0.5},
+            {"name": self.SEND_STAGE, "code": "send", "duration": 0.5}
         ]
 
         for stage in stages:
-            logger.info(f"Этап '{stage['name']}' для выплаты {self.payout_id}")
-
-            if self.task:
-                 self.task.update_state(
-                    state='PROGRESS',
-                    meta={
-                        'payout_id': str(self.payout_id),
-                        'stage': stage['name'],
-                        'progress': f"Выполняется {stage['name']}"
-                    }
+            with self.timer.stage(f"gateway.{stage['code']}"):
+                stage_logger.debug("Этап '%s' для выплаты %s", stage['name'], self.payout_id)
+
+                report_progress(
+                    self.task,
+                    payout_id=str(self.payout_id),
+                    stage=stage['name'],
+                    progress=f"Выполняется {stage['name']}",
                 )
-        logger.info(f"Имитация обработки завершена для выплаты {self.payout_id}")
+
+                if stage['name'] == self.SEND_STAGE:
+                    self._send_to_gateway()
+        stage_logger.debug("Имитация обработки завершена для выплаты %s", self.payout_id)
+
+    def _acquire_rate_limit(self):
+        """
+        Получение токена платежной системы до захвата выплаты
+
+        Без токена выплата откладывается в прежнем статусе: ни смены статуса,
+        ни записи в истории, ни сигнала payout_status_changed.
+        """
+        decision = get_rate_limiter().acquire(get_gateway_client().name, self.payout.currency)
+        if decision.allowed:
+            return
+
+        logger.info(
+            "Выплата %s отложена rate limiter (%s) на %.2f сек", self.payout_id, decision.bucket, decision.retry_after
+        )
+        raise RateLimited(retry_after=decision.retry_after, bucket=decision.bucket)
+
+    def _send_to_gateway(self):
+        """Отправка выплаты в платежную систему через клиент процесса"""
+        response = get_gateway_client().send_payout(self.payout)
+        if not response.accepted:
+            raise GatewayError(response.error or 'Выплата отклонена платежной системой')
+
+        self.result['transaction_id'] = response.transaction_id
+        stage_logger.debug("Выплата %s принята платежной системой: %s", self.payout_id, response.transaction_id)
 
     def _complete(self):
         """Этап 4: Завершение обработки"""
-        logger.info(f"Завершение обработки выплаты {self.payout_id}")
-        with transaction.atomic():
-            self.payout.mark_as_completed()
-        logger.info(f"Выплата {self.payout_id} успешно обработана")
+        stage_logger.debug("Завершение обработки выплаты %s", self.payout_id)
+        with transaction.atomic(using=self.payout._state.db):
+            completed = self.payout.finish_processing(Status.COMPLETED, task_id=self._task_id(), attempt=self.attempt)
+        if not completed:
+            self._reject_lost_claim()
+        logger.info("Выплата %s успешно обработана", self.payout_id)
+
+        PAYOUT_END_TO_END_SECONDS.labels(currency=self.payout.currency).observe(
+            (self.payout.updated_at - self.payout.created_at).total_seconds()
+        )
 
         # Обновляем прогресс
-        if self.task:
-            self.task.update_state(
-                state='PROGRESS',
-                meta={'current': 4, 'total': 4, 'stage': 'completion'}
-            )
+        report_progress(self.task, current=4, total=4, stage='completion')
 
     def _success_result(self):
         """Формирование успешного результата"""
-        return {
+        return task_result('completed', {
             'success': True,
             'payout_id': self.payout_id,
             'status': 'completed',
             'message': 'Выплата успешно обработана',
-            'completed_at': self.payout.updated_at.isoformat()
-        }
+            'transaction_id': self.result.get('transaction_id'),
+            'completed_at': self.payout.updated_at.isoformat(),
+            'timings': self.timer.breakdown()
+        }, started_at=self.started_at)
 
     def _not_found_result(self):
         """Обработка случая, когда выплата не найдена"""
-        logger.error(f"Выплата с ID {self.payout_id} не найдена")
-        return {
+        logger.error("Выплата с ID %s не найдена", self.payout_id)
+        return task_result('not_found', {
             'success': False,
             'payout_id': self.payout_id,
             'error': 'Выплата не найдена'
-        }
+        }, started_at=self.started_at, error='Выплата не найдена')
 
     def _handle_error(self, exc):
         """Обработка ошибок"""
-        logger.error(f"Критическая ошибка при обработке выплаты {self.payout_id}: {str(exc)}")
+        if isinstance(exc, RateLimited):
+            raise exc
+
+        if isinstance(exc, StopProcessing) and exc.result is not None:
+            # Обработка уже выполнена или идет в другой задаче - не ошибка, статус не меняется
+            return exc.result
 
-        if isinstance(exc, (StopProcessing, ProcessingInProgress)):
-            # Эти исключения не требуют смены статуса на failed
-            if hasattr(exc, 'result'):
-                logger.error(exc.result)
-                return exc.result
+        logger.error("Критическая ошибка при обработке выплаты %s: %s", self.payout_id, str(exc))
+
+        if isinstance(exc, StopProcessing):
+            # Остановка не требует смены статуса на failed
             raise exc
 
         # Обновление статуса на "ошибка"
@@ -152,10 +233,16 @@ class PayoutProcessingService:
     def _mark_as_failed(self, error):
         """Обновление статуса выплаты на 'failed'"""
         try:
-            with transaction.atomic():
-                self.payout.mark_as_failed(error_message=error)
+            error_message = f'{type(error).__name__}: {error}'
+            with transaction.atomic(using=self.payout._state.db):
+                if not self.claimed:
+                    self.payout.mark_as_failed(error_message=error_message, attempt=self.attempt)
+                elif not self.payout.finish_processing(Status.FAILED, task_id=self._task_id(),
+                                                       error=error_message, attempt=self.attempt):
+                    logger.warning("Выплата %s не переведена в ошибку: статус уже изменен (%s)",
+                                   self.payout_id, self.payout.status)
         except Exception as update_exc:
-            logger.error(f"Не удалось обновить статус для {self.payout_id}: {str(update_exc)}")
+            logger.error("Не удалось обновить статус для %s: %s", self.payout_id, str(update_exc))
 
 
 class StopProcessing(Exception):
@@ -166,6 +253,10 @@ class StopProcessing(Exception):
         super().__init__()
 
 
-class ProcessingInProgress(Exception):
-    """Исключение для обработки, которая уже выполняется"""
-    pass
\ No newline at end of file
+class RateLimited(Exception):
+    """Исключение при исчерпании лимита платежной системы - выплату нужно отложить"""
+
+    def __init__(self, retry_after: float, bucket: str = None):
+        self.retry_after = retry_after
+        self.bucket = bucket
+        super().__init__(f"Лимит {bucket} исчерпан, повтор через {retry_after:.2f} сек")
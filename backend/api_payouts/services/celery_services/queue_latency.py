@@ -0,0 +1,62 @@
+import time
+from datetime import datetime
+from typing import Optional
+
+from celery.signals import before_task_publish, task_prerun
+
+from ...metrics import PAYOUT_QUEUE_WAIT_SECONDS
+from .payout_queue_router import PAYOUT_TASK_NAME
+
+
+def task_header(request, name: str):
+    """
+    Пользовательский заголовок задачи
+
+    В воркере заголовки сообщения доступны как атрибуты request,
+    при локальном выполнении (apply) - в request.headers.
+    """
+    value = getattr(request, name, None)
+    if value is None:
+        value = (getattr(request, 'headers', None) or {}).get(name)
+    return value
+
+
+def queue_wait_seconds(request) -> Optional[float]:
+    """
+    Время ожидания задачи в очереди
+
+    Отсчитывается от публикации, а для отложенных задач (countdown/eta) -
+    от момента, когда задача стала доступна воркеру.
+    """
+    enqueued_at = task_header(request, 'enqueued_at')
+    if enqueued_at is None:
+        return None
+
+    ready_at = float(enqueued_at)
+    eta = getattr(request, 'eta', None)
+    if eta:
+        if isinstance(eta, str):
+            eta = datetime.fromisoformat(eta)
+        ready_at = max(ready_at, eta.timestamp())
+    return max(0.0, time.time() - ready_at)
+
+
+@before_task_publish.connect
+def stamp_enqueued_at(sender=None, headers=None, **kwargs):
+    """Метка времени публикации в заголовках задачи выплаты"""
+    if sender == PAYOUT_TASK_NAME and headers is not None:
+        headers['enqueued_at'] = time.time()
+
+
+@task_prerun.connect
+def observe_queue_wait(sender=None, task=None, **kwargs):
+    """Учет времени ожидания в очереди по каждой очереди"""
+    if task is None or task.name != PAYOUT_TASK_NAME:
+        return
+
+    wait = queue_wait_seconds(task.request)
+    if wait is None:
+        return
+
+    queue = (task.request.delivery_info or {}).get('routing_key') or 'unknown'
+    PAYOUT_QUEUE_WAIT_SECONDS.labels(queue=queue).observe(wait)
@@ -0,0 +1,130 @@
+import logging
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from django.conf import settings
+from redis.exceptions import RedisError
+
+from ...metrics import PAYOUT_RATE_LIMIT_DECISIONS, PAYOUT_RATE_LIMIT_TOKENS, PAYOUT_RATE_LIMIT_UTILIZATION
+
+logger = logging.getLogger(__name__)
+
+# Атомарное списание токена: пополнение по времени сервера Redis,
+# чтобы все воркеры считали корзину по одним часам
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+local allowed = 0
+local retry_after = 0
+if tokens >= requested then
+    tokens = tokens - requested
+    allowed = 1
+else
+    retry_after = (requested - tokens) / rate
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+return {allowed, tostring(tokens), tostring(retry_after)}
+"""
+
+
+@dataclass
+class RateLimitDecision:
+    """Результат запроса токена"""
+    allowed: bool
+    bucket: str
+    tokens: float = 0.0
+    capacity: float = 0.0
+    retry_after: float = 0.0
+
+
+class TokenBucketRateLimiter:
+    """
+    Распределенный token bucket в Redis
+
+    Корзина своя для каждой пары платежная система/валюта,
+    параметры берутся из settings.PAYOUT_RATE_LIMIT.
+    """
+
+    def __init__(self, redis_client=None):
+        self._redis = redis_client
+        self._script = None
+
+    @staticmethod
+    def config() -> dict:
+        return settings.PAYOUT_RATE_LIMIT
+
+    @property
+    def enabled(self) -> bool:
+        return self.config()['ENABLED']
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            from django_redis import get_redis_connection
+            self._redis = get_redis_connection(self.config().get('CACHE_ALIAS', 'default'))
+        return self._redis
+
+    def bucket_params(self, currency: str) -> Dict[str, float]:
+        config = self.config()
+        return {**config['DEFAULT'], **config['BUCKETS'].get(currency, {})}
+
+    def bucket_name(self, gateway: str, currency: str) -> str:
+        return f"{gateway}:{currency}"
+
+    def acquire(self, gateway: str, currency: str, tokens: int = 1) -> RateLimitDecision:
+        """Списать токен из корзины; при недоступности Redis - пропустить без ограничения"""
+        bucket = self.bucket_name(gateway, currency)
+        if not self.enabled:
+            return RateLimitDecision(allowed=True, bucket=bucket)
+
+        params = self.bucket_params(currency)
+        key = f"{self.config()['KEY_PREFIX']}:{bucket}"
+        try:
+            if self._script is None:
+                self._script = self.redis.register_script(TOKEN_BUCKET_SCRIPT)
+            allowed, left, retry_after = self._script(keys=[key], args=[params['RATE'], params['CAPACITY'], tokens])
+        except RedisError as exc:
+            logger.warning("Rate limiter недоступен для %s, пропускаю без ограничения: %s", bucket, exc)
+            return RateLimitDecision(allowed=True, bucket=bucket)
+
+        decision = RateLimitDecision(
+            allowed=bool(int(allowed)),
+            bucket=bucket,
+            tokens=float(left),
+            capacity=float(params['CAPACITY']),
+            retry_after=float(retry_after),
+        )
+        self._observe(decision)
+        return decision
+
+    @staticmethod
+    def _observe(decision: RateLimitDecision) -> None:
+        PAYOUT_RATE_LIMIT_DECISIONS.labels(
+            bucket=decision.bucket,
+            result='allowed' if decision.allowed else 'throttled',
+        ).inc()
+        PAYOUT_RATE_LIMIT_TOKENS.labels(bucket=decision.bucket).set(decision.tokens)
+        if decision.capacity:
+            PAYOUT_RATE_LIMIT_UTILIZATION.labels(bucket=decision.bucket).set(1 - decision.tokens / decision.capacity)
+
+
+_limiter: Optional[TokenBucketRateLimiter] = None
+
+
+def get_rate_limiter() -> TokenBucketRateLimiter:
+    """Rate limiter текущего процесса"""
+    global _limiter
+    if _limiter is None:
+        _limiter = TokenBucketRateLimiter()
+    return _limiter
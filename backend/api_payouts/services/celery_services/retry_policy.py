@@ -0,0 +1,61 @@
+import random
+from dataclasses import dataclass
+from typing import Dict
+
+from django.conf import settings
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Политика повторов для класса ошибок"""
+    max_retries: int
+    base_delay: float
+    max_delay: float
+
+    def countdown(self, attempt: int) -> float:
+        """
+        Задержка перед повтором: экспонента с полным джиттером
+
+        random(0, min(max_delay, base_delay * 2^attempt)), attempt считается с нуля.
+        Разброс не дает тысячам задач проснуться одновременно после сбоя.
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+def _build_policies() -> Dict[str, RetryPolicy]:
+    return {
+        name: RetryPolicy(
+            max_retries=config['MAX_RETRIES'],
+            base_delay=config['BASE_DELAY'],
+            max_delay=config['MAX_DELAY'],
+        )
+        for name, config in settings.PAYOUT_RETRY_POLICIES.items()
+    }
+
+
+def get_retry_policy(exc: BaseException) -> RetryPolicy:
+    """
+    Политика для исключения
+
+    Ищется по именам классов в MRO исключения (от частного к общему),
+    при отсутствии - политика 'default'.
+    """
+    policies = _build_policies()
+    for cls in type(exc).__mro__:
+        if cls.__name__ in policies:
+            return policies[cls.__name__]
+    return policies['default']
+
+
+def error_class_name(exc: BaseException) -> str:
+    return type(exc).__name__
+
+
+def history_kwargsrepr(history) -> str:
+    """
+    kwargsrepr задачи выплаты для заголовков сообщения
+
+    По умолчанию Celery кладет в заголовок repr всех kwargs - история ошибок
+    передавалась бы дважды, причем заголовки не сжимаются.
+    """
+    return f"{{'history': <{len(history or [])} записей>}}"
@@ -0,0 +1,131 @@
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict
+
+from django.conf import settings
+
+from backend import tracing
+
+from ...metrics import PAYOUT_STAGE_SECONDS, STAGE_BUCKETS
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограммы в наносекундах; индекс len(STAGE_BUCKETS) - корзина +Inf
+_BUCKET_BOUNDS_NS = [int(bound * 1e9) for bound in STAGE_BUCKETS]
+
+
+class StageTimingAggregator:
+    """
+    Агрегация длительности этапов внутри процесса
+
+    Замер раскладывается по корзинам гистограммы payout_stage_duration_seconds
+    под блокировкой, без обращения к метрике. Накопленные корзины выгружаются
+    в гистограмму фоновым потоком раз в STAGE_TIMINGS_FLUSH_INTERVAL секунд
+    и при остановке процесса воркера - перцентили по этапам сохраняются.
+    """
+
+    def __init__(self, flush_interval: float):
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        # stage -> [количество, сумма нс, максимум нс, счетчики по корзинам, суммы нс по корзинам]
+        self._stats: Dict[str, list] = {}
+        self._flusher = None
+        self._flusher_pid = None
+
+    def record(self, stage: str, elapsed_ns: int) -> None:
+        bucket = bisect_left(_BUCKET_BOUNDS_NS, elapsed_ns)
+        with self._lock:
+            stats = self._stats.get(stage)
+            if stats is None:
+                size = len(_BUCKET_BOUNDS_NS) + 1
+                stats = self._stats[stage] = [0, 0, 0, [0] * size, [0] * size]
+            stats[0] += 1
+            stats[1] += elapsed_ns
+            if elapsed_ns > stats[2]:
+                stats[2] = elapsed_ns
+            stats[3][bucket] += 1
+            stats[4][bucket] += elapsed_ns
+
+        if self._flusher_pid != os.getpid():
+            self._start_flusher()
+
+    def _start_flusher(self) -> None:
+        """Фоновый поток выгрузки - свой в каждом процессе (после fork поток родителя не наследуется)"""
+        with self._lock:
+            if self._flusher_pid == os.getpid() and self._flusher.is_alive():
+                return
+            self._flusher = threading.Thread(target=self._run, name='stage-timings-flush', daemon=True)
+            self._flusher_pid = os.getpid()
+            self._flusher.start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Ошибка выгрузки длительности этапов обработки выплат")
+
+    def flush(self) -> Dict[str, list]:
+        """Выгрузить накопленное в гистограмму и лог, обнулить счетчики"""
+        with self._lock:
+            stats, self._stats = self._stats, {}
+
+        for stage, (_, _, _, buckets, bucket_ns) in stats.items():
+            self.observe_buckets(PAYOUT_STAGE_SECONDS.labels(stage=stage), buckets, bucket_ns)
+
+        if stats and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Этапы обработки выплат: %s", ", ".join(
+                f"{stage} n={count} avg={total_ns / count / 1e6:.2f}ms max={max_ns / 1e6:.2f}ms"
+                for stage, (count, total_ns, max_ns, _, _) in stats.items()
+            ))
+        return stats
+
+    @staticmethod
+    def observe_buckets(histogram, buckets: list, bucket_ns: list) -> None:
+        """
+        Добавить в гистограмму накопленные корзины через публичный observe
+
+        В корзину попадает buckets[i] наблюдений среднего значения корзины:
+        среднее лежит в ее границах, поэтому счетчики корзин и сумма
+        гистограммы совпадают с исходными замерами. Вызовы observe - в потоке
+        выгрузки, не на пути обработки выплаты.
+        """
+        for count, total_ns in zip(buckets, bucket_ns):
+            if count:
+                value = total_ns / count / 1e9
+                for _ in range(count):
+                    histogram.observe(value)
+
+
+stage_aggregator = StageTimingAggregator(
+    flush_interval=getattr(settings, 'STAGE_TIMINGS_FLUSH_INTERVAL', 10.0),
+)
+
+
+class StageTimer:
+    """Замер этапов обработки одной выплаты по монотонным часам"""
+
+    __slots__ = ('timings',)
+
+    def __init__(self):
+        self.timings: Dict[str, int] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter_ns()
+        try:
+            with tracing.span(f'payout.stage.{name}'):
+                yield
+        finally:
+            elapsed = time.perf_counter_ns() - start
+            self.timings[name] = self.timings.get(name, 0) + elapsed
+            stage_aggregator.record(name, elapsed)
+
+    def breakdown(self) -> Dict[str, float]:
+        """Длительность этапов в миллисекундах, в порядке выполнения"""
+        return {name: round(elapsed / 1e6, 3) for name, elapsed in self.timings.items()}
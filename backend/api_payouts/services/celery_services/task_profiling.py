@@ -0,0 +1,28 @@
+import logging
+
+from celery.signals import task_postrun, task_prerun
+from django.conf import settings
+
+from backend.profiling import Profile, read_token
+
+logger = logging.getLogger(__name__)
+
+_profiles = {}
+
+
+@task_prerun.connect
+def start_task_profile(task_id=None, task=None, **kwargs):
+    """Профилировать задачу, если она поставлена с подписанным заголовком profile"""
+    if not settings.PROFILING['ENABLED'] or task is None:
+        return
+    mode = read_token(getattr(task.request, 'profile', None))
+    if mode is not None:
+        _profiles[task_id] = Profile(mode, name=f'{task.name} {task_id}').start()
+
+
+@task_postrun.connect
+def stop_task_profile(task_id=None, task=None, **kwargs):
+    profile = _profiles.pop(task_id, None)
+    if profile is not None:
+        path = profile.stop()
+        logger.info("Профиль задачи %s[%s] записан в %s", task.name, task_id, path)
@@ -0,0 +1,43 @@
+import time
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+
+COMPACT = 'compact'
+VERBOSE = 'verbose'
+RESULT_MODES = (COMPACT, VERBOSE)
+
+
+def get_result_mode() -> str:
+    return settings.PAYOUT_TASK_RESULTS['MODE']
+
+
+def is_compact() -> bool:
+    return get_result_mode() == COMPACT
+
+
+def task_result(code: str, verbose: Dict[str, Any], started_at: Optional[float] = None,
+                error: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Результат payout_task для бэкенда результатов
+
+    verbose - подробный словарь с сообщениями и разбивкой по этапам;
+    compact - код итога и отметки времени (unix, с точностью до мс),
+    текст ошибки - только для неуспешных итогов, не длиннее ERROR_MAX_LENGTH.
+    """
+    if not is_compact():
+        return verbose
+
+    result = {'code': code}
+    if started_at is not None:
+        result['started_at'] = round(started_at, 3)
+    result['finished_at'] = round(time.time(), 3)
+    if error:
+        result['error'] = str(error)[:settings.PAYOUT_TASK_RESULTS['ERROR_MAX_LENGTH']]
+    return result
+
+
+def report_progress(task, **meta) -> None:
+    """Состояние PROGRESS в бэкенде результатов - только в режиме verbose"""
+    if task is not None and not is_compact():
+        task.update_state(state='PROGRESS', meta=meta)
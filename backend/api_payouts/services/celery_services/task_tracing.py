@@ -0,0 +1,64 @@
+import time
+
+from celery.signals import before_task_publish, task_postrun, task_prerun
+
+from backend import tracing
+from .payout_queue_router import PAYOUT_TASK_NAME
+from .queue_latency import queue_wait_seconds, task_header
+
+_spans = {}
+
+
+@before_task_publish.connect
+def inject_trace_context(sender=None, headers=None, **kwargs):
+    """Контекст текущего спана в заголовок traceparent публикуемой задачи"""
+    if headers is None or tracing.TRACEPARENT_HEADER in headers:
+        return
+    traceparent = tracing.current_traceparent()
+    if traceparent is not None:
+        headers[tracing.TRACEPARENT_HEADER] = traceparent
+
+
+@task_prerun.connect
+def start_task_span(task_id=None, task=None, **kwargs):
+    """
+    Продолжить трассу задачи выплаты
+
+    Ожидание в очереди - отдельный спан queue_wait (от публикации или eta
+    до начала выполнения), обработка - спан задачи, текущий до task_postrun.
+    """
+    if task is None or task.name != PAYOUT_TASK_NAME or not tracing.is_enabled():
+        return
+
+    parent = tracing.parse_traceparent(task_header(task.request, tracing.TRACEPARENT_HEADER))
+    queue = (task.request.delivery_info or {}).get('routing_key') or 'unknown'
+
+    wait = queue_wait_seconds(task.request)
+    if parent is not None and wait is not None:
+        now = time.time_ns()
+        wait_span = tracing.start_span(
+            'payout.queue_wait', parent=parent, start_ns=now - int(wait * 1e9),
+            **{'messaging.destination': queue},
+        )
+        wait_span.end(end_time=now)
+
+    span = tracing.start_span(
+        task.name, parent=parent,
+        **{'celery.task_id': task_id, 'celery.retries': task.request.retries, 'messaging.destination': queue},
+    )
+    _spans[task_id] = (span, tracing.activate(span))
+
+
+@task_postrun.connect
+def end_task_span(task_id=None, state=None, retval=None, **kwargs):
+    entry = _spans.pop(task_id, None)
+    if entry is None:
+        return
+    span, token = entry
+    tracing.deactivate(token)
+    span.set_attribute('celery.state', state)
+    if isinstance(retval, BaseException):
+        tracing.set_error(span, f'{type(retval).__name__}: {retval}')
+    elif isinstance(retval, dict) and retval.get('error'):
+        tracing.set_error(span, str(retval['error']))
+    span.end()
@@ -0,0 +1,120 @@
+import logging
+import os
+import time
+
+from celery.signals import (
+    task_postrun,
+    task_prerun,
+    task_retry,
+    worker_process_init,
+    worker_process_shutdown,
+    worker_ready,
+)
+from django.conf import settings
+from kombu.exceptions import ChannelError
+from prometheus_client import REGISTRY, start_http_server
+from prometheus_client.core import GaugeMetricFamily
+
+from backend.db_pool import discard_inherited_pools, pool_stats_sampler
+
+from ...metrics import PAYOUT_TASK_RETRIES, PAYOUT_TASK_SECONDS
+from .payout_queue_router import PayoutQueueRouter
+from .stage_timer import stage_aggregator
+
+logger = logging.getLogger(__name__)
+
+_task_started = {}
+
+
+class QueueDepthCollector:
+    """Глубина очередей выплат - запрашивается у брокера в момент сбора метрик"""
+
+    def __init__(self, app):
+        self.app = app
+
+    def collect(self):
+        depth = GaugeMetricFamily('payout_queue_depth', 'Сообщений в очереди брокера', labels=['queue'])
+        try:
+            with self.app.connection_for_read() as connection:
+                channel = connection.default_channel
+                for queue in ['celery', *PayoutQueueRouter.get_queues()]:
+                    messages, channel = self.queue_depth(connection, channel, queue)
+                    if messages is not None:
+                        depth.add_metric([queue], messages)
+        except Exception as exc:
+            logger.warning("Не удалось получить глубину очередей: %s", exc)
+        yield depth
+
+    @staticmethod
+    def queue_depth(connection, channel, queue: str):
+        """
+        Глубина одной очереди и канал для следующей
+
+        Пустой очереди в Redis нет (ключ списка удаляется) - пассивное объявление
+        отвечает NOT_FOUND, это 0 сообщений. Ошибка одной очереди не прерывает
+        сбор остальных; закрытый после ошибки канал (AMQP) открывается заново.
+        """
+        try:
+            _, messages, _ = channel.queue_declare(queue=queue, passive=True)
+            return messages, channel
+        except ChannelError as exc:
+            if not getattr(channel, 'is_open', True):
+                channel = connection.channel()
+            if str(exc.reply_code) == '404':
+                return 0, channel
+            logger.warning("Не удалось получить глубину очереди %s: %s", queue, exc)
+            return None, channel
+
+
+@task_prerun.connect
+def start_task_timer(task_id=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def observe_task_duration(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None and task is not None:
+        PAYOUT_TASK_SECONDS.labels(task=task.name, state=state or 'UNKNOWN').observe(time.perf_counter() - started)
+    pool_stats_sampler.maybe_sample()
+
+
+@worker_process_init.connect
+def reset_db_pools(**kwargs):
+    """Дочерний процесс prefork создает свой пул соединений с БД"""
+    discard_inherited_pools()
+
+
+@task_retry.connect
+def count_task_retry(sender=None, reason=None, **kwargs):
+    exc = getattr(reason, 'exc', None) or reason
+    PAYOUT_TASK_RETRIES.labels(task=getattr(sender, 'name', 'unknown'), error_class=type(exc).__name__).inc()
+
+
+@worker_ready.connect
+def start_metrics_exporter(sender=None, **kwargs):
+    """HTTP-экспортер метрик воркера на CELERY_WORKER_METRICS_PORT"""
+    port = getattr(settings, 'CELERY_WORKER_METRICS_PORT', None)
+    if not port:
+        return
+
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import CollectorRegistry, multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    registry.register(QueueDepthCollector(sender.app))
+    start_http_server(port, registry=registry)
+    logger.info("Экспортер метрик воркера запущен на порту %s", port)
+
+
+@worker_process_shutdown.connect
+def mark_process_dead(pid=None, **kwargs):
+    stage_aggregator.flush()
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(pid or os.getpid())
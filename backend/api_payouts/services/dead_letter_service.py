@@ -0,0 +1,98 @@
+import logging
+from typing import Any, Dict, List, Optional
+
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+
+from backend.db_router import shard_for
+
+from ..metrics import PAYOUT_DEAD_LETTERS
+from ..models import Payout, PayoutDeadLetter
+from .celery_services.payout_queue_router import PayoutSource
+from .payout_task_service import PayoutTaskService
+
+logger = logging.getLogger(__name__)
+
+
+class DeadLetterService:
+    """Сервис для работы с выплатами, исчерпавшими попытки обработки"""
+
+    @staticmethod
+    def get_list_dead_letters(error_class: Optional[str] = None, include_requeued: bool = False):
+        """Список записей, по умолчанию - только ожидающие разбора"""
+        queryset = PayoutDeadLetter.objects.all() if include_requeued else PayoutDeadLetter.objects.pending()
+        if error_class:
+            queryset = queryset.filter(error_class=error_class)
+        return queryset.order_by('-created_at')
+
+    @staticmethod
+    def get_dead_letter(dead_letter_id: int) -> PayoutDeadLetter:
+        """Получить запись по ID"""
+        return get_object_or_404(PayoutDeadLetter, id=dead_letter_id)
+
+    @staticmethod
+    def record(payout_id: str, error_class: str, error_message: str,
+               history: List[Dict[str, Any]], task_id: str = '') -> Optional[PayoutDeadLetter]:
+        """Сохранить выплату, исчерпавшую попытки, вместе с историей ошибок"""
+        if not Payout.objects.for_payout(payout_id).filter(id=payout_id).exists():
+            logger.error("Выплата %s не найдена, запись в dead letter пропущена", payout_id)
+            return None
+
+        dead_letter = PayoutDeadLetter.objects.create(
+            payout_id=payout_id,
+            task_id=task_id or '',
+            error_class=error_class,
+            error_message=error_message,
+            attempts=len(history),
+            history=history,
+        )
+        PAYOUT_DEAD_LETTERS.labels(error_class=error_class).inc()
+        logger.error("Выплата %s перенесена в dead letter после %s попыток: %s", payout_id, len(history), error_class)
+        return dead_letter
+
+    @staticmethod
+    def requeue(ids: Optional[List[int]] = None, error_class: Optional[str] = None, limit: int = 100) -> List[int]:
+        """
+        Повторно поставить выплаты в обработку
+
+        Выбирает ожидающие записи по ID или классу ошибки (не больше limit)
+        и сначала фиксирует в основной БД отметку requeued_at - запись не
+        будет поставлена второй раз. Затем каждая выплата в транзакции своего
+        шарда возвращается в pending, задача ставится после коммита шарда.
+        Завершенные и обрабатываемые сейчас выплаты пропускаются.
+        """
+        with transaction.atomic():
+            queryset = PayoutDeadLetter.objects.pending().select_for_update()
+            if ids is not None:
+                queryset = queryset.filter(id__in=ids)
+            if error_class:
+                queryset = queryset.filter(error_class=error_class)
+            dead_letters = list(queryset.order_by('created_at')[:limit])
+            requeued_ids = [dead_letter.id for dead_letter in dead_letters]
+            PayoutDeadLetter.objects.filter(id__in=requeued_ids).update(requeued_at=timezone.now())
+
+        for dead_letter in dead_letters:
+            try:
+                DeadLetterService._requeue_payout(str(dead_letter.payout_id))
+            except Exception:
+                # Транзакция шарда откатилась, задача не поставлена - запись снова ждет разбора
+                logger.exception("Не удалось повторно поставить выплату %s", dead_letter.payout_id)
+                PayoutDeadLetter.objects.filter(id=dead_letter.id).update(requeued_at=None)
+                requeued_ids.remove(dead_letter.id)
+
+        logger.info("Повторно поставлено в обработку %s выплат из dead letter", len(requeued_ids))
+        return requeued_ids
+
+    @staticmethod
+    def _requeue_payout(payout_id: str) -> bool:
+        """Вернуть выплату в pending и поставить задачу - в транзакции БД выплаты"""
+        with transaction.atomic(using=shard_for(payout_id)):
+            payout = Payout.objects.for_payout(payout_id).select_for_update().filter(id=payout_id).first()
+            if payout is None or payout.is_completed() or payout.is_processing():
+                logger.info("Выплата %s не поставлена повторно: нет в БД, завершена или обрабатывается", payout_id)
+                return False
+            payout.mark_as_pending()
+            PayoutTaskService.execute_payout(payout_id, amount=payout.amount, currency=payout.currency,
+                                             source=PayoutSource.BATCH)
+        return True
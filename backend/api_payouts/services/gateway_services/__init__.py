@@ -0,0 +1,19 @@
+from .gateway_client import (
+    BaseGatewayClient,
+    GatewayError,
+    GatewayResponse,
+    HttpGatewayClient,
+    SimulatedGatewayClient,
+    get_gateway_client,
+    reset_gateway_client,
+)
+
+__all__ = (
+    'BaseGatewayClient',
+    'GatewayError',
+    'GatewayResponse',
+    'HttpGatewayClient',
+    'SimulatedGatewayClient',
+    'get_gateway_client',
+    'reset_gateway_client',
+)
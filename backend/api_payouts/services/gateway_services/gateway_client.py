@@ -0,0 +1,167 @@
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .http_connection_pool import HttpConnectionPool
+
+logger = logging.getLogger(__name__)
+
+
+class GatewayError(Exception):
+    """Платежная система отклонила выплату или вернула некорректный ответ"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        self.status_code = status_code
+        super().__init__(message)
+
+
+@dataclass
+class GatewayResponse:
+    """Ответ платежной системы по одной выплате"""
+    payout_id: str
+    accepted: bool
+    transaction_id: Optional[str] = None
+    error: Optional[str] = None
+    raw: Dict[str, Any] = field(default_factory=dict)
+
+
+class BaseGatewayClient:
+    """Базовый клиент платежной системы"""
+
+    def __init__(self, name: str = 'default', **options):
+        self.name = name
+        self.options = options
+
+    def send_payout(self, payout) -> GatewayResponse:
+        """Отправить одну выплату"""
+        raise NotImplementedError
+
+    def send_batch(self, payouts) -> List[GatewayResponse]:
+        """Отправить несколько выплат (по умолчанию - по одной)"""
+        return [self.send_payout(payout) for payout in payouts]
+
+    def close(self) -> None:
+        """Освободить ресурсы клиента"""
+
+    @staticmethod
+    def build_payload(payout) -> Dict[str, Any]:
+        return {
+            'payout_id': str(payout.id),
+            'amount': str(payout.amount),
+            'currency': payout.currency,
+            'recipient_details': payout.recipient_details,
+        }
+
+
+class SimulatedGatewayClient(BaseGatewayClient):
+    """Клиент без сетевого взаимодействия - принимает любую выплату"""
+
+    def send_payout(self, payout) -> GatewayResponse:
+        return GatewayResponse(
+            payout_id=str(payout.id),
+            accepted=True,
+            transaction_id=f"sim-{payout.id}",
+        )
+
+
+class HttpGatewayClient(BaseGatewayClient):
+    """
+    HTTP-клиент платежной системы
+
+    Использует пул постоянных соединений, один на процесс воркера.
+    Пакетная отправка идет одним запросом на /payouts/batch.
+    """
+
+    def __init__(self, url: str, pool_size: int = 10, connect_timeout: float = 3.0,
+                 read_timeout: float = 10.0, **options):
+        super().__init__(**options)
+        self.pool = HttpConnectionPool(
+            url,
+            max_size=pool_size,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+        )
+
+    def send_payout(self, payout) -> GatewayResponse:
+        data = self._post('/payouts', self.build_payload(payout), idempotency_key=str(payout.id))
+        return self._parse(str(payout.id), data)
+
+    def send_batch(self, payouts) -> List[GatewayResponse]:
+        payouts = list(payouts)
+        if not payouts:
+            return []
+        data = self._post('/payouts/batch', {'payouts': [self.build_payload(p) for p in payouts]})
+        results = {item.get('payout_id'): item for item in data.get('results', [])}
+        return [self._parse(str(p.id), results.get(str(p.id), {})) for p in payouts]
+
+    def close(self) -> None:
+        self.pool.close()
+
+    def _post(self, path: str, payload: Dict[str, Any], idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        headers = {'Content-Type': 'application/json'}
+        if idempotency_key:
+            headers['Idempotency-Key'] = idempotency_key
+
+        status, body = self.pool.request('POST', path, body=json.dumps(payload).encode(), headers=headers)
+        if status >= 500:
+            raise ConnectionError(f"Платежная система недоступна: HTTP {status}")
+        try:
+            data = json.loads(body or b'{}')
+        except ValueError:
+            raise GatewayError(f"Некорректный ответ платежной системы: HTTP {status}", status_code=status)
+        if status >= 400:
+            raise GatewayError(data.get('error', f"HTTP {status}"), status_code=status)
+        return data
+
+    @staticmethod
+    def _parse(payout_id: str, data: Dict[str, Any]) -> GatewayResponse:
+        return GatewayResponse(
+            payout_id=payout_id,
+            accepted=data.get('status') == 'accepted',
+            transaction_id=data.get('transaction_id'),
+            error=data.get('error'),
+            raw=data,
+        )
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_gateway_client() -> BaseGatewayClient:
+    """
+    Клиент платежной системы текущего процесса
+
+    Создается лениво по settings.PAYMENT_GATEWAY и пересоздается после fork,
+    чтобы дочерние процессы prefork-пула не делили сокеты родителя.
+    """
+    global _client, _client_pid
+
+    if _client is not None and _client_pid == os.getpid():
+        return _client
+
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            config = dict(getattr(settings, 'PAYMENT_GATEWAY', {}))
+            client_class = import_string(config.pop('CLIENT', 'api_payouts.services.gateway_services.SimulatedGatewayClient'))
+            _client = client_class(**{key.lower(): value for key, value in config.items()})
+            _client_pid = os.getpid()
+    return _client
+
+
+def reset_gateway_client() -> None:
+    """Закрыть и сбросить клиент текущего процесса"""
+    global _client, _client_pid
+
+    with _client_lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
@@ -0,0 +1,111 @@
+import http.client
+import logging
+import queue
+import threading
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+
+class HttpConnectionPool:
+    """
+    Пул постоянных HTTP/1.1 соединений к одному хосту
+
+    Соединения переиспользуются между запросами (keep-alive), возвращаются
+    в пул после чтения ответа и пересоздаются, если сервер их закрыл.
+    """
+
+    def __init__(self, base_url: str, max_size: int = 10, connect_timeout: float = 3.0, read_timeout: float = 10.0):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme or 'http'
+        self.host = parts.hostname
+        self.port = parts.port
+        self.base_path = parts.path.rstrip('/')
+        self.max_size = max_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+
+        self._idle = queue.LifoQueue(maxsize=max_size)
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self.stats = {'created': 0, 'reused': 0, 'discarded': 0}
+
+    def request(self, method: str, path: str, body: Optional[bytes] = None,
+                headers: Optional[Dict[str, str]] = None) -> Tuple[int, bytes]:
+        """Выполнить запрос на соединении из пула, вернуть (статус, тело)"""
+        headers = {'Connection': 'keep-alive', **(headers or {})}
+        if not self._slots.acquire(timeout=self.connect_timeout):
+            raise TimeoutError(f"Нет свободных соединений к {self.host}:{self.port}")
+
+        try:
+            conn, reused = self._checkout()
+            try:
+                return self._send(conn, method, path, body, headers)
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                self._discard(conn)
+                if not reused:
+                    raise
+            except Exception:
+                self._discard(conn)
+                raise
+
+            # Сервер закрыл простаивающее соединение - повторяем один раз на новом
+            conn = self._new_connection()
+            try:
+                return self._send(conn, method, path, body, headers)
+            except Exception:
+                self._discard(conn)
+                raise
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        """Закрыть все простаивающие соединения"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def _send(self, conn, method, path, body, headers) -> Tuple[int, bytes]:
+        conn.timeout = self.read_timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(self.read_timeout)
+        conn.request(method, f"{self.base_path}{path}", body=body, headers=headers)
+        response = conn.getresponse()
+        data = response.read()
+
+        if response.will_close:
+            self._discard(conn)
+        else:
+            self._checkin(conn)
+        return response.status, data
+
+    def _checkout(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            return self._new_connection(), False
+        with self._lock:
+            self.stats['reused'] += 1
+        return conn, True
+
+    def _checkin(self, conn) -> None:
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            self._discard(conn)
+
+    def _discard(self, conn) -> None:
+        with self._lock:
+            self.stats['discarded'] += 1
+        conn.close()
+
+    def _new_connection(self):
+        connection_class = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+        conn = connection_class(self.host, self.port, timeout=self.connect_timeout)
+        conn.connect()
+        with self._lock:
+            self.stats['created'] += 1
+        return conn
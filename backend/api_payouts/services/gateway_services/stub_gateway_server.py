@@ -0,0 +1,108 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from uuid import uuid4
+
+
+class StubGatewayHandler(BaseHTTPRequestHandler):
+    """Обработчик запросов локальной заглушки платежной системы"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.register_connection()
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/health':
+            return self._reply(200, {'status': 'ok'})
+        return self._reply(404, {'error': 'not found'})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return self._reply(400, {'error': 'invalid json'})
+
+        self.server.register_request()
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        path = self.path.rstrip('/')
+        if path == '/payouts':
+            return self._reply(200, self.server.decide(payload))
+        if path == '/payouts/batch':
+            results = [self.server.decide(item) for item in payload.get('payouts', [])]
+            return self._reply(200, {'results': results})
+        return self._reply(404, {'error': 'not found'})
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StubGatewayServer(ThreadingHTTPServer):
+    """
+    Локальная заглушка платежной системы для тестов и бенчмарков
+
+    Держит keep-alive соединения, считает соединения и запросы,
+    умеет добавлять задержку и отклонять долю выплат.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0, reject_rate: float = 0.0):
+        super().__init__((host, port), StubGatewayHandler)
+        self.latency = latency
+        self.reject_rate = reject_rate
+        self.connections = 0
+        self.requests = 0
+        self._counter_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def register_connection(self) -> None:
+        with self._counter_lock:
+            self.connections += 1
+
+    def register_request(self) -> None:
+        with self._counter_lock:
+            self.requests += 1
+
+    def decide(self, payload) -> dict:
+        payout_id = payload.get('payout_id')
+        if self.reject_rate and random.random() < self.reject_rate:
+            return {'payout_id': payout_id, 'status': 'rejected', 'error': 'Отклонено платежной системой'}
+        return {'payout_id': payout_id, 'status': 'accepted', 'transaction_id': uuid4().hex}
+
+    def start(self) -> 'StubGatewayServer':
+        """Запустить сервер в фоновом потоке"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,114 @@
+import logging
+import threading
+import time
+from typing import List
+
+from django.conf import settings
+from django.db import transaction
+
+from backend.db_router import shard_for
+
+from ..metrics import MICRO_CACHE_REFRESHES
+from .gateway_services.http_connection_pool import HttpConnectionPool
+
+logger = logging.getLogger(__name__)
+
+
+def get_config():
+    return settings.MICRO_CACHE
+
+
+class MicroCacheService:
+    """
+    Обновление микрокэша nginx (GET /api/payouts/ и карточек) после изменения выплаты
+
+    В nginx без модуля purge запись заменяется запросом с секретным заголовком
+    REFRESH_HEADER: nginx идет мимо кэша (proxy_cache_bypass), сохраняет свежий
+    ответ и ставит приложению X-Read-Primary - ответ читается с основной БД.
+    Обновляются карточка и первая страница списка без фильтров; остальные
+    варианты списка устаревают не дольше TTL. После коммита выплата только
+    ставится в очередь: фоновый поток раз в DEBOUNCE_SECONDS обновляет
+    карточку каждой выплаты один раз и список один раз на пачку - запрос и
+    задача воркера не ждут nginx.
+    """
+
+    _pool = None
+    _pool_lock = threading.Lock()
+    _pending = set()
+    _pending_lock = threading.Lock()
+    _wakeup = threading.Event()
+    _worker = None
+
+    @classmethod
+    def get_pool(cls) -> HttpConnectionPool:
+        if cls._pool is None:
+            with cls._pool_lock:
+                if cls._pool is None:
+                    config = get_config()
+                    cls._pool = HttpConnectionPool(config['NGINX_URL'], max_size=config['POOL_SIZE'],
+                                                   connect_timeout=config['TIMEOUT'], read_timeout=config['TIMEOUT'])
+        return cls._pool
+
+    @classmethod
+    def on_status_changed(cls, sender, payout, **kwargs):
+        cls.invalidate(payout.id)
+
+    @classmethod
+    def invalidate(cls, payout_id) -> None:
+        """Обновить кэш выплаты после коммита текущей транзакции"""
+        if get_config()['ENABLED']:
+            transaction.on_commit(lambda: cls.schedule(payout_id), using=shard_for(payout_id))
+
+    @classmethod
+    def schedule(cls, payout_id) -> None:
+        """Поставить выплату в очередь фонового обновления"""
+        with cls._pending_lock:
+            cls._pending.add(str(payout_id))
+            cls._start_worker()
+        cls._wakeup.set()
+
+    @classmethod
+    def _start_worker(cls) -> None:
+        # После fork (prefork-воркер Celery, gunicorn) поток родителя в дочернем процессе не живет
+        if cls._worker is None or not cls._worker.is_alive():
+            cls._worker = threading.Thread(target=cls._run, name='micro-cache-refresh', daemon=True)
+            cls._worker.start()
+
+    @classmethod
+    def _run(cls) -> None:
+        while True:
+            cls._wakeup.wait()
+            time.sleep(get_config()['DEBOUNCE_SECONDS'])
+            cls._wakeup.clear()
+            try:
+                cls.flush()
+            except Exception:
+                logger.exception("Ошибка обновления микрокэша")
+
+    @classmethod
+    def flush(cls) -> None:
+        """Обновить кэш всех выплат из очереди"""
+        with cls._pending_lock:
+            payout_ids, cls._pending = cls._pending, set()
+        if payout_ids:
+            cls.refresh(sorted(payout_ids))
+
+    @classmethod
+    def refresh(cls, payout_ids: List[str]) -> None:
+        config = get_config()
+        headers = {config['REFRESH_HEADER']: config['REFRESH_SECRET']}
+        paths = []
+        for path in config['PATHS']:
+            if '{payout_id}' in path:
+                paths.extend(path.format(payout_id=payout_id) for payout_id in payout_ids)
+            else:
+                paths.append(path)
+
+        for path in paths:
+            try:
+                status, _ = cls.get_pool().request('GET', path, headers=headers)
+            except Exception as exc:
+                MICRO_CACHE_REFRESHES.labels(result='failed').inc()
+                logger.warning("Не удалось обновить микрокэш %s: %s", path, exc)
+                continue
+            MICRO_CACHE_REFRESHES.labels(result='refreshed' if status < 500 else 'failed').inc()
@@ -1,6 +1,7 @@
 from typing import List, Dict, Any
 from ..models import Payout
 from ..schemas import PayoutCreateSchema, PayoutUpdateSchema
+from .micro_cache_service import MicroCacheService
 
 
 class PayoutCRUDService:
@@ -8,13 +9,18 @@ class PayoutCRUDService:
 
     @staticmethod
     def get_list_payouts() -> List[Payout]:
-        """Получить все выплаты"""
-        return Payout.objects.all().order_by('-created_at')
+        """Получить все выплаты (из всех шардов)"""
+        return Payout.objects.list_payouts()
 
     @staticmethod
     def get_payout(payout_id: str) -> Payout:
-        """Получить выплату по ID"""
-        return Payout.objects.get_payout(payout_id=payout_id)
+        """Получить выплату по ID вместе с реквизитами получателя"""
+        return Payout.objects.get_payout(payout_id=payout_id, with_recipient=True)
+
+    @staticmethod
+    def get_payout_history(payout_id: str):
+        """История статусов выплаты по порядку переходов (из БД выплаты)"""
+        return Payout.objects.get_payout(payout_id=payout_id).events.all()
 
     @staticmethod
     def create_payout(payload: PayoutCreateSchema) -> Payout:
@@ -27,12 +33,14 @@ class PayoutCRUDService:
     def delete_payout(payout_id: str) -> Dict[str, Any]:
         """Удалить выплату"""
         Payout.objects.delete_payout(payout_id=payout_id)
+        MicroCacheService.invalidate(payout_id)
         return {"success": True}
 
     @staticmethod
     def update_payout(payout_id: str, payload: PayoutUpdateSchema) -> Payout:
         """Обновить заявку - статус или комментарий"""
         payout = Payout.objects.update_payout(payout_id=payout_id, payload=payload.dict(exclude_unset=True))
+        MicroCacheService.invalidate(payout_id)
         return payout
 
 
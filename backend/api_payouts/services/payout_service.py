@@ -1,7 +1,8 @@
 from .payout_crud_service import PayoutCRUDService
 from .payout_task_service import PayoutTaskService
+from .status_stream_service import PayoutStatusStreamService
 
-class PayoutService(PayoutCRUDService, PayoutTaskService):
+class PayoutService(PayoutCRUDService, PayoutTaskService, PayoutStatusStreamService):
     """Сервис для работы с выплатами"""
     pass
 
@@ -1,12 +1,46 @@
 from typing import Dict, Any
+from uuid import uuid4
 from django.db import transaction
-from ..tasks import payout_task
+from backend import tracing
+from backend.db_router import shard_for
+from ..models import Payout
+from .celery_services.payout_queue_router import PayoutQueueRouter, PayoutSource
+
+
+def __getattr__(name):
+    # Задачи и Celery импортируются при первой постановке, а не при загрузке API
+    if name == 'payout_task':
+        from ..tasks import payout_task
+        return payout_task
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class PayoutTaskService:
     """Сервис для работы с фоновыми задачами"""
 
     @staticmethod
-    def execute_payout(payout_id: str, countdown=1) -> Dict[str, Any]:
-        """Фоновая обработка выплаты - запуск"""
-        return transaction.on_commit(lambda: payout_task.apply_async(args=[payout_id], countdown=countdown))
+    def execute_payout(payout_id: str, countdown=1, amount=None, currency=None,
+                       source: str = PayoutSource.API) -> Dict[str, Any]:
+        """
+        Фоновая обработка выплаты - запуск в очередь по приоритету и шарду
+
+        Постановка выполняется после коммита транзакции шарда выплаты в спане
+        payout.dispatch - дочернем для текущего (запроса API); его контекст уходит
+        в заголовке traceparent. ID задачи и время постановки записываются в
+        выплату в транзакции вызывающего - по ним поиск зависших выплат не
+        ставит вторую задачу, пока первая может быть в очереди.
+        """
+        queue = PayoutQueueRouter.get_queue(payout_id, amount=amount, currency=currency, source=source)
+        task_id = str(uuid4())
+        Payout.objects.record_dispatch(payout_id, task_id)
+        parent = tracing.current_context()
+
+        def dispatch():
+            from ..tasks import payout_task
+
+            with tracing.span('payout.dispatch', parent=parent,
+                              **{'payout.id': str(payout_id), 'messaging.destination': queue}):
+                payout_task.apply_async(args=[payout_id], countdown=countdown, queue=queue, task_id=task_id,
+                                        **PayoutQueueRouter.message_options(queue))
+
+        return transaction.on_commit(dispatch, using=shard_for(payout_id))
@@ -0,0 +1,205 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+
+from django.conf import settings
+from django.db import transaction
+
+from ..metrics import PAYOUT_STATUS_EVENTS, PAYOUT_STATUS_SUBSCRIBERS
+from ..models import Payout, Status
+
+logger = logging.getLogger(__name__)
+
+# Статусы, после которых поток одной выплаты закрывается
+FINAL_STATUSES = frozenset({Status.COMPLETED, Status.CANCELLED})
+
+
+def get_config():
+    return settings.STATUS_STREAM
+
+
+def status_event(payout: Payout) -> Dict[str, Any]:
+    """Событие смены статуса - то же для Redis и для клиента"""
+    return {
+        'id': str(payout.id),
+        'status': payout.status,
+        'amount': str(payout.amount),
+        'currency': payout.currency,
+        'updated_at': payout.updated_at.isoformat() if payout.updated_at else None,
+    }
+
+
+class PayoutStatusPublisher:
+    """
+    Публикация смены статуса в Redis pub/sub (канал <CHANNEL_PREFIX><payout_id>)
+
+    Публикуется после коммита транзакции; недоступность Redis не влияет
+    на обработку выплаты - событие теряется, клиент получит статус
+    при переподключении.
+    """
+
+    _redis = None
+
+    @classmethod
+    def redis(cls):
+        if cls._redis is None:
+            import redis  # клиент Redis нужен только при первой публикации
+
+            cls._redis = redis.Redis.from_url(get_config()['REDIS_URL'], socket_timeout=1)
+        return cls._redis
+
+    @classmethod
+    def on_status_changed(cls, sender, payout: Payout, **kwargs):
+        event = status_event(payout)
+        transaction.on_commit(lambda: cls.publish(event), using=payout._state.db)
+
+    @classmethod
+    def publish(cls, event: Dict[str, Any]) -> None:
+        from redis.exceptions import RedisError
+
+        try:
+            cls.redis().publish(get_config()['CHANNEL_PREFIX'] + event['id'], json.dumps(event))
+        except RedisError as exc:
+            PAYOUT_STATUS_EVENTS.labels(result='failed').inc()
+            logger.warning("Не удалось опубликовать статус выплаты %s: %s", event['id'], exc)
+            return
+        PAYOUT_STATUS_EVENTS.labels(result='published').inc()
+
+
+class Subscription:
+    """Подписка на события одной выплаты или по фильтру статуса/валюты"""
+
+    def __init__(self, payout_id: Optional[str] = None, status: Optional[str] = None,
+                 currency: Optional[str] = None, maxsize: int = 100):
+        self.payout_id = payout_id
+        self.status = status
+        self.currency = currency
+        self.queue = asyncio.Queue(maxsize)
+
+    def matches(self, event: Dict[str, Any]) -> bool:
+        return (
+            (self.payout_id is None or event['id'] == self.payout_id)
+            and (self.status is None or event['status'] == self.status)
+            and (self.currency is None or event['currency'] == self.currency)
+        )
+
+    def put(self, event: Dict[str, Any]) -> None:
+        """Положить событие; медленный клиент теряет самые старые события, а не блокирует рассылку"""
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+
+class PayoutStatusBroadcaster:
+    """
+    Рассылка событий подписчикам процесса
+
+    Одно соединение Redis (PSUBSCRIBE <CHANNEL_PREFIX>*) на процесс и
+    цикл событий; подписчики - очереди asyncio, поэтому ожидающий клиент
+    стоит только корутины. Слушатель запускается с первой подписки,
+    останавливается с последней и переподключается при ошибках Redis.
+    """
+
+    def __init__(self):
+        self.subscriptions = set()
+        self._listener = None
+
+    def subscribe(self, **filters) -> Subscription:
+        subscription = Subscription(maxsize=get_config()['QUEUE_SIZE'], **filters)
+        self.subscriptions.add(subscription)
+        PAYOUT_STATUS_SUBSCRIBERS.inc()
+        self._ensure_listener()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        if subscription not in self.subscriptions:
+            return
+        self.subscriptions.discard(subscription)
+        PAYOUT_STATUS_SUBSCRIBERS.dec()
+        if not self.subscriptions and self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+
+    def dispatch(self, event: Dict[str, Any]) -> None:
+        for subscription in list(self.subscriptions):
+            if subscription.matches(event):
+                subscription.put(event)
+
+    def _ensure_listener(self):
+        loop = asyncio.get_running_loop()
+        if self._listener is None or self._listener.done() or self._listener.get_loop() is not loop:
+            self._listener = loop.create_task(self._listen())
+
+    async def _listen(self):
+        import redis.asyncio as aioredis
+        from redis.exceptions import RedisError
+
+        config = get_config()
+        while True:
+            client = aioredis.Redis.from_url(config['REDIS_URL'])
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.psubscribe(config['CHANNEL_PREFIX'] + '*')
+                async for message in pubsub.listen():
+                    try:
+                        self.dispatch(json.loads(message['data']))
+                    except (ValueError, KeyError, TypeError):
+                        logger.warning("Некорректное событие статуса выплаты: %r", message.get('data'))
+            except RedisError as exc:
+                logger.warning("Подписка на статусы выплат прервана: %s", exc)
+            finally:
+                await pubsub.aclose()
+                await client.aclose()
+            await asyncio.sleep(config['RECONNECT_DELAY'])
+
+
+broadcaster = PayoutStatusBroadcaster()
+
+
+class PayoutStatusStreamService:
+    """Поток статусов выплат в формате Server-Sent Events"""
+
+    @staticmethod
+    def format_event(event: Dict[str, Any]) -> str:
+        return f"event: status\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+    @staticmethod
+    async def stream_statuses(payout: Optional[Payout] = None, status: Optional[str] = None,
+                              currency: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        События смены статуса
+
+        Для одной выплаты первым отдается текущее состояние, поток
+        закрывается на итоговом статусе. Раз в HEARTBEAT секунд - комментарий
+        для прокси и балансировщиков; через MAX_DURATION секунд поток
+        закрывается, клиент (EventSource) переподключается через RETRY_MS.
+        """
+        config = get_config()
+        payout_id = str(payout.id) if payout is not None else None
+        subscription = broadcaster.subscribe(payout_id=payout_id, status=status, currency=currency)
+        deadline = time.monotonic() + config['MAX_DURATION']
+        try:
+            yield f"retry: {config['RETRY_MS']}\n\n"
+            if payout is not None:
+                # Подписка оформлена до снимка: переход между ними не теряется
+                await payout.arefresh_from_db()
+                yield PayoutStatusStreamService.format_event(status_event(payout))
+                if payout.status in FINAL_STATUSES:
+                    return
+
+            while (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    event = await asyncio.wait_for(
+                        subscription.queue.get(), timeout=min(config['HEARTBEAT'], remaining)
+                    )
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+
+                yield PayoutStatusStreamService.format_event(event)
+                if payout_id is not None and event['status'] in FINAL_STATUSES:
+                    return
+        finally:
+            broadcaster.unsubscribe(subscription)
@@ -0,0 +1,9 @@
+from .webhook_delivery_service import WebhookDeliveryError, WebhookDeliveryService, sign
+from .webhook_service import WebhookService
+
+__all__ = (
+    'WebhookDeliveryError',
+    'WebhookDeliveryService',
+    'WebhookService',
+    'sign',
+)
@@ -0,0 +1,102 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from .webhook_delivery_service import SIGNATURE_HEADER, sign
+
+
+class StubWebhookHandler(BaseHTTPRequestHandler):
+    """Обработчик запросов локального получателя webhook"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.register_connection()
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        status = self.server.receive(body, self.headers.get(SIGNATURE_HEADER, ''))
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubWebhookReceiver(ThreadingHTTPServer):
+    """
+    Локальный получатель webhook для тестов
+
+    Сохраняет принятые пачки событий, проверяет подпись (если задан secret),
+    умеет отвечать с задержкой и отклонять первые fail_requests запросов.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, secret: Optional[str] = None,
+                 latency: float = 0.0, fail_requests: int = 0):
+        super().__init__((host, port), StubWebhookHandler)
+        self.secret = secret
+        self.latency = latency
+        self.fail_requests = fail_requests
+        self.batches = []
+        self.connections = 0
+        self.requests = 0
+        self._counter_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/webhooks/"
+
+    @property
+    def events(self) -> list:
+        return [event for batch in self.batches for event in batch['events']]
+
+    def register_connection(self) -> None:
+        with self._counter_lock:
+            self.connections += 1
+
+    def receive(self, body: bytes, signature: str) -> int:
+        """HTTP-статус ответа на пачку"""
+        with self._counter_lock:
+            self.requests += 1
+            if self.requests <= self.fail_requests:
+                return 503
+        if self.secret is not None and not self.verify(body, signature):
+            return 401
+        with self._counter_lock:
+            self.batches.append(json.loads(body))
+        return 200
+
+    def verify(self, body: bytes, signature: str) -> bool:
+        fields = dict(part.split('=', 1) for part in signature.split(',') if '=' in part)
+        timestamp = fields.get('t', '')
+        return timestamp.isdigit() and sign(self.secret, int(timestamp), body) == signature
+
+    def start(self) -> 'StubWebhookReceiver':
+        """Запустить сервер в фоновом потоке"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
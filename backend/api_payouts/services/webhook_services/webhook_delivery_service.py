@@ -0,0 +1,228 @@
+import hashlib
+import hmac
+import json
+import logging
+import threading
+import time
+from datetime import timedelta
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from ...metrics import WEBHOOK_DELIVERIES, WEBHOOK_DELIVERY_SECONDS
+from ...models import WebhookEndpoint, WebhookEvent
+from ..celery_services.retry_policy import RetryPolicy
+from ..gateway_services.http_connection_pool import HttpConnectionPool
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = 'X-Webhook-Signature'
+
+
+def sign(secret: str, timestamp: int, body: bytes) -> str:
+    """Подпись пачки: t=<unix time>,v1=<HMAC-SHA256(secret, "<t>.<body>")>"""
+    digest = hmac.new(secret.encode(), f'{timestamp}.'.encode() + body, hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={digest}'
+
+
+class WebhookDeliveryError(Exception):
+    """Получатель не принял пачку событий"""
+
+
+class WebhookDeliveryService:
+    """
+    Доставка событий одному получателю
+
+    У каждого получателя своя очередь - недоставленные события по порядку.
+    Одновременно доставку получателю выполняет одна задача (аренда
+    locked_until на LEASE_SECONDS, продлевается перед каждой пачкой),
+    события уходят пачками до BATCH_SIZE; при ошибке -
+    пауза получателя с экспонентой и полным джиттером, остальные
+    получатели доставляются независимо. Соединения к хосту переиспользуются.
+    """
+
+    _pools: Dict[str, HttpConnectionPool] = {}
+    _pools_lock = threading.Lock()
+
+    def __init__(self, endpoint_id: int):
+        self.endpoint_id = endpoint_id
+        self.config = settings.WEBHOOKS
+        # Срок аренды, выставленный этим запуском: продление и снятие - только пока он не изменился
+        self._lease_until = None
+
+    @classmethod
+    def get_pool(cls, url: str) -> HttpConnectionPool:
+        """Пул соединений процесса к хосту получателя"""
+        parts = urlsplit(url)
+        origin = f'{parts.scheme}://{parts.netloc}'
+        pool = cls._pools.get(origin)
+        if pool is None:
+            with cls._pools_lock:
+                pool = cls._pools.get(origin)
+                if pool is None:
+                    config = settings.WEBHOOKS
+                    pool = cls._pools[origin] = HttpConnectionPool(
+                        origin,
+                        max_size=config['POOL_SIZE'],
+                        connect_timeout=config['CONNECT_TIMEOUT'],
+                        read_timeout=config['READ_TIMEOUT'],
+                    )
+        return pool
+
+    @classmethod
+    def close_pools(cls) -> None:
+        with cls._pools_lock:
+            for pool in cls._pools.values():
+                pool.close()
+            cls._pools.clear()
+
+    def retry_policy(self) -> RetryPolicy:
+        retry = self.config['RETRY']
+        return RetryPolicy(max_retries=retry['MAX_ATTEMPTS'], base_delay=retry['BASE_DELAY'],
+                           max_delay=retry['MAX_DELAY'])
+
+    def deliver(self) -> Dict[str, object]:
+        """
+        Отправить накопленные события пачками
+
+        Возвращает число доставленных событий, есть ли еще события
+        (delivered, more) и задержку повтора после ошибки (retry_in).
+        """
+        result = {'delivered': 0, 'more': False, 'retry_in': None}
+        if not self._acquire():
+            return result
+
+        try:
+            endpoint = WebhookEndpoint.objects.get(id=self.endpoint_id)
+            for batch in range(self.config['MAX_BATCHES_PER_RUN']):
+                if batch and not self._renew():
+                    logger.warning("Webhook %s: аренда доставки потеряна, запуск остановлен", self.endpoint_id)
+                    return result
+                events = list(
+                    WebhookEvent.objects.pending().filter(endpoint=endpoint).order_by('id')[:self.config['BATCH_SIZE']]
+                )
+                if not events:
+                    return result
+                try:
+                    self._send(endpoint, events)
+                except (WebhookDeliveryError, OSError) as exc:
+                    result['retry_in'] = self._on_failure(endpoint, events, exc)
+                    return result
+                self._on_success(endpoint, events)
+                result['delivered'] += len(events)
+
+            result['more'] = WebhookEvent.objects.pending().filter(endpoint=endpoint).exists()
+            return result
+        finally:
+            self._release()
+
+    def _send(self, endpoint: WebhookEndpoint, events: List[WebhookEvent]) -> None:
+        body = json.dumps({
+            'events': [
+                {'id': event.id, 'type': f'payout.{event.status}', 'created_at': event.created_at.isoformat(),
+                 'data': event.payload}
+                for event in events
+            ],
+        }, ensure_ascii=False).encode()
+        parts = urlsplit(endpoint.url)
+        path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+
+        start = time.perf_counter()
+        try:
+            status, _ = self.get_pool(endpoint.url).request('POST', path, body=body, headers={
+                'Content-Type': 'application/json',
+                'User-Agent': 'payouts-webhooks/1.0',
+                SIGNATURE_HEADER: sign(endpoint.secret, int(time.time()), body),
+            })
+        finally:
+            WEBHOOK_DELIVERY_SECONDS.observe(time.perf_counter() - start)
+        if not 200 <= status < 300:
+            raise WebhookDeliveryError(f'HTTP {status}')
+
+    def _on_success(self, endpoint: WebhookEndpoint, events: List[WebhookEvent]) -> None:
+        WebhookEvent.objects.filter(id__in=[event.id for event in events]).update(delivered_at=timezone.now())
+        WEBHOOK_DELIVERIES.labels(result='delivered').inc(len(events))
+        if endpoint.failure_count or endpoint.next_attempt_at:
+            endpoint.failure_count = 0
+            endpoint.next_attempt_at = None
+            endpoint.last_error = ''
+            endpoint.save(update_fields=['failure_count', 'next_attempt_at', 'last_error'])
+
+    def _on_failure(self, endpoint: WebhookEndpoint, events: List[WebhookEvent], exc: Exception) -> float:
+        """Пауза получателя по политике повторов; события, исчерпавшие попытки, отбрасываются"""
+        policy = self.retry_policy()
+        now = timezone.now()
+        ids = [event.id for event in events]
+        exhausted = [event.id for event in events if event.attempts + 1 >= policy.max_retries]
+
+        WebhookEvent.objects.filter(id__in=ids).update(attempts=F('attempts') + 1)
+        if exhausted:
+            WebhookEvent.objects.filter(id__in=exhausted).update(failed_at=now)
+            WEBHOOK_DELIVERIES.labels(result='dropped').inc(len(exhausted))
+        WEBHOOK_DELIVERIES.labels(result='failed').inc(len(events) - len(exhausted))
+
+        endpoint.failure_count += 1
+        delay = policy.countdown(endpoint.failure_count - 1)
+        endpoint.next_attempt_at = now + timedelta(seconds=delay)
+        endpoint.last_error = str(exc)[:1000]
+        endpoint.save(update_fields=['failure_count', 'next_attempt_at', 'last_error'])
+        logger.warning(
+            "Webhook %s: доставка %s событий не удалась (%s), повтор через %.1f сек",
+            endpoint.id, len(events), exc, delay,
+        )
+        return delay
+
+    def _acquire(self) -> bool:
+        """Аренда доставки получателю: не занят другой задачей и не на паузе после ошибки"""
+        now = timezone.now()
+        lease_until = now + timedelta(seconds=self.config['LEASE_SECONDS'])
+        acquired = bool(
+            WebhookEndpoint.objects
+            .filter(id=self.endpoint_id, is_active=True)
+            .filter(Q(locked_until__isnull=True) | Q(locked_until__lt=now))
+            .filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now))
+            .update(locked_until=lease_until)
+        )
+        if acquired:
+            self._lease_until = lease_until
+        return acquired
+
+    def _renew(self) -> bool:
+        """
+        Продлить аренду перед следующей пачкой
+
+        Аренда покрывает одну пачку (LEASE_SECONDS больше CONNECT_TIMEOUT +
+        READ_TIMEOUT), а не весь запуск из MAX_BATCHES_PER_RUN пачек. False -
+        аренда истекла и ее взяла другая задача: этот запуск останавливается.
+        """
+        lease_until = timezone.now() + timedelta(seconds=self.config['LEASE_SECONDS'])
+        renewed = bool(
+            WebhookEndpoint.objects
+            .filter(id=self.endpoint_id, locked_until=self._lease_until)
+            .update(locked_until=lease_until)
+        )
+        if renewed:
+            self._lease_until = lease_until
+        return renewed
+
+    def _release(self) -> None:
+        """Снять аренду, если ее не перехватила другая задача после истечения"""
+        WebhookEndpoint.objects.filter(id=self.endpoint_id, locked_until=self._lease_until).update(locked_until=None)
+
+    @staticmethod
+    def due_endpoint_ids(limit: Optional[int] = None) -> List[int]:
+        """Получатели с недоставленными событиями, не занятые и не на паузе (для периодической задачи)"""
+        now = timezone.now()
+        queryset = (
+            WebhookEndpoint.objects
+            .filter(is_active=True)
+            .filter(Exists(WebhookEvent.objects.pending().filter(endpoint=OuterRef('pk'))))
+            .filter(Q(locked_until__isnull=True) | Q(locked_until__lt=now))
+            .filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now))
+            .order_by('id')
+            .values_list('id', flat=True)
+        )
+        return list(queryset[:limit] if limit else queryset)
@@ -0,0 +1,129 @@
+import logging
+import secrets
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.shortcuts import get_object_or_404
+
+from ...models import Payout, WebhookEndpoint, WebhookEvent
+from ..status_stream_service import status_event
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookService:
+    """Подписки на уведомления и запись событий в очереди доставки"""
+
+    @staticmethod
+    def config() -> dict:
+        return settings.WEBHOOKS
+
+    @staticmethod
+    def get_list_endpoints():
+        return WebhookEndpoint.objects.filter(is_active=True).order_by('-created_at')
+
+    @staticmethod
+    def get_endpoint(endpoint_id: int) -> WebhookEndpoint:
+        return get_object_or_404(WebhookEndpoint, id=endpoint_id, is_active=True)
+
+    @classmethod
+    def create_endpoint(cls, url: str, event_types: Optional[List[str]] = None,
+                        secret: Optional[str] = None) -> WebhookEndpoint:
+        """Зарегистрировать получателя; секрет подписи генерируется, если не задан"""
+        return WebhookEndpoint.objects.create(
+            url=url,
+            event_types=list(event_types or cls.config()['EVENT_TYPES']),
+            secret=secret or secrets.token_hex(32),
+        )
+
+    @classmethod
+    def delete_endpoint(cls, endpoint_id: int) -> Dict[str, Any]:
+        """Отключить подписку; недоставленные события больше не отправляются"""
+        endpoint = cls.get_endpoint(endpoint_id)
+        endpoint.is_active = False
+        endpoint.save(update_fields=['is_active'])
+        return {"success": True}
+
+    @classmethod
+    def on_status_changed(cls, sender, payout: Payout, status: str, **kwargs):
+        """
+        Записать событие для подписчиков статуса
+
+        События лежат в default: для выплаты оттуда же запись идет в транзакции
+        смены статуса, для выплаты из другого шарда - сразу после коммита ее
+        транзакции (атомарной записи между БД нет). Доставка ставится в очередь
+        после коммита - одна задача на получателя (schedule_delivery).
+        """
+        if status not in cls.config()['EVENT_TYPES']:
+            return
+
+        payload = status_event(payout)
+        if payout._state.db in (None, DEFAULT_DB_ALIAS):
+            cls.record_events(payout.pk, status, payload)
+        else:
+            transaction.on_commit(lambda: cls.record_events(payout.pk, status, payload), using=payout._state.db)
+
+    @classmethod
+    def record_events(cls, payout_id, status: str, payload: Dict[str, Any]) -> None:
+        endpoints = [
+            endpoint for endpoint in WebhookEndpoint.objects.filter(is_active=True).only('id', 'event_types')
+            if status in endpoint.event_types
+        ]
+        if not endpoints:
+            return
+
+        WebhookEvent.objects.bulk_create([
+            WebhookEvent(endpoint=endpoint, payout_id=payout_id, status=status, payload=payload)
+            for endpoint in endpoints
+        ])
+
+        for endpoint in endpoints:
+            transaction.on_commit(lambda endpoint_id=endpoint.id: cls.schedule_delivery(endpoint_id))
+
+    @classmethod
+    def schedule_delivery(cls, endpoint_id: int, countdown: Optional[float] = None) -> bool:
+        """
+        Поставить задачу доставки получателю, если она еще не стоит в очереди
+
+        Флаг в Redis (SET NX на SCHEDULE_TTL секунд) объединяет события до старта
+        задачи в одну постановку, задача снимает флаг при старте (clear_scheduled).
+        Повтор после паузы (countdown) ставится всегда, флаг продлевается на паузу.
+        Без Redis задача ставится без объединения - дубли отсекает аренда получателя.
+        """
+        # Локальный импорт: задачи импортируют сервисы, клиент Redis - только при первой постановке
+        from redis.exceptions import RedisError
+        from ...tasks import deliver_webhooks
+
+        config = cls.config()
+        ttl = config['SCHEDULE_TTL'] + int(countdown or 0)
+        try:
+            scheduled = cls._redis().set(cls._scheduled_key(endpoint_id), 1, ex=ttl, nx=countdown is None)
+        except RedisError as exc:
+            logger.warning("Флаг постановки webhook %s недоступен, ставлю задачу: %s", endpoint_id, exc)
+            scheduled = True
+        if not scheduled:
+            return False
+
+        options = {'countdown': countdown} if countdown is not None else {}
+        deliver_webhooks.apply_async(args=[endpoint_id], queue=config['QUEUE'], **options)
+        return True
+
+    @classmethod
+    def clear_scheduled(cls, endpoint_id: int) -> None:
+        """Снять флаг постановки при старте доставки: новые события поставят следующую задачу"""
+        from redis.exceptions import RedisError
+
+        try:
+            cls._redis().delete(cls._scheduled_key(endpoint_id))
+        except RedisError as exc:
+            logger.warning("Не удалось снять флаг постановки webhook %s: %s", endpoint_id, exc)
+
+    @classmethod
+    def _scheduled_key(cls, endpoint_id: int) -> str:
+        return f"{cls.config()['SCHEDULE_KEY_PREFIX']}:{endpoint_id}"
+
+    @classmethod
+    def _redis(cls):
+        from django_redis import get_redis_connection
+        return get_redis_connection(cls.config()['CACHE_ALIAS'])
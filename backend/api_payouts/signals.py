@@ -0,0 +1,4 @@
+from django.dispatch import Signal
+
+# Смена статуса выплаты через Payout.mark_as_*: sender=Payout, payout, status
+payout_status_changed = Signal()
@@ -1,45 +1,168 @@
 from celery import shared_task
+from backend.celery import app as celery_app  # noqa: F401 - задачи регистрируются в приложении проекта
 import logging
-from .services.celery_services.payout_task_proccessing_service import PayoutProcessingService, ProcessingInProgress, StopProcessing
+import time
+from uuid import uuid4
+from django.utils import timezone
+from .models import Payout
+from .services.celery_services.payout_task_proccessing_service import (
+    PayoutProcessingService,
+    RateLimited,
+    StopProcessing,
+)
+from .services.celery_services import queue_latency  # noqa: F401 - сигналы учета ожидания в очереди
+from .services.celery_services import worker_metrics  # noqa: F401 - метрики и экспортер воркера
+from .services.celery_services import task_profiling  # noqa: F401 - профилирование задач по заголовку
+from .services.celery_services import task_tracing  # noqa: F401 - трассировка API -> очередь -> обработка
+from .services.celery_services.payout_queue_router import PayoutQueueRouter
+from .services.celery_services.retry_policy import error_class_name, get_retry_policy, history_kwargsrepr
+from .services.celery_services.task_results import task_result
+from .services.celery_services.payout_sweeper_service import PayoutSweeperService
+from .services.webhook_services import WebhookDeliveryService, WebhookService
+from backend.structured_logging import bind_log_context
 
 logger = logging.getLogger(__name__)
 
 
 @shared_task(
     bind=True,
-    max_retries=3,
-    default_retry_delay=30,
-    autoretry_for=(ConnectionError, TimeoutError),
-    retry_backoff=True,
+    # Число повторов ограничивают политики по классам ошибок (PAYOUT_RETRY_POLICIES)
+    max_retries=None,
     ignore_result=False,
     acks_late=True,
 )
-def payout_task(self, payout_id):
+def payout_task(self, payout_id, history=None):
     """
     Асинхронная задача обработки выплаты
 
     1. Принимает идентификатор созданной заявки (payout_id)
     2. Имитирует обработку (задержка, логирование, проверки)
     3. Изменяет статус заявки после обработки
+
+    history - накопленная история ошибок предыдущих попыток
+    """
+    history = list(history or [])
+
+    started_at = time.time()
+
+    with bind_log_context(payout_id=str(payout_id), task_id=self.request.id):
+        try:
+            service = PayoutProcessingService(payout_id, task=self, attempt=len(history) + 1)
+            return service.process()
+
+        except RateLimited as exc:
+            # Лимит платежной системы исчерпан: ставим задачу заново с задержкой
+            # в ту же очередь, не занимая слот воркера и не расходуя попытки retry
+            queue = (self.request.delivery_info or {}).get('routing_key')
+            task_id = str(uuid4())
+            Payout.objects.record_dispatch(payout_id, task_id)
+            self.apply_async(
+                args=[payout_id],
+                kwargs={'history': history},
+                countdown=exc.retry_after,
+                queue=queue,
+                task_id=task_id,
+                kwargsrepr=history_kwargsrepr(history),
+                **PayoutQueueRouter.message_options(queue),
+            )
+            return task_result('deferred', {
+                'success': False,
+                'payout_id': payout_id,
+                'deferred': True,
+                'retry_after': exc.retry_after,
+            })
+
+        except StopProcessing as exc:
+            # Обработка уже завершена или не требуется
+            if exc.result is not None:
+                return exc.result
+            return task_result('skipped', {
+                'success': True,
+                'payout_id': payout_id,
+                'message': 'Обработка уже была выполнена'
+            }, started_at=started_at)
+
+        except Exception as exc:
+            return _retry_or_dead_letter(self, payout_id, history, exc)
+
+
+def _retry_or_dead_letter(task, payout_id, history, exc):
+    """
+    Повтор по политике класса ошибки или перенос в dead letter
+
+    Задержка - экспонента с полным джиттером по числу ошибок этого класса;
+    после исчерпания попыток выплата сохраняется с историей ошибок.
     """
+    error_class = error_class_name(exc)
+    history.append({
+        'attempt': task.request.retries + 1,
+        'error_class': error_class,
+        'error': str(exc)[:1000],
+        'at': timezone.now().isoformat(),
+    })
 
-    try:
-        service = PayoutProcessingService(payout_id, task=self)
-        return service.process()
+    policy = get_retry_policy(exc)
+    class_failures = sum(1 for entry in history if entry['error_class'] == error_class)
 
-    except ProcessingInProgress as exc:
-        # Если обработка уже идет, ждем и пробуем снова
-        logger.info(f"Обработка выплаты {payout_id} уже выполняется, повтор через 10 секунд")
-        raise self.retry(countdown=10, exc=exc)
+    if class_failures > policy.max_retries:
+        # Локальный импорт: сервис dead letter ставит задачи через PayoutTaskService
+        from .services.dead_letter_service import DeadLetterService
 
-    except StopProcessing as exc:
-        # Обработка уже завершена или не требуется
-        return exc.result if hasattr(exc, 'result') else {
-            'success': True,
+        DeadLetterService.record(
+            payout_id=payout_id,
+            error_class=error_class,
+            error_message=str(exc),
+            history=history,
+            task_id=task.request.id or '',
+        )
+        return task_result('dead_letter', {
+            'success': False,
             'payout_id': payout_id,
-            'message': 'Обработка уже была выполнена'
-        }
+            'dead_letter': True,
+            'error': str(exc),
+        }, error=str(exc))
+
+    countdown = policy.countdown(class_failures - 1)
+    logger.error("Ошибка в задаче обработки выплаты %s: %s, повтор через %.1f сек", payout_id, str(exc), countdown)
+    queue = (task.request.delivery_info or {}).get('routing_key')
+    raise task.retry(exc=exc, countdown=countdown, kwargs={'history': history},
+                     kwargsrepr=history_kwargsrepr(history), **PayoutQueueRouter.message_options(queue))
+
+
+@shared_task(ignore_result=True)
+def sweep_stuck_payouts():
+    """
+    Периодическая задача (Celery beat): поиск зависших выплат
+
+    pending без задачи в очереди ставятся заново, processing после
+    падения воркера переводятся в ошибку - по правилам PAYOUT_SWEEPER.
+    """
+    counts = PayoutSweeperService.sweep()
+    logger.info("Проверка зависших выплат завершена: %s", counts)
+    return counts
+
+
+@shared_task(ignore_result=True)
+def deliver_webhooks(endpoint_id):
+    """
+    Доставка накопленных событий одному получателю webhook
+
+    После ошибки задача ставится заново к концу паузы получателя,
+    при оставшихся событиях - сразу, чтобы не занимать воркер одним получателем.
+    """
+    WebhookService.clear_scheduled(endpoint_id)
+    result = WebhookDeliveryService(endpoint_id).deliver()
+    if result['retry_in'] is not None:
+        WebhookService.schedule_delivery(endpoint_id, countdown=result['retry_in'])
+    elif result['more']:
+        WebhookService.schedule_delivery(endpoint_id)
+    return result
+
 
-    except Exception as exc:
-        logger.error(f"Ошибка в задаче обработки выплаты {payout_id}: {str(exc)}")
-        raise self.retry(exc=exc)
\ No newline at end of file
+@shared_task(ignore_result=True)
+def deliver_pending_webhooks():
+    """Периодическая задача (Celery beat): доставка событий, оставшихся без задачи в очереди"""
+    endpoint_ids = WebhookDeliveryService.due_endpoint_ids()
+    for endpoint_id in endpoint_ids:
+        WebhookService.schedule_delivery(endpoint_id)
+    return len(endpoint_ids)
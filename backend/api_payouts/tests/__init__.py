@@ -1,5 +1,8 @@
 import django
 import os
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
-django.setup()
\ No newline at end of file
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings_pytest')
+django.setup()
+
+# Подключаем роутеры к основному API до того, как тесты создадут TestClient(router)
+import backend.urls  # noqa: E402,F401
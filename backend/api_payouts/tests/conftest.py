@@ -1,10 +1,13 @@
 import pytest
 from decimal import Decimal
 from django.test import Client
+from django.urls import get_resolver
 from ninja.testing import TestClient
 
 from api_payouts.models import Payout, Currency, Status
 from api_payouts.api import router
+from backend.middleware.query_budget import check_query_budget
+from backend.query_counter import count_queries
 
 
 @pytest.fixture
@@ -54,4 +57,37 @@ def update_data():
     return {
         "status": Status.COMPLETED,
         "description": "Updated description"
-    }
\ No newline at end of file
+    }
+
+def api_routes():
+    """Шаблоны маршрутов основного API по имени URL (как resolver_match.route в middleware)"""
+    return {
+        pattern.name: f'{resolver.pattern}{pattern.pattern}'
+        for resolver in get_resolver().url_patterns
+        for pattern in getattr(resolver, 'url_patterns', [])
+        if getattr(pattern, 'name', None)
+    }
+
+
+@pytest.fixture(autouse=True)
+def query_budget(settings, monkeypatch):
+    """
+    Строгие бюджеты SQL-запросов: превышение QUERY_BUDGETS валит тест
+
+    TestClient(router) вызывает обработчик в обход middleware - запросы
+    считаются здесь и сверяются с бюджетом маршрута основного API.
+    """
+    settings.QUERY_BUDGETS = {**settings.QUERY_BUDGETS, 'MODE': 'raise'}
+    routes = api_routes()
+    call = TestClient._call
+
+    def call_with_budget(client, func, request, kwargs):
+        url_path = request.path.split('?')[0].lstrip('/')
+        url = next(url for url in client.urls if url.resolve(url_path))
+        with count_queries() as queries:
+            response = call(client, func, request, kwargs)
+        check_query_budget(request.method, routes.get(url.name, 'unresolved'), queries.count)
+        return response
+
+    monkeypatch.setattr(TestClient, '_call', call_with_budget)
+    return settings.QUERY_BUDGETS
@@ -1,13 +1,25 @@
+import json
+import os
+import pstats
+import shutil
+import tempfile
 import uuid
 from decimal import Decimal
 from unittest.mock import patch, MagicMock
-from django.test import TestCase
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, Client, override_settings
 from django.utils import timezone
 from ninja.testing import TestClient
 
-from api_payouts.models import Payout, Currency, Status
-from api_payouts.api import router
+from api_payouts.models import Payout, PayoutDeadLetter, Currency, Status
+from api_payouts.api import router, dead_letter_router
 from api_payouts.schemas import PayoutCreateSchema, CardSchema, PayoutResponseSchema, PayoutUpdateSchema
+from api_payouts.services.celery_services.payout_queue_router import PayoutSource
+from api_payouts.services.celery_services.task_profiling import start_task_profile, stop_task_profile
+from backend.middleware.query_budget import QueryBudgetExceeded
+from backend.profiling import make_token, task_headers
 
 
 class PayoutAPITestCase(TestCase):
@@ -51,6 +63,8 @@ class PayoutAPITestCase(TestCase):
         # Проверяем пагинацию
         self.assertIn("items", response.json())
         self.assertIn("count", response.json())
+        # Реквизиты получателя - только в ответе по ID
+        self.assertNotIn("recipient_details", response.json()["items"][0])
 
     def test_get_payout_success(self):
         """Тест получения конкретной выплаты"""
@@ -62,6 +76,16 @@ class PayoutAPITestCase(TestCase):
         self.assertEqual(str(self.payout.id), data["id"])
         self.assertEqual(str(self.payout.amount), data["amount"])
         self.assertEqual(self.payout.currency.value, data["currency"])
+        self.assertEqual(data["recipient_details"], self.card_data)
+
+    @override_settings(QUERY_BUDGETS={'MODE': 'raise', 'ROUTES': {'GET api/payouts/<payout_id>/': 0}})
+    def test_test_client_checks_query_budget(self):
+        """Тест: запросы TestClient(router) в обход middleware тоже сверяются с бюджетом маршрута"""
+        with self.assertRaises(QueryBudgetExceeded) as ctx:
+            self.client.get(f"/{self.payout.id}/")
+
+        self.assertEqual(ctx.exception.key, 'GET api/payouts/<payout_id>/')
+        self.assertEqual(ctx.exception.count, 1)
 
     def test_get_payout_not_found(self):
         """Тест получения несуществующей выплаты"""
@@ -95,7 +119,9 @@ class PayoutAPITestCase(TestCase):
 
         self.assertEqual(response.status_code, 200)
         mock_create.assert_called_once()
-        mock_execute.assert_called_once_with(str(mock_payout.id))
+        mock_execute.assert_called_once_with(
+            str(mock_payout.id), amount=mock_payout.amount, currency=mock_payout.currency
+        )
 
     def test_create_payout_validation_error(self):
         """Тест создания выплаты с невалидными данными"""
@@ -232,4 +258,324 @@ class PayoutAPITestCase(TestCase):
         data = response.json()
         self.assertIn("items", data)
         self.assertIn("count", data)
-        self.assertLessEqual(len(data["items"]), 10)  # page_size=10
\ No newline at end of file
+        self.assertLessEqual(len(data["items"]), 10)  # page_size=10
+
+    def test_payout_history(self):
+        """Тест истории статусов: переходы по порядку, постранично"""
+        self.payout.mark_as_processing(attempt=1)
+        self.payout.mark_as_failed("Таймаут шлюза", attempt=1)
+
+        response = self.client.get(f"/{self.payout.id}/history/")
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["count"], 2)
+        self.assertEqual(
+            [(item["from_status"], item["to_status"], item["attempt"]) for item in data["items"]],
+            [("pending", "processing", 1), ("processing", "failed", 1)],
+        )
+        self.assertEqual(data["items"][1]["error"], "Таймаут шлюза")
+
+    def test_payout_history_not_found(self):
+        """Тест истории несуществующей выплаты"""
+        response = self.client.get(f"/{uuid.uuid4()}/history/")
+
+        self.assertEqual(response.status_code, 404)
+
+
+class DeadLetterAPITestCase(TestCase):
+    def setUp(self):
+        self.client = TestClient(dead_letter_router)
+        self.payouts = [
+            Payout.objects.create(
+                amount=Decimal("100.50"),
+                currency=Currency.USD,
+                status=Status.FAILED,
+                recipient_details={"card_number": "5555555555554444"},
+            )
+            for _ in range(3)
+        ]
+        self.dead_letters = [
+            PayoutDeadLetter.objects.create(
+                payout=payout,
+                error_class=error_class,
+                error_message="error",
+                attempts=1,
+                history=[{"attempt": 1, "error_class": error_class, "error": "error"}],
+            )
+            for payout, error_class in zip(self.payouts, ["ConnectionError", "ConnectionError", "GatewayError"])
+        ]
+
+    def test_list_dead_letters(self):
+        """Тест списка dead letter с фильтром по классу ошибки"""
+        response = self.client.get("/?error_class=ConnectionError")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 2)
+        self.assertEqual(response.json()["items"][0]["history"][0]["attempt"], 1)
+
+    def test_get_dead_letter_not_found(self):
+        """Тест получения несуществующей записи"""
+        response = self.client.get("/999999/")
+
+        self.assertEqual(response.status_code, 404)
+
+    @patch('api_payouts.services.dead_letter_service.PayoutTaskService.execute_payout')
+    def test_requeue_by_error_class(self, mock_execute):
+        """Тест массовой повторной постановки по классу ошибки"""
+        response = self.client.post("/requeue/", json={"error_class": "ConnectionError"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["requeued"], 2)
+        self.assertEqual(mock_execute.call_count, 2)
+
+        self.payouts[0].refresh_from_db()
+        self.assertEqual(self.payouts[0].status, Status.PENDING)
+        self.assertEqual(PayoutDeadLetter.objects.pending().count(), 1)
+
+        # Повторный запрос не трогает уже поставленные записи
+        response = self.client.post("/requeue/", json={"error_class": "ConnectionError"})
+        self.assertEqual(response.json()["requeued"], 0)
+
+    @patch('api_payouts.services.dead_letter_service.PayoutTaskService.execute_payout')
+    def test_requeue_skips_processing_payout(self, mock_execute):
+        """Тест: выплата, которую сейчас обрабатывает задача, повторно не ставится"""
+        self.payouts[0].claim_for_processing(task_id='task-1')
+
+        response = self.client.post("/requeue/", json={"ids": [self.dead_letters[0].id]})
+
+        self.assertEqual(response.json()["requeued"], 1)
+        mock_execute.assert_not_called()
+        self.payouts[0].refresh_from_db()
+        self.assertEqual(self.payouts[0].status, Status.PROCESSING)
+
+    @patch('api_payouts.services.dead_letter_service.PayoutTaskService.execute_payout')
+    def test_failed_dispatch_keeps_letter_pending(self, mock_execute):
+        """Тест: ошибка постановки откатывает выплату, запись снова ожидает разбора"""
+        mock_execute.side_effect = [ConnectionError("broker down"), None]
+
+        response = self.client.post("/requeue/", json={"error_class": "ConnectionError"})
+
+        self.assertEqual(response.json()["ids"], [self.dead_letters[1].id])
+        self.assertEqual(list(PayoutDeadLetter.objects.pending().filter(error_class="ConnectionError")),
+                         [self.dead_letters[0]])
+        self.payouts[0].refresh_from_db()
+        self.assertEqual(self.payouts[0].status, Status.FAILED)
+
+    @patch('api_payouts.services.dead_letter_service.PayoutTaskService.execute_payout')
+    def test_requeue_by_ids(self, mock_execute):
+        """Тест повторной постановки по списку ID"""
+        response = self.client.post("/requeue/", json={"ids": [self.dead_letters[2].id]})
+
+        self.assertEqual(response.json()["ids"], [self.dead_letters[2].id])
+        mock_execute.assert_called_once()
+        self.assertEqual(mock_execute.call_args.kwargs['source'], PayoutSource.BATCH)
+
+
+class MetricsEndpointTestCase(TestCase):
+    def test_metrics_endpoint(self):
+        """Тест метрик HTTP-запросов по маршрутам Ninja"""
+        client = Client()
+        client.get("/api/payouts/")
+
+        response = client.get("/metrics")
+        body = response.content.decode()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('http_request_duration_seconds_count{method="GET",route="api/payouts/",status="200"}', body)
+        self.assertIn('http_request_db_queries_count{route="api/payouts/"}', body)
+        self.assertIn('http_requests_in_flight', body)
+
+
+class QueryBudgetTestCase(TestCase):
+    """Бюджеты SQL-запросов горячих эндпоинтов (в pytest MODE='raise' задает фикстура query_budget)"""
+
+    def setUp(self):
+        self.client = Client()
+        self.card_data = {
+            "card_number": "5555555555554444",
+            "card_holder": "Ivanov Ivan",
+            "expiry_date": "12/25"
+        }
+        self.payout = Payout.objects.create(
+            amount=Decimal("100.50"),
+            currency=Currency.USD,
+            description="Test payout",
+            recipient_details=self.card_data,
+        )
+        for _ in range(3):
+            Payout.objects.create(amount=Decimal("10"), currency=Currency.RUB, recipient_details=self.card_data)
+
+    def test_hot_endpoints_within_budget(self):
+        """Тест укладывания горячих эндпоинтов в бюджет"""
+        url = f"/api/payouts/{self.payout.id}/"
+        payload = {
+            "amount": "100.50",
+            "currency": Currency.USD.value,
+            "recipient_details": self.card_data,
+        }
+
+        with override_settings(QUERY_BUDGETS={**settings.QUERY_BUDGETS, 'MODE': 'raise'}):
+            with patch('api_payouts.services.payout_service.PayoutService.execute_payout'):
+                responses = [
+                    self.client.get("/api/payouts/"),
+                    self.client.get(url),
+                    self.client.post("/api/payouts/", payload, content_type="application/json"),
+                    self.client.patch(url, {"description": "Updated"}, content_type="application/json"),
+                    self.client.get(f"{url}history/"),
+                    self.client.delete(url),
+                ]
+
+        for response in responses:
+            self.assertEqual(response.status_code, 200)
+
+    def test_server_timing_header(self):
+        """Тест заголовка Server-Timing с числом и временем SQL-запросов"""
+        response = self.client.get(f"/api/payouts/{self.payout.id}/")
+
+        self.assertRegex(response['Server-Timing'], r'^db;desc="1 queries";dur=[\d.]+, app;dur=[\d.]+$')
+
+    def test_queries_counted_once_per_request(self):
+        """Тест: метрики и бюджет используют один счетчик - одна обертка execute_wrapper на подключение"""
+        wrappers = []
+        original = Payout.objects.get_payout
+
+        def get_payout(*args, **kwargs):
+            wrappers.append(len(connection.execute_wrappers))
+            return original(*args, **kwargs)
+
+        with patch.object(Payout.objects, 'get_payout', side_effect=get_payout):
+            response = self.client.get(f"/api/payouts/{self.payout.id}/")
+
+        self.assertEqual(wrappers, [1])
+        self.assertIn('db;desc="1 queries"', response['Server-Timing'])
+
+    @override_settings(QUERY_BUDGETS={'MODE': 'raise', 'ROUTES': {'GET api/payouts/': 1}})
+    def test_budget_exceeded_raises(self):
+        """Тест исключения при превышении бюджета в режиме raise"""
+        with self.assertRaises(QueryBudgetExceeded) as ctx:
+            self.client.get("/api/payouts/")
+
+        self.assertEqual(ctx.exception.budget, 1)
+        self.assertEqual(ctx.exception.count, 2)
+
+    @override_settings(QUERY_BUDGETS={'MODE': 'warn', 'ROUTES': {'GET api/payouts/': 1}})
+    def test_budget_exceeded_warns(self):
+        """Тест предупреждения при превышении бюджета в режиме warn"""
+        with self.assertLogs('backend.middleware.query_budget', level='WARNING'):
+            response = self.client.get("/api/payouts/")
+
+        self.assertEqual(response.status_code, 200)
+
+
+class ProfilingMiddlewareTestCase(TestCase):
+    def setUp(self):
+        self.profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profile_dir)
+        profiling = override_settings(PROFILING={**settings.PROFILING, 'ENABLED': True, 'DIR': self.profile_dir})
+        profiling.enable()
+        self.addCleanup(profiling.disable)
+        self.client = Client()
+
+    def test_signed_header_writes_pstats(self):
+        """Тест профиля cProfile по подписанному заголовку"""
+        response = self.client.get("/api/payouts/", HTTP_X_PROFILE=make_token('cprofile'))
+
+        path = os.path.join(self.profile_dir, response['X-Profile-File'])
+        self.assertTrue(path.endswith('.prof'))
+        self.assertGreater(pstats.Stats(path).total_calls, 0)
+
+    def test_sampling_profile_speedscope(self):
+        """Тест сэмплирующего профиля в формате speedscope"""
+        response = self.client.get("/api/payouts/", HTTP_X_PROFILE=make_token('sampling'))
+
+        with open(os.path.join(self.profile_dir, response['X-Profile-File'])) as file:
+            profile = json.load(file)
+        self.assertEqual(profile['profiles'][0]['type'], 'sampled')
+        self.assertIn('frames', profile['shared'])
+
+    def test_invalid_token_is_ignored(self):
+        """Тест запроса с поддельным токеном без профилирования"""
+        response = self.client.get("/api/payouts/", HTTP_X_PROFILE='cprofile:forged')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-File', response)
+        self.assertEqual(os.listdir(self.profile_dir), [])
+
+    def test_disabled_middleware_not_used(self):
+        """Тест отсутствия профилирования при выключенной настройке"""
+        with override_settings(PROFILING={**settings.PROFILING, 'ENABLED': False}):
+            response = Client().get("/api/payouts/", HTTP_X_PROFILE=make_token())
+
+        self.assertNotIn('X-Profile-File', response)
+
+    @override_settings(QUERY_BUDGETS={**settings.QUERY_BUDGETS, 'MODE': 'off'})
+    def test_staff_query_param_on_api(self):
+        """Тест ?profile= от сотрудника: API без сессий находит пользователя по cookie сессии"""
+        staff = User.objects.create_user('staff', password='secret', is_staff=True)
+        self.client.force_login(staff)
+
+        response = self.client.get("/api/payouts/?profile=cprofile")
+
+        self.assertTrue(response['X-Profile-File'].endswith('.prof'))
+
+    def test_query_param_ignored_for_anonymous(self):
+        """Тест ?profile= без входа - без профилирования"""
+        response = self.client.get("/api/payouts/?profile=cprofile")
+
+        self.assertNotIn('X-Profile-File', response)
+
+    def test_task_profile_by_header(self):
+        """Тест профилирования задачи Celery по заголовку profile"""
+        task = MagicMock()
+        task.name = 'api_payouts.tasks.payout_task'
+        task.request.profile = task_headers('cprofile')['profile']
+
+        start_task_profile(task_id='task-1', task=task)
+        stop_task_profile(task_id='task-1', task=task)
+
+        self.assertEqual(len(os.listdir(self.profile_dir)), 1)
+
+
+class LeanApiMiddlewareTestCase(TestCase):
+    def test_api_skips_page_middleware(self):
+        """Тест: запрос к API проходит мимо сессий, CSRF и X-Frame-Options"""
+        response = self.client.get("/api/payouts/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Frame-Options', response)
+        self.assertFalse(hasattr(response.wsgi_request, 'session'))
+        self.assertFalse(hasattr(response.wsgi_request, 'user'))
+
+    def test_api_post_without_csrf_token(self):
+        """Тест: POST к API не требует CSRF-токена даже при строгой проверке"""
+        client = Client(enforce_csrf_checks=True)
+        response = client.post("/api/payouts/", {}, content_type="application/json")
+
+        self.assertEqual(response.status_code, 422)
+
+    def test_admin_keeps_full_stack(self):
+        """Тест: админка работает с сессией, пользователем и X-Frame-Options"""
+        admin = User.objects.create_superuser('admin', password='secret')
+        self.client.force_login(admin)
+
+        response = self.client.get("/admin/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Frame-Options'], 'DENY')
+        self.assertEqual(response.wsgi_request.user, admin)
+
+    def test_admin_login_requires_csrf(self):
+        """Тест: вход в админку по-прежнему проверяет CSRF"""
+        client = Client(enforce_csrf_checks=True)
+        response = client.post("/admin/login/", {'username': 'admin', 'password': 'secret'})
+
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(LEAN_API={**settings.LEAN_API, 'ENABLED': False})
+    def test_disabled_runs_full_stack_for_api(self):
+        """Тест: LEAN_API выключен - API проходит полную цепочку"""
+        response = self.client.get("/api/payouts/")
+
+        self.assertEqual(response['X-Frame-Options'], 'DENY')
+        self.assertTrue(hasattr(response.wsgi_request, 'user'))
@@ -0,0 +1,178 @@
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.conf import settings
+from django.db import connection
+from django.test import LiveServerTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from api_payouts.models import Payout
+from benchmarks.api_load import build_endpoints, run_endpoint
+from benchmarks.fixtures import sample_payout_ids, seed_payouts
+from benchmarks.payout_storage import INLINE_TABLE, padded_recipient_details, storage_report
+from benchmarks.result_memory import memory_report
+from benchmarks.serialization import BrokerCodec, serialization_report
+from benchmarks.stats import percentile, summarize
+from benchmarks.worker_load import WorkerBenchmark
+
+
+class BenchmarkStatsTestCase(TestCase):
+    def test_percentile_nearest_rank(self):
+        """Тест перцентилей по методу nearest-rank"""
+        values = [float(i) for i in range(1, 101)]
+
+        self.assertEqual(percentile(values, 50), 50.0)
+        self.assertEqual(percentile(values, 99), 99.0)
+        self.assertEqual(percentile([], 95), 0.0)
+
+    def test_summarize(self):
+        """Тест сводки по эндпоинту"""
+        summary = summarize([0.01, 0.02, 0.03, 0.04], errors=1, elapsed=0.5)
+
+        self.assertEqual(summary['requests'], 5)
+        self.assertEqual(summary['rps'], 10.0)
+        self.assertEqual(summary['p50_ms'], 20.0)
+        self.assertEqual(summary['max_ms'], 40.0)
+
+    def test_seed_payouts(self):
+        """Тест наполнения таблицы выплат пачками"""
+        seed_payouts(25, batch_size=10)
+
+        self.assertEqual(Payout.objects.count(), 25)
+        self.assertEqual(len(sample_payout_ids(limit=5)), 5)
+
+    def test_sample_payout_ids_by_index_ranges(self):
+        """Тест выборки ID сериями по индексу первичного ключа, без сортировки всей таблицы"""
+        seed_payouts(200, batch_size=100)
+
+        with CaptureQueriesContext(connection) as queries:
+            payout_ids = sample_payout_ids(limit=50, seed=1)
+
+        self.assertEqual(len(payout_ids), 50)
+        self.assertEqual(len(set(payout_ids)), 50)
+        self.assertEqual(Payout.objects.filter(id__in=payout_ids).count(), 50)
+        self.assertFalse([query for query in queries if 'RANDOM' in query['sql'].upper()])
+        self.assertEqual(sample_payout_ids(limit=50, seed=1), payout_ids)
+
+    def test_sample_payout_ids_small_table(self):
+        """Тест: таблица меньше выборки возвращается целиком"""
+        seed_payouts(7, batch_size=10)
+
+        self.assertEqual(set(sample_payout_ids(limit=10)), {str(pk) for pk in Payout.objects.values_list('id', flat=True)})
+
+
+class ApiLoadTestCase(LiveServerTestCase):
+    def setUp(self):
+        # Потоки live-сервера делят одно подключение к sqlite в памяти - счетчики запросов смешиваются
+        budgets = override_settings(QUERY_BUDGETS={**settings.QUERY_BUDGETS, 'MODE': 'off'})
+        budgets.enable()
+        self.addCleanup(budgets.disable)
+
+        seed_payouts(30, batch_size=10)
+        self.endpoints = build_endpoints(sample_payout_ids(), max_page=3)
+
+    def test_run_endpoint(self):
+        """Тест нагрузки на эндпоинты живого сервера"""
+        for name in ['list_payouts', 'get_payout']:
+            summary = run_endpoint(self.live_server_url, self.endpoints[name], concurrency=2, requests=10, warmup=2)
+
+            self.assertEqual(summary['requests'], 10)
+            self.assertEqual(summary['errors'], 0)
+            self.assertGreater(summary['p99_ms'], 0)
+
+    @patch('api_payouts.services.payout_service.PayoutService.execute_payout')
+    def test_create_payout_load(self, mock_execute):
+        """Тест нагрузки на создание выплат"""
+        summary = run_endpoint(self.live_server_url, self.endpoints['create_payout'], concurrency=2, requests=6, warmup=0)
+
+        self.assertEqual(summary['errors'], 0)
+        self.assertEqual(Payout.objects.count(), 36)
+
+
+class WorkerBenchmarkTestCase(TestCase):
+    def test_report_aggregates_probe_files(self):
+        """Тест сводки счетчиков всех процессов воркера"""
+        with tempfile.TemporaryDirectory() as probe_dir:
+            for pid, counters, started, finished in [
+                (1, {'broker_fetch': 10, 'broker_ack': 10}, None, None),
+                (2, {'backend_set': 30, 'db_queries': 25, 'tasks': 5}, 100.0, 101.0),
+                (3, {'backend_set': 30, 'db_queries': 25, 'tasks': 5}, 100.5, 102.0),
+            ]:
+                with open(os.path.join(probe_dir, f'{pid}.json'), 'w') as file:
+                    json.dump({'pid': pid, 'counters': counters,
+                               'first_started': started, 'last_finished': finished}, file)
+
+            report = WorkerBenchmark._report('prefork', 2, 1, 10, 10, {'broker_publish': 10}, probe_dir)
+
+        self.assertEqual(report['payouts_per_second'], 5.0)
+        self.assertEqual(report['broker_round_trips_per_payout'], 3.0)
+        self.assertEqual(report['backend_round_trips_per_payout'], 6.0)
+        self.assertEqual(report['db_queries_per_payout'], 5.0)
+
+    @patch('benchmarks.worker_load.pool_available', return_value=False)
+    def test_unavailable_pool_is_skipped(self, mock_available):
+        """Тест пропуска зеленого пула без gevent/eventlet"""
+        result = WorkerBenchmark().run('gevent', concurrency=4, count=10)
+
+        self.assertIn('skipped', result)
+        self.assertFalse(Payout.objects.exists())
+
+
+class ResultMemoryReportTestCase(TestCase):
+    def test_compact_mode_writes_and_stores_less(self):
+        """Тест отчета о памяти результатов: compact - одна запись и меньше байт, чем verbose"""
+        report = memory_report({'verbose': 86400, 'compact': 600}, rate=100)
+
+        self.assertEqual(report['compact']['states'], ['SUCCESS'])
+        self.assertEqual(report['verbose']['states'][0], 'STARTED')
+        self.assertIn('PROGRESS', report['verbose']['states'])
+        self.assertLess(report['compact']['value_bytes'], report['verbose']['value_bytes'])
+        self.assertEqual(report['compact']['memory_source'], 'estimate')
+        self.assertAlmostEqual(
+            report['compact']['steady_state_mb'],
+            report['compact']['key_bytes'] * 100 * 600 / 2 ** 20,
+            places=0,
+        )
+        self.assertFalse(Payout.objects.exists())
+
+
+class SerializationReportTestCase(TestCase):
+    def test_formats_round_trip(self):
+        """Тест кодека брокера: тело задачи одинаково после json, msgpack и сжатия"""
+        codec = BrokerCodec()
+        self.addCleanup(codec.close)
+        message = codec.task_message('payout-1', [{'attempt': 1, 'error_class': 'ConnectionError'}])
+
+        for serializer, compression in (('json', None), ('msgpack', None), ('msgpack', 'zlib')):
+            raw, _ = codec.encode(message, serializer, compression)
+            args, kwargs, _ = codec.decode(raw)
+            self.assertEqual(args, ['payout-1'])
+            self.assertEqual(kwargs['history'][0]['error_class'], 'ConnectionError')
+
+    def test_report_compares_with_json(self):
+        """Тест отчета о сериализации: msgpack компактнее json, сжатие выигрывает на истории ошибок"""
+        report = serialization_report(iterations=5, retries=5)
+
+        first, retry = report['messages']['first_attempt'], report['messages']['retry']
+        self.assertEqual(first['json']['vs_json']['broker_bytes'], 1.0)
+        self.assertLess(first['msgpack']['body_bytes'], first['json']['body_bytes'])
+        self.assertLess(retry['json+zlib']['broker_bytes'], retry['json']['broker_bytes'])
+        self.assertLess(report['results']['compact']['msgpack'], report['results']['compact']['json'])
+        self.assertFalse(Payout.objects.exists())
+
+
+class PayoutStorageReportTestCase(TestCase):
+    def test_report_compares_layouts(self):
+        """Тест отчета о хранении реквизитов: обе раскладки замерены, копии таблиц удалены"""
+        seed_payouts(20, batch_size=10, recipient_details=padded_recipient_details(100))
+
+        report = storage_report(samples=5, page_size=5, max_page=2)
+
+        for layout in ('inline', 'split'):
+            self.assertEqual(report[layout]['status_update']['requests'], 5)
+            self.assertEqual(report[layout]['list_page']['errors'], 0)
+        self.assertEqual(set(report['split_to_inline']), {'status_update', 'list_page', 'detail'})
+        self.assertNotIn(INLINE_TABLE, connection.introspection.table_names())
+        self.assertEqual(len(Payout.objects.get_payout(sample_payout_ids(1)[0]).recipient_details['address']), 100)
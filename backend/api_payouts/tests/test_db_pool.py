@@ -0,0 +1,104 @@
+import importlib
+import os
+import sys
+from unittest.mock import patch
+
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import SimpleTestCase, TestCase
+from prometheus_client import REGISTRY
+
+from backend.db_pool import PoolStatsSampler, build_database, check_connection
+
+DB_ENV = {
+    'POSTGRES_DB': 'payouts',
+    'POSTGRES_USER': 'app',
+    'POSTGRES_PASSWORD': 'secret',
+    'POSTGRES_HOST': 'pgbouncer',
+}
+
+
+class FakePool:
+    def __init__(self, **stats):
+        self.stats = stats
+
+    def get_stats(self):
+        return dict(self.stats)
+
+
+def metric(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class DatabasePoolSettingsTestCase(SimpleTestCase):
+    def build(self, mode):
+        return build_database(mode, name='payouts', user='app', password='secret', host='db', port='5432')
+
+    def test_psycopg_pool_mode(self):
+        """Тест пула psycopg: OPTIONS['pool'] с проверкой соединения, без постоянных соединений"""
+        database = self.build('psycopg')
+
+        self.assertEqual(database['CONN_MAX_AGE'], 0)
+        self.assertEqual(database['OPTIONS']['pool']['max_size'], 10)
+        self.assertIs(database['OPTIONS']['pool']['check'], check_connection)
+
+    def test_pgbouncer_mode(self):
+        """Тест режима pgbouncer: постоянные соединения с проверкой, без серверных курсоров"""
+        database = self.build('pgbouncer')
+
+        self.assertEqual(database['CONN_MAX_AGE'], 60)
+        self.assertTrue(database['CONN_HEALTH_CHECKS'])
+        self.assertTrue(database['DISABLE_SERVER_SIDE_CURSORS'])
+        self.assertNotIn('pool', database['OPTIONS'])
+
+    def test_unknown_mode(self):
+        """Тест неизвестного режима пула"""
+        with self.assertRaises(ValueError):
+            self.build('pgpool')
+
+    def test_prod_settings_profile(self):
+        """Тест профиля settings_prod: режим пула из окружения"""
+        sys.modules.pop('backend.settings_prod', None)
+        with patch.dict(os.environ, {**DB_ENV, 'DB_POOL_MODE': 'pgbouncer', 'DB_CONN_MAX_AGE': '120'}):
+            settings_prod = importlib.import_module('backend.settings_prod')
+        self.addCleanup(sys.modules.pop, 'backend.settings_prod', None)
+
+        database = settings_prod.DATABASES['default']
+        self.assertEqual(database['HOST'], 'pgbouncer')
+        self.assertEqual(database['CONN_MAX_AGE'], 120)
+        self.assertFalse(settings_prod.DEBUG)
+
+
+class DatabasePoolMetricsTestCase(TestCase):
+    def test_pool_stats_exported_as_deltas(self):
+        """Тест метрик пула: размер и ожидающие - gauge, выдачи и ожидание - приращения счетчиков"""
+        sampler = PoolStatsSampler(interval=0)
+        pool = FakePool(pool_size=4, pool_available=1, requests_waiting=2,
+                        requests_num=10, requests_queued=3, requests_wait_ms=1500)
+        checkouts = metric('db_pool_checkouts_total', alias='test-pool')
+        wait = metric('db_pool_wait_seconds_total', alias='test-pool')
+
+        sampler.sample({'test-pool': pool})
+        pool.stats.update(requests_num=15, requests_wait_ms=2000, pool_available=3)
+        sampler.sample({'test-pool': pool})
+
+        self.assertEqual(metric('db_pool_size', alias='test-pool'), 4)
+        self.assertEqual(metric('db_pool_available', alias='test-pool'), 3)
+        self.assertEqual(metric('db_pool_requests_waiting', alias='test-pool'), 2)
+        self.assertEqual(metric('db_pool_checkouts_total', alias='test-pool') - checkouts, 15)
+        self.assertAlmostEqual(metric('db_pool_wait_seconds_total', alias='test-pool') - wait, 2.0)
+
+    def test_sampling_throttled(self):
+        """Тест ограничения частоты сбора статистики пулов"""
+        sampler = PoolStatsSampler(interval=60)
+        with patch.object(sampler, 'sample') as sample:
+            sampler.maybe_sample()
+            sampler.maybe_sample()
+        sample.assert_called_once_with()
+
+    def test_new_connections_counted(self):
+        """Тест счетчика новых соединений с БД"""
+        before = metric('db_connections_opened_total', alias=connection.alias)
+        connection_created.send(sender=type(connection), connection=connection)
+
+        self.assertEqual(metric('db_connections_opened_total', alias=connection.alias) - before, 1)
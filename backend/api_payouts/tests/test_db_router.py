@@ -0,0 +1,178 @@
+import time
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from api_payouts.models import Currency, Payout
+from backend.db_router import ReplicaRouter, allow_replica_reads, replica_reads
+from backend.middleware.db_routing import ReplicaRoutingMiddleware
+
+READ_REPLICAS = {**settings.READ_REPLICAS, 'ALIASES': ['replica_1', 'replica_2']}
+COOKIE = settings.READ_REPLICAS['COOKIE']
+
+
+@override_settings(READ_REPLICAS=READ_REPLICAS)
+class ReplicaRouterTestCase(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_reads_go_to_primary_by_default(self):
+        """Тест: вне разрешающего контекста (воркер, команды) чтение идет на основную БД"""
+        self.assertEqual(self.router.db_for_read(Payout), 'default')
+
+    def test_reads_go_to_replica_when_allowed(self):
+        """Тест: в разрешающем контексте чтение идет на одну из реплик"""
+        with allow_replica_reads():
+            aliases = {self.router.db_for_read(Payout) for _ in range(50)}
+        self.assertEqual(aliases, {'replica_1', 'replica_2'})
+        self.assertFalse(replica_reads.get())
+
+    def test_writes_go_to_primary(self):
+        """Тест: запись всегда на основную БД"""
+        with allow_replica_reads():
+            self.assertEqual(self.router.db_for_write(Payout), 'default')
+
+    def test_instance_stays_on_its_database(self):
+        """Тест: чтение связанных объектов - из той БД, откуда загружен экземпляр"""
+        payout = Payout(amount=Decimal('1.00'), currency=Currency.RUB)
+        payout._state.db = 'replica_2'
+        self.assertEqual(self.router.db_for_read(Payout, instance=payout), 'replica_2')
+
+    @override_settings(READ_REPLICAS={**READ_REPLICAS, 'ALIASES': []})
+    def test_no_replicas_configured(self):
+        """Тест: без реплик чтение идет на основную БД"""
+        with allow_replica_reads():
+            self.assertEqual(self.router.db_for_read(Payout), 'default')
+
+    def test_migrations_only_on_primary(self):
+        """Тест: миграции применяются только к основной БД"""
+        self.assertTrue(self.router.allow_migrate('default', 'api_payouts'))
+        self.assertFalse(self.router.allow_migrate('replica_1', 'api_payouts'))
+
+
+class ReplicaRouterTransactionTestCase(TestCase):
+    @override_settings(READ_REPLICAS=READ_REPLICAS)
+    def test_reads_inside_transaction_go_to_primary(self):
+        """Тест: внутри транзакции основной БД чтение не уходит на реплику"""
+        with allow_replica_reads():
+            self.assertEqual(ReplicaRouter().db_for_read(Payout), 'default')
+
+
+class ReplicaRoutingMiddlewareTestCase(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.seen = []
+
+        def get_response(request):
+            self.seen.append(replica_reads.get())
+            return HttpResponse(status=getattr(request, 'status', 200))
+
+        self.middleware = ReplicaRoutingMiddleware(get_response)
+
+    def test_safe_api_request_reads_from_replica(self):
+        """Тест: GET к API без недавней записи читает с реплики"""
+        response = self.middleware(self.factory.get('/api/payouts/'))
+        self.assertEqual(self.seen, [True])
+        self.assertNotIn(COOKIE, response.cookies)
+        self.assertFalse(replica_reads.get())
+
+    def test_non_api_request_reads_from_primary(self):
+        """Тест: запросы вне API (админка) читают с основной БД"""
+        self.middleware(self.factory.get('/admin/'))
+        self.assertEqual(self.seen, [False])
+
+    def test_write_sets_sticky_cookie(self):
+        """Тест: после записи клиент получает cookie прилипания к основной БД"""
+        response = self.middleware(self.factory.post('/api/payouts/'))
+        self.assertEqual(self.seen, [False])
+        cookie = response.cookies[COOKIE]
+        self.assertEqual(cookie['max-age'], settings.READ_REPLICAS['STICKY_SECONDS'])
+        self.assertGreater(float(cookie.value), time.time())
+
+    def test_failed_write_does_not_set_cookie(self):
+        """Тест: при ошибке сервера cookie не ставится"""
+        request = self.factory.delete('/api/payouts/1/')
+        request.status = 500
+        response = self.middleware(request)
+        self.assertNotIn(COOKIE, response.cookies)
+
+    def test_read_after_write_sticks_to_primary(self):
+        """Тест: пока действует cookie, чтения идут на основную БД"""
+        self.factory.cookies[COOKIE] = str(time.time() + 5)
+        self.middleware(self.factory.get('/api/payouts/1/'))
+        self.assertEqual(self.seen, [False])
+
+    def test_primary_header_reads_from_primary(self):
+        """Тест: заголовок обновления микрокэша ведет чтение на основную БД без cookie"""
+        header = settings.READ_REPLICAS['PRIMARY_HEADER']
+        self.middleware(self.factory.get('/api/payouts/1/', headers={header: '1'}))
+        self.middleware(self.factory.get('/api/payouts/1/', headers={header: '0'}))
+        self.assertEqual(self.seen, [False, True])
+
+    def test_expired_or_invalid_cookie_is_ignored(self):
+        """Тест: просроченная или испорченная cookie не мешает чтению с реплики"""
+        for value in (str(time.time() - 1), 'garbage'):
+            self.factory.cookies[COOKIE] = value
+            self.middleware(self.factory.get('/api/payouts/'))
+        self.assertEqual(self.seen, [True, True])
+
+
+# Пустая БД со схемой (шард тестов шардирования) - реплика, отстающая от основной.
+# Без обертки TestCase в транзакцию: внутри транзакции роутер не читает с реплик
+LAGGING_REPLICA = 'shard_2'
+
+
+@override_settings(READ_REPLICAS={**settings.READ_REPLICAS, 'ALIASES': [LAGGING_REPLICA]})
+class ReadYourWritesTestCase(TransactionTestCase):
+    databases = {'default', LAGGING_REPLICA}
+
+    def setUp(self):
+        # Бюджеты запросов не проверяются: вне транзакции теста sqlite считает BEGIN
+        # записи, а повтор чтения на основной БД - второй запрос
+        budgets = override_settings(QUERY_BUDGETS={'MODE': 'off', 'ROUTES': {}})
+        budgets.enable()
+        self.addCleanup(budgets.disable)
+
+    @patch('api_payouts.tasks.payout_task.apply_async')
+    def test_create_then_get(self, mock_apply_async):
+        """Тест: создание выплаты ставит cookie, следующее чтение идет на основную БД"""
+        response = self.client.post('/api/payouts/', {
+            'amount': '100.00',
+            'currency': 'RUB',
+            'recipient_details': {'card_number': '5555555555554444', 'card_holder': 'Ivanov Ivan',
+                                  'expiry_date': '12/25'},
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(COOKIE, response.cookies)
+
+        with CaptureQueriesContext(connections[LAGGING_REPLICA]) as replica, \
+                CaptureQueriesContext(connections['default']) as primary:
+            response = self.client.get(f"/api/payouts/{response.json()['id']}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(replica), 0)
+        self.assertGreater(len(primary), 0)
+
+    def test_get_missing_on_replica_retries_primary(self):
+        """Тест: без cookie выплата, которой еще нет на реплике, читается с основной БД"""
+        payout = Payout.objects.create(
+            amount=Decimal('1.00'),
+            currency=Currency.RUB,
+            recipient_details={'card_number': '5555555555554444', 'card_holder': 'Ivanov Ivan',
+                               'expiry_date': '12/25'},
+        )
+
+        with CaptureQueriesContext(connections[LAGGING_REPLICA]) as replica:
+            response = self.client.get(f'/api/payouts/{payout.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], str(payout.id))
+        self.assertEqual(len(replica), 1)
+
+    def test_get_missing_everywhere(self):
+        """Тест: выплаты нет ни на реплике, ни на основной БД - 404"""
+        response = self.client.get('/api/payouts/00000000-0000-4000-8000-000000000000/')
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,128 @@
+from decimal import Decimal
+from unittest.mock import patch, MagicMock
+
+from django.test import TestCase, override_settings
+
+from api_payouts.models import Payout, Currency, Status
+from api_payouts.services.celery_services.payout_task_proccessing_service import PayoutProcessingService
+from api_payouts.services.gateway_services import (
+    GatewayError,
+    GatewayResponse,
+    HttpGatewayClient,
+    SimulatedGatewayClient,
+    get_gateway_client,
+    reset_gateway_client,
+)
+from api_payouts.services.gateway_services.stub_gateway_server import StubGatewayServer
+
+
+class HttpGatewayClientTestCase(TestCase):
+    def setUp(self):
+        self.server = StubGatewayServer().start()
+        self.client = HttpGatewayClient(self.server.url, pool_size=2)
+        self.payout = Payout.objects.create(
+            amount=Decimal("100.50"),
+            currency=Currency.USD,
+            recipient_details={"card_number": "5555555555554444"},
+        )
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def test_send_payout_accepted(self):
+        """Тест отправки выплаты в заглушку платежной системы"""
+        response = self.client.send_payout(self.payout)
+
+        self.assertTrue(response.accepted)
+        self.assertEqual(response.payout_id, str(self.payout.id))
+        self.assertIsNotNone(response.transaction_id)
+
+    def test_connections_are_reused(self):
+        """Тест переиспользования keep-alive соединения"""
+        for _ in range(5):
+            self.client.send_payout(self.payout)
+
+        self.assertEqual(self.server.requests, 5)
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(self.client.pool.stats['created'], 1)
+        self.assertEqual(self.client.pool.stats['reused'], 4)
+
+    def test_send_batch_single_request(self):
+        """Тест пакетной отправки одним запросом"""
+        responses = self.client.send_batch([self.payout, self.payout])
+
+        self.assertEqual(len(responses), 2)
+        self.assertTrue(all(r.accepted for r in responses))
+        self.assertEqual(self.server.requests, 1)
+
+    def test_rejected_payout(self):
+        """Тест отклонения выплаты платежной системой"""
+        self.server.reject_rate = 1.0
+        response = self.client.send_payout(self.payout)
+
+        self.assertFalse(response.accepted)
+        self.assertIsNotNone(response.error)
+
+
+class GatewayClientFactoryTestCase(TestCase):
+    def tearDown(self):
+        reset_gateway_client()
+
+    def test_default_client_is_simulated(self):
+        """Тест клиента по умолчанию"""
+        reset_gateway_client()
+        self.assertIsInstance(get_gateway_client(), SimulatedGatewayClient)
+
+    @override_settings(PAYMENT_GATEWAY={
+        'CLIENT': 'api_payouts.services.gateway_services.HttpGatewayClient',
+        'URL': 'http://127.0.0.1:8090',
+        'POOL_SIZE': 3,
+    })
+    def test_client_from_settings_is_cached(self):
+        """Тест создания клиента из настроек и его переиспользования"""
+        reset_gateway_client()
+        client = get_gateway_client()
+
+        self.assertIsInstance(client, HttpGatewayClient)
+        self.assertEqual(client.pool.max_size, 3)
+        self.assertIs(get_gateway_client(), client)
+
+
+class PayoutProcessingGatewayTestCase(TestCase):
+    def setUp(self):
+        self.payout = Payout.objects.create(
+            amount=Decimal("100.50"),
+            currency=Currency.USD,
+            description="Test payout",
+            recipient_details={"card_number": "5555555555554444"},
+        )
+
+    @patch('api_payouts.services.celery_services.payout_task_proccessing_service.get_gateway_client')
+    def test_send_stage_uses_gateway(self, mock_get_client):
+        """Тест отправки в платежную систему на этапе отправки"""
+        mock_get_client.return_value.send_payout.return_value = GatewayResponse(
+            payout_id=str(self.payout.id), accepted=True, transaction_id="tx-1"
+        )
+
+        result = PayoutProcessingService(str(self.payout.id)).process()
+
+        self.payout.refresh_from_db()
+        self.assertEqual(self.payout.status, Status.COMPLETED)
+        self.assertEqual(result['transaction_id'], "tx-1")
+        mock_get_client.return_value.send_payout.assert_called_once()
+
+    @patch('api_payouts.services.celery_services.payout_task_proccessing_service.get_gateway_client')
+    def test_rejected_payout_is_failed(self, mock_get_client):
+        """Тест перевода выплаты в ошибку при отказе платежной системы"""
+        mock_get_client.return_value.send_payout.return_value = GatewayResponse(
+            payout_id=str(self.payout.id), accepted=False, error="Недостаточно средств"
+        )
+
+        with self.assertRaises(GatewayError):
+            PayoutProcessingService(str(self.payout.id), attempt=2).process()
+
+        self.payout.refresh_from_db()
+        self.assertEqual(self.payout.status, Status.FAILED)
+        failed = self.payout.events.get(to_status=Status.FAILED)
+        self.assertEqual((failed.error, failed.attempt), ("GatewayError: Недостаточно средств", 2))
@@ -0,0 +1,80 @@
+import json
+import logging
+import threading
+
+from django.test import SimpleTestCase
+
+from backend.structured_logging import (
+    BackgroundHandler,
+    ContextFilter,
+    JsonFormatter,
+    SamplingFilter,
+    bind_log_context,
+)
+
+
+class CollectingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+        self.threads = set()
+
+    def emit(self, record):
+        self.records.append(self.format(record))
+        self.threads.add(threading.current_thread().name)
+
+
+def make_record(message='Этап %s', args=('setup',), level=logging.DEBUG, **extra):
+    record = logging.LogRecord('api_payouts.stages', level, __file__, 1, message, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+class StructuredLoggingTestCase(SimpleTestCase):
+    def test_json_formatter_with_context(self):
+        """Тест JSON-записи с полями контекста выплаты"""
+        record = make_record(attempt=2)
+        with bind_log_context(payout_id='p-1', task_id='t-1'):
+            ContextFilter().filter(record)
+
+        data = json.loads(JsonFormatter().format(record))
+
+        self.assertEqual(data['message'], 'Этап setup')
+        self.assertEqual(data['payout_id'], 'p-1')
+        self.assertEqual(data['task_id'], 't-1')
+        self.assertEqual(data['attempt'], 2)
+        self.assertEqual(data['level'], 'DEBUG')
+
+    def test_sampling_keeps_whole_payout(self):
+        """Тест сэмплирования: записи одной выплаты сохраняются или отбрасываются вместе"""
+        sampling = SamplingFilter(rate=0.5)
+        decisions = {
+            payout_id: {sampling.filter(make_record(payout_id=payout_id)) for _ in range(5)}
+            for payout_id in (f'payout-{i}' for i in range(50))
+        }
+
+        self.assertTrue(all(len(values) == 1 for values in decisions.values()))
+        self.assertTrue(0 < sum(values == {True} for values in decisions.values()) < 50)
+
+    def test_sampling_never_drops_warnings(self):
+        """Тест пропуска предупреждений при нулевой доле сэмплирования"""
+        sampling = SamplingFilter(rate=0)
+
+        self.assertFalse(sampling.filter(make_record()))
+        self.assertTrue(sampling.filter(make_record(level=logging.WARNING)))
+
+    def test_background_handler_formats_in_listener_thread(self):
+        """Тест записи через очередь: форматирование и I/O в потоке QueueListener"""
+        target = CollectingHandler()
+        target.setFormatter(JsonFormatter())
+        target.set_name('test-background-target')
+        self.addCleanup(target.close)
+
+        handler = BackgroundHandler(targets=['test-background-target'])
+        with bind_log_context(payout_id='p-2'):
+            handler.handle(make_record())
+        handler.flush_and_stop()
+
+        self.assertEqual(len(target.records), 1)
+        self.assertEqual(json.loads(target.records[0])['payout_id'], 'p-2')
+        self.assertNotIn(threading.current_thread().name, target.threads)
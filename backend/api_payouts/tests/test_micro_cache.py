@@ -0,0 +1,178 @@
+import re
+from decimal import Decimal
+from pathlib import Path
+from unittest.mock import patch
+
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+from prometheus_client import REGISTRY
+
+from api_payouts.models import Currency, Payout
+from api_payouts.services.micro_cache_service import MicroCacheService
+
+MICRO_CACHE = {**settings.MICRO_CACHE, 'ENABLED': True, 'REFRESH_SECRET': 'refresh-secret'}
+
+
+class FakePool:
+    def __init__(self, error=None):
+        self.requests = []
+        self.error = error
+
+    def request(self, method, path, body=None, headers=None):
+        self.requests.append((method, path, headers))
+        if self.error:
+            raise self.error
+        return 200, b'{}'
+
+
+class MicroCacheTestMixin:
+    def setUp(self):
+        super().setUp()
+        self.payout = Payout.objects.create(
+            amount=Decimal("100.50"),
+            currency=Currency.USD,
+            recipient_details={"card_number": "5555555555554444", "card_holder": "Ivanov Ivan", "expiry_date": "12/25"},
+        )
+        self.pool = FakePool()
+        for name, value in (('get_pool', self.pool), ('_start_worker', None)):
+            patcher = patch.object(MicroCacheService, name, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(MicroCacheService._pending.clear)
+
+    def refreshed_paths(self):
+        return [path for _, path, _ in self.pool.requests]
+
+
+@override_settings(MICRO_CACHE=MICRO_CACHE)
+class MicroCacheRefreshTestCase(MicroCacheTestMixin, TestCase):
+    def test_status_change_refreshes_detail_and_list(self):
+        """Тест: смена статуса после коммита обновляет карточку и список в фоне"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.payout.mark_as_processing()
+        self.assertEqual(self.pool.requests, [])
+
+        MicroCacheService.flush()
+        self.assertEqual(self.refreshed_paths(), [f'/api/payouts/{self.payout.id}/', '/api/payouts/'])
+        method, _, headers = self.pool.requests[0]
+        self.assertEqual(method, 'GET')
+        self.assertEqual(headers, {'X-Cache-Refresh': 'refresh-secret'})
+
+    def test_refreshes_are_coalesced(self):
+        """Тест: несколько изменений между обновлениями - одна карточка на выплату и один список"""
+        other = Payout.objects.create(amount=Decimal("5.00"), currency=Currency.USD,
+                                      recipient_details=self.payout.recipient_details)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.payout.mark_as_processing()
+            self.payout.mark_as_completed()
+            other.mark_as_processing()
+
+        MicroCacheService.flush()
+        paths = self.refreshed_paths()
+        self.assertEqual(sorted(paths), sorted([f'/api/payouts/{self.payout.id}/', f'/api/payouts/{other.id}/',
+                                                '/api/payouts/']))
+
+        MicroCacheService.flush()
+        self.assertEqual(self.refreshed_paths(), paths)
+
+    def test_update_and_delete_refresh(self):
+        """Тест: изменение и удаление через API обновляют кэш"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/payouts/{self.payout.id}/', {'description': 'new'},
+                              content_type='application/json')
+        MicroCacheService.flush()
+        self.assertIn(f'/api/payouts/{self.payout.id}/', self.refreshed_paths())
+
+        self.pool.requests.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/payouts/{self.payout.id}/')
+        MicroCacheService.flush()
+        self.assertIn(f'/api/payouts/{self.payout.id}/', self.refreshed_paths())
+
+    def test_refresh_error_does_not_break_status_change(self):
+        """Тест: недоступный nginx не мешает смене статуса"""
+        self.pool.error = ConnectionRefusedError('nginx down')
+        before = REGISTRY.get_sample_value('micro_cache_refreshes_total', {'result': 'failed'}) or 0
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.payout.mark_as_processing()
+        MicroCacheService.flush()
+
+        self.payout.refresh_from_db()
+        self.assertEqual(self.payout.status, 'processing')
+        self.assertEqual(REGISTRY.get_sample_value('micro_cache_refreshes_total', {'result': 'failed'}), before + 2)
+
+
+class MicroCacheDisabledTestCase(MicroCacheTestMixin, TestCase):
+    def test_disabled_by_default(self):
+        """Тест: без MICRO_CACHE_ENABLED запросов к nginx нет"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.payout.mark_as_processing()
+
+        self.assertEqual(self.pool.requests, [])
+
+
+NGINX_CONF = Path(settings.BASE_DIR).parent / 'nginx' / 'nginx.conf'
+
+
+class NginxMap:
+    """Блок map из nginx.conf: точные значения, затем регулярные выражения по порядку, затем default"""
+
+    def __init__(self, conf: str, variable: str):
+        match = re.search(r'map\s+"(?P<source>[^"]+)"\s+\$' + variable + r'\s*\{(?P<body>[^}]*)\}', conf)
+        if match is None:
+            raise AssertionError(f'map ${variable} не найден')
+        self.source = match['source']
+        self.exact, self.regex, self.default = {}, [], None
+        for key, value in re.findall(r'^\s*("[^"]*"|\S+)\s+(\S+);', match['body'], re.M):
+            key = key.strip('"')
+            if key == 'default':
+                self.default = value
+            elif key.startswith('~'):
+                self.regex.append((re.compile(key[1:]), value))
+            else:
+                self.exact[key] = value
+
+    def resolve(self, variables: dict) -> str:
+        value = re.sub(r'\$(\w+)', lambda m: variables.get(m[1], ''), self.source)
+        if value in self.exact:
+            return self.exact[value]
+        for pattern, result in self.regex:
+            if pattern.search(value):
+                return result
+        return self.default
+
+
+class NginxMicroCacheConfigTestCase(SimpleTestCase):
+    """Условия сохранения ответа в микрокэш по nginx.conf (proxy_no_cache)"""
+
+    def setUp(self):
+        if not NGINX_CONF.exists():
+            self.skipTest('nginx.conf не найден')
+        self.conf = NGINX_CONF.read_text()
+        self.no_cache = NginxMap(self.conf, 'payouts_no_cache')
+
+    def stored(self, refresh=False, cookie='', profile=''):
+        return self.no_cache.resolve({
+            'payouts_cache_refresh': '1' if refresh else '0',
+            'cookie_db_primary_until': cookie,
+            'http_x_profile': profile,
+            'arg_profile': '',
+        }) == '0'
+
+    def test_refresh_is_stored_even_with_sticky_cookie(self):
+        """Тест: ответ на запрос обновления сохраняется в кэш"""
+        self.assertTrue(self.stored(refresh=True))
+        self.assertTrue(self.stored(refresh=True, cookie='1760000000'))
+
+    def test_sticky_and_profiled_requests_are_not_stored(self):
+        """Тест: ответы клиенту после записи и профилированные ответы не сохраняются"""
+        self.assertFalse(self.stored(cookie='1760000000'))
+        self.assertFalse(self.stored(profile='1'))
+        self.assertTrue(self.stored())
+
+    def test_cached_location_uses_no_cache_map_and_primary_header(self):
+        """Тест: кэшируемый location использует map и ведет обновление на основную БД"""
+        self.assertIn('proxy_no_cache $payouts_no_cache;', self.conf)
+        header = settings.READ_REPLICAS['PRIMARY_HEADER']
+        self.assertIn(f'proxy_set_header {header} $payouts_cache_refresh;', self.conf)
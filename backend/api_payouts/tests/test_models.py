@@ -1,11 +1,16 @@
 from decimal import Decimal
+from io import StringIO
 import uuid
 from unittest.mock import patch, MagicMock
 
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.http import Http404
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-from api_payouts.models import Payout, Currency, Status, PayoutManager
+from api_payouts.models import Payout, Currency, Status, PayoutEvent, PayoutManager, PayoutRecipient
 
 
 class PayoutModelTestCase(TestCase):
@@ -176,4 +181,146 @@ class PayoutModelTestCase(TestCase):
         statuses = [s.value for s in Status]
         self.assertIn("pending", statuses)
         self.assertIn("completed", statuses)
-        self.assertIn("failed", statuses)
\ No newline at end of file
+        self.assertIn("failed", statuses)
+
+class PayoutEventTestCase(TestCase):
+    def setUp(self):
+        self.payout = Payout.objects.create(
+            amount=Decimal("100.50"),
+            currency=Currency.USD,
+            recipient_details={"card_number": "5555555555554444"},
+        )
+
+    def test_transitions_appended_to_history(self):
+        """Тест: каждый переход статуса дописывается в историю, описание не меняется"""
+        self.payout.mark_as_processing(attempt=1)
+        self.payout.mark_as_failed("Таймаут шлюза", attempt=1)
+        self.payout.mark_as_pending()
+        self.payout.mark_as_failed()
+
+        events = list(self.payout.events.values_list('from_status', 'to_status', 'error', 'attempt'))
+        self.assertEqual(events, [
+            (Status.PENDING, Status.PROCESSING, '', 1),
+            (Status.PROCESSING, Status.FAILED, 'Таймаут шлюза', 1),
+            (Status.FAILED, Status.PENDING, '', None),
+            (Status.PENDING, Status.FAILED, '', None),
+        ])
+        self.payout.refresh_from_db()
+        self.assertIsNone(self.payout.description)
+
+    def test_claim_for_processing_once(self):
+        """Тест: выплату захватывает одна задача, вторая получает отказ без записи в историю"""
+        duplicate = Payout.objects.get(id=self.payout.id)
+
+        self.assertTrue(self.payout.claim_for_processing(task_id='task-1', attempt=1))
+        self.assertFalse(duplicate.claim_for_processing(task_id='task-2', attempt=1))
+
+        self.assertEqual((duplicate.status, duplicate.task_id), (Status.PROCESSING, 'task-1'))
+        self.assertEqual(list(self.payout.events.values_list('from_status', 'to_status', 'attempt')),
+                         [(Status.PENDING, Status.PROCESSING, 1)])
+
+    def test_claim_by_redelivered_task(self):
+        """Тест: повторная доставка той же задачи снова захватывает выплату, завершенную - нет"""
+        self.payout.claim_for_processing(task_id='task-1')
+
+        self.assertTrue(Payout.objects.get(id=self.payout.id).claim_for_processing(task_id='task-1'))
+        self.payout.mark_as_completed()
+        self.assertFalse(Payout.objects.get(id=self.payout.id).claim_for_processing(task_id='task-1'))
+
+    def test_finish_processing_only_by_own_task(self):
+        """Тест: итоговый статус ставит только задача, захватившая выплату"""
+        self.payout.claim_for_processing(task_id='task-1')
+        stale = Payout.objects.get(id=self.payout.id)
+        Payout.objects.get(id=self.payout.id).mark_as_failed(error_message='зависла')
+
+        self.assertFalse(stale.finish_processing(Status.COMPLETED, task_id='task-1'))
+        self.assertEqual(stale.status, Status.FAILED)
+
+        self.payout.claim_for_processing(task_id='task-2')
+        self.assertFalse(Payout.objects.get(id=self.payout.id).finish_processing(Status.COMPLETED, task_id='task-1'))
+        self.assertTrue(self.payout.finish_processing(Status.COMPLETED, task_id='task-2', attempt=1))
+        self.assertEqual(self.payout.events.filter(to_status=Status.COMPLETED).count(), 1)
+
+    def test_history_deleted_with_payout(self):
+        """Тест: история удаляется вместе с выплатой"""
+        self.payout.mark_as_cancelled()
+
+        Payout.objects.delete_payout(str(self.payout.id))
+
+        self.assertFalse(PayoutEvent.objects.exists())
+
+
+class PayoutRecipientTestCase(TestCase):
+    def setUp(self):
+        self.card_data = {"card_number": "5555555555554444", "card_holder": "Ivanov Ivan", "expiry_date": "12/25"}
+        self.payout = Payout.objects.create_payout(amount=Decimal("100.50"), recipient_details=self.card_data)
+
+    def test_details_stored_in_separate_table(self):
+        """Тест: реквизиты лежат в PayoutRecipient с ключом - ID выплаты и дублируются в старую колонку"""
+        self.assertEqual(PayoutRecipient.objects.get(payout_id=self.payout.id).details, self.card_data)
+        self.assertEqual(
+            Payout.objects.filter(id=self.payout.id).values_list('legacy_recipient_details', flat=True).get(),
+            self.card_data,
+        )
+
+    def test_details_loaded_lazily(self):
+        """Тест: реквизиты читаются отдельным запросом только при обращении или через JOIN"""
+        payout = Payout.objects.get_payout(str(self.payout.id))
+        with self.assertNumQueries(1):
+            self.assertEqual(payout.recipient_details, self.card_data)
+
+        payout = Payout.objects.get_payout(str(self.payout.id), with_recipient=True)
+        with self.assertNumQueries(0):
+            self.assertEqual(payout.recipient_details, self.card_data)
+
+    def test_status_change_does_not_touch_details(self):
+        """Тест: смена статуса не читает и не переписывает реквизиты"""
+        payout = Payout.objects.get_payout(str(self.payout.id))
+        with CaptureQueriesContext(connection) as queries:
+            payout.mark_as_processing()
+
+        recipient_table = PayoutRecipient._meta.db_table
+        self.assertFalse([query for query in queries if recipient_table in query['sql']])
+
+    def test_details_updated_on_save(self):
+        """Тест: новые реквизиты сохраняются вместе с выплатой"""
+        self.payout.recipient_details = {**self.card_data, "card_holder": "Petrov Petr"}
+        self.payout.save()
+
+        payout = Payout.objects.get_payout(str(self.payout.id))
+        self.assertEqual(payout.recipient_details["card_holder"], "Petrov Petr")
+        self.assertEqual(PayoutRecipient.objects.count(), 1)
+
+    def test_bulk_create_stores_details(self):
+        """Тест: bulk_create вставляет реквизиты пачкой"""
+        payouts = [Payout(amount=Decimal("1.00"), recipient_details=self.card_data) for _ in range(3)]
+
+        Payout.objects.bulk_create(payouts)
+
+        self.assertEqual(PayoutRecipient.objects.count(), 4)
+        self.assertFalse(Payout.objects.filter(legacy_recipient_details__isnull=True).exists())
+
+    def test_not_backfilled_payout_read_from_legacy_column(self):
+        """Тест: выплата предыдущей версии без PayoutRecipient читается из старой колонки"""
+        PayoutRecipient.objects.all().delete()
+
+        payout = Payout.objects.get_payout(str(self.payout.id), with_recipient=True)
+
+        self.assertEqual(payout.recipient_details, self.card_data)
+
+    def test_backfill_command(self):
+        """Тест переноса реквизитов пачками: повторный запуск и проверка перед удалением колонки"""
+        other = Payout.objects.create_payout(amount=Decimal("1.00"), recipient_details=self.card_data)
+        PayoutRecipient.objects.all().delete()
+        # Выплату перенес новый код до запуска команды - ее запись не перезаписывается
+        PayoutRecipient.objects.create(payout=other, details={"card_number": "4111111111111111"})
+
+        with self.assertRaises(CommandError):
+            call_command('backfill_payout_recipients', '--check', stdout=StringIO())
+
+        call_command('backfill_payout_recipients', '--batch-size', '1', stdout=StringIO())
+        call_command('backfill_payout_recipients', stdout=StringIO())
+        call_command('backfill_payout_recipients', '--check', stdout=StringIO())
+
+        self.assertEqual(PayoutRecipient.objects.get(payout=self.payout).details, self.card_data)
+        self.assertEqual(PayoutRecipient.objects.get(payout=other).details, {"card_number": "4111111111111111"})
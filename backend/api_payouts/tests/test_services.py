@@ -1,15 +1,26 @@
 import uuid
 from decimal import Decimal
-from unittest.mock import patch, MagicMock
+from unittest.mock import ANY, patch, MagicMock
+
+import time
+from datetime import datetime, timezone as dt_timezone
 
 from django.http import Http404
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
 from api_payouts.models import Payout, Currency, Status
 from api_payouts.schemas import PayoutCreateSchema, PayoutUpdateSchema
 from api_payouts.services.payout_service import PayoutService
 from api_payouts.services.payout_crud_service import PayoutCRUDService
 from api_payouts.services.payout_task_service import PayoutTaskService
+from api_payouts.services.celery_services.payout_queue_router import (
+    PAYOUT_TASK_NAME,
+    PayoutPriority,
+    PayoutQueueRouter,
+    PayoutSource,
+    route_task,
+)
+from api_payouts.services.celery_services.queue_latency import queue_wait_seconds
 
 
 class PayoutCRUDServiceTestCase(TestCase):
@@ -152,7 +163,11 @@ class PayoutTaskServiceTestCase(TestCase):
         callback()
         mock_apply_async.assert_called_once_with(
             args=[payout_id],
-            countdown=5
+            countdown=5,
+            queue='payouts.default',
+            task_id=ANY,
+            serializer='json',
+            compression=None,
         )
 
     @patch('api_payouts.services.payout_task_service.payout_task.apply_async')
@@ -170,9 +185,96 @@ class PayoutTaskServiceTestCase(TestCase):
 
             mock_apply_async.assert_called_once_with(
                 args=[payout_id],
-                countdown=1  # Дефолтное значение
+                countdown=1,  # Дефолтное значение
+                queue='payouts.default',
+                task_id=ANY,
+                serializer='json',
+                compression=None,
             )
 
+    @patch('api_payouts.services.payout_task_service.payout_task.apply_async')
+    def test_execute_payout_high_priority_queue(self, mock_apply_async):
+        """Тест запуска небольшой разовой выплаты в приоритетную очередь"""
+        payout_id = str(uuid.uuid4())
+
+        with patch('django.db.transaction.on_commit') as mock_on_commit:
+            PayoutTaskService.execute_payout(payout_id, amount=Decimal("100.50"), currency=Currency.USD)
+            mock_on_commit.call_args[0][0]()
+
+        self.assertEqual(mock_apply_async.call_args.kwargs['queue'], 'payouts.high')
+
+    @override_settings(PAYOUT_MESSAGE_FORMAT={
+        'SERIALIZER': 'msgpack',
+        'COMPRESSION': None,
+        'QUEUES': {'bulk': {'SERIALIZER': 'msgpack', 'COMPRESSION': 'zlib'}},
+    })
+    @patch('api_payouts.services.payout_task_service.payout_task.apply_async')
+    def test_execute_payout_message_format_per_queue(self, mock_apply_async):
+        """Тест формата сообщения по очереди: массовые выплаты сжимаются"""
+        with patch('django.db.transaction.on_commit') as mock_on_commit:
+            PayoutTaskService.execute_payout(str(uuid.uuid4()), source=PayoutSource.BATCH)
+            PayoutTaskService.execute_payout(str(uuid.uuid4()))
+            for call in mock_on_commit.call_args_list:
+                call[0][0]()
+
+        bulk, default = [call.kwargs for call in mock_apply_async.call_args_list]
+        self.assertEqual((bulk['queue'], bulk['serializer'], bulk['compression']), ('payouts.bulk', 'msgpack', 'zlib'))
+        self.assertEqual((default['queue'], default['serializer'], default['compression']),
+                         ('payouts.default', 'msgpack', None))
+
+
+@override_settings(PAYOUT_ROUTING={
+    'QUEUE_PREFIX': 'payouts',
+    'SHARDS': 4,
+    'HIGH_PRIORITY_MAX_AMOUNT': {'USD': 1000},
+    'BULK_SOURCES': ['batch'],
+})
+class PayoutQueueRouterTestCase(TestCase):
+    def test_priority_by_amount_currency_source(self):
+        """Тест выбора приоритета по сумме, валюте и источнику"""
+        self.assertEqual(PayoutQueueRouter.get_priority(Decimal("999.99"), 'USD'), PayoutPriority.HIGH)
+        self.assertEqual(PayoutQueueRouter.get_priority(Decimal("1000.01"), 'USD'), PayoutPriority.DEFAULT)
+        self.assertEqual(PayoutQueueRouter.get_priority(Decimal("10.00"), 'RUB'), PayoutPriority.DEFAULT)
+        self.assertEqual(
+            PayoutQueueRouter.get_priority(Decimal("10.00"), 'USD', source=PayoutSource.BATCH),
+            PayoutPriority.BULK
+        )
+
+    def test_shard_is_stable(self):
+        """Тест детерминированного шардирования по ID"""
+        payout_id = str(uuid.uuid4())
+        queue = PayoutQueueRouter.get_queue(payout_id, source=PayoutSource.BATCH)
+
+        self.assertEqual(queue, PayoutQueueRouter.get_queue(payout_id, source=PayoutSource.BATCH))
+        self.assertIn(queue, PayoutQueueRouter.get_queues(PayoutPriority.BULK))
+        self.assertEqual(len(PayoutQueueRouter.get_queues()), 12)
+
+    def test_celery_route_task(self):
+        """Тест роутера Celery для задач без явной очереди"""
+        payout_id = str(uuid.uuid4())
+        route = route_task(PAYOUT_TASK_NAME, [payout_id], {}, {})
+
+        self.assertEqual(route['queue'], PayoutQueueRouter.queue_name(
+            PayoutPriority.DEFAULT, PayoutQueueRouter.get_shard(payout_id)
+        ))
+        self.assertIsNone(route_task('other.task', [], {}, {}))
+
+    def test_priority_of_queue(self):
+        """Тест приоритета по имени очереди шарда"""
+        self.assertEqual(PayoutQueueRouter.priority_of('payouts.bulk.3'), PayoutPriority.BULK)
+        self.assertEqual(PayoutQueueRouter.priority_of('payouts.high'), PayoutPriority.HIGH)
+        self.assertIsNone(PayoutQueueRouter.priority_of('webhooks'))
+        self.assertIsNone(PayoutQueueRouter.priority_of(None))
+
+    def test_queue_wait_excludes_countdown(self):
+        """Тест расчета ожидания в очереди с учетом eta"""
+        now = time.time()
+        request = MagicMock(enqueued_at=now - 10, eta=None)
+        self.assertGreaterEqual(queue_wait_seconds(request), 10)
+
+        request.eta = datetime.fromtimestamp(now - 2, tz=dt_timezone.utc).isoformat()
+        self.assertLess(queue_wait_seconds(request), 10)
+
 
 class PayoutServiceIntegrationTestCase(TestCase):
     """Интеграционные тесты основного сервиса"""
@@ -0,0 +1,205 @@
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from ninja.testing import TestClient
+
+from api_payouts.api import router
+from api_payouts.models import (
+    Currency, Payout, PayoutDeadLetter, PayoutEvent, PayoutRecipient, Status, WebhookEndpoint, WebhookEvent,
+)
+from api_payouts.services.celery_services.payout_queue_router import PayoutQueueRouter
+from api_payouts.services.celery_services.payout_sweeper_service import PayoutSweeperService
+from api_payouts.services.celery_services.payout_task_proccessing_service import PayoutProcessingService
+from api_payouts.services.dead_letter_service import DeadLetterService
+from api_payouts.services.gateway_services import GatewayResponse
+from api_payouts.services.webhook_services import WebhookService
+from backend.db_router import ShardRouter, new_payout_id, shard_for, shard_index
+
+ALIASES = ['default', 'shard_1', 'shard_2']
+PAYOUT_SHARDS = {**settings.PAYOUT_SHARDS, 'ALIASES': ALIASES}
+PAYOUT_ROUTING = {**settings.PAYOUT_ROUTING, 'SHARDS': len(ALIASES)}
+CARD = {"card_number": "5555555555554444", "card_holder": "Ivanov Ivan", "expiry_date": "12/25"}
+# Бюджеты с шардами: список - счетчик и страница в каждом шарде,
+# удаление из шарда - еще dead letters и события webhook в default
+QUERY_BUDGETS = {**settings.QUERY_BUDGETS, 'ROUTES': {
+    **settings.QUERY_BUDGETS['ROUTES'],
+    'GET api/payouts/': 2 * len(ALIASES),
+    'DELETE api/payouts/<payout_id>/': 8,
+}}
+
+
+@override_settings(PAYOUT_SHARDS=PAYOUT_SHARDS)
+class ShardRouterTestCase(SimpleTestCase):
+    def setUp(self):
+        self.router = ShardRouter()
+
+    def test_shard_from_payout_id(self):
+        """Тест: шард записан в ID выплаты, строка и UUID дают один шард"""
+        for shard, alias in enumerate(ALIASES):
+            payout_id = new_payout_id(shard)
+            self.assertEqual(payout_id.version, 8)
+            self.assertEqual(shard_index(payout_id), shard)
+            self.assertEqual(shard_for(str(payout_id)), alias)
+        self.assertEqual(shard_for('not-a-uuid'), 'default')
+        self.assertEqual(shard_for(new_payout_id(len(ALIASES))), 'default')
+
+    def test_new_ids_spread_over_shards(self):
+        """Тест: новые выплаты распределяются по всем шардам"""
+        self.assertEqual({shard_for(new_payout_id()) for _ in range(200)}, set(ALIASES))
+
+    def test_adding_shard_keeps_existing_payouts(self):
+        """Тест: добавление шарда не меняет шард существующих выплат, uuid4 до шардирования - в default"""
+        payout_ids = [new_payout_id() for _ in range(50)]
+        before = [shard_for(payout_id) for payout_id in payout_ids]
+
+        with override_settings(PAYOUT_SHARDS={**PAYOUT_SHARDS, 'ALIASES': [*ALIASES, 'shard_3']}):
+            self.assertEqual([shard_for(payout_id) for payout_id in payout_ids], before)
+            self.assertEqual({shard_for(uuid.uuid4()) for _ in range(50)}, {'default'})
+
+    def test_router_uses_payout_id(self):
+        """Тест: выплата и чтение выплаты из связанной записи - в шард по ID"""
+        payout = Payout(id=new_payout_id(2), amount=Decimal('1.00'), currency=Currency.RUB)
+        dead_letter = PayoutDeadLetter(payout_id=payout.id, error_class='GatewayError')
+
+        self.assertEqual(self.router.db_for_write(Payout, instance=payout), 'shard_2')
+        self.assertEqual(self.router.db_for_read(Payout, instance=dead_letter), 'shard_2')
+        self.assertIsNone(self.router.db_for_read(PayoutDeadLetter, instance=payout))
+        self.assertIsNone(self.router.db_for_read(Payout))
+
+    def test_relations(self):
+        """Тест: связь с глобальной записью допустима, между шардами - нет"""
+        first = Payout(id=new_payout_id(1))
+        second = Payout(id=new_payout_id(2))
+        dead_letter = PayoutDeadLetter(payout_id=second.id)
+
+        self.assertTrue(self.router.allow_relation(first, dead_letter))
+        self.assertFalse(self.router.allow_relation(first, second))
+        self.assertIsNone(self.router.allow_relation(dead_letter, WebhookEndpoint()))
+
+    @override_settings(PAYOUT_SHARDS={**PAYOUT_SHARDS, 'ALIASES': []})
+    def test_sharding_disabled(self):
+        """Тест: без шардов решение остается за роутером реплик"""
+        payout = Payout(id=new_payout_id(2))
+
+        self.assertEqual(shard_for(payout.id), 'default')
+        self.assertIsNone(self.router.db_for_write(Payout, instance=payout))
+
+
+@override_settings(PAYOUT_SHARDS=PAYOUT_SHARDS, PAYOUT_ROUTING=PAYOUT_ROUTING, QUERY_BUDGETS=QUERY_BUDGETS)
+class ShardedPayoutsTestCase(TestCase):
+    databases = set(ALIASES)
+
+    def setUp(self):
+        self.client = TestClient(router)
+
+    def create_payout(self, shard: int, **kwargs) -> Payout:
+        kwargs.setdefault('amount', Decimal('100.50'))
+        kwargs.setdefault('currency', Currency.USD)
+        return Payout.objects.create_payout(id=new_payout_id(shard), recipient_details=CARD, **kwargs)
+
+    def stored_in(self, payout_id):
+        return [alias for alias in ALIASES if Payout.objects.using(alias).filter(id=payout_id).exists()]
+
+    @patch('api_payouts.services.payout_service.PayoutService.execute_payout')
+    def test_api_payout_stored_in_owning_shard(self, mock_execute):
+        """Тест: созданная через API выплата лежит только в своем шарде и читается по ID"""
+        response = self.client.post("/", json={
+            "amount": "100.50", "currency": "USD", "description": "shard", "recipient_details": CARD,
+        })
+        payout_id = response.json()['id']
+
+        self.assertEqual(self.stored_in(payout_id), [shard_for(payout_id)])
+        self.assertTrue(PayoutRecipient.objects.using(shard_for(payout_id)).filter(payout_id=payout_id).exists())
+        self.assertEqual(self.client.get(f"/{payout_id}/").json()['recipient_details'], CARD)
+        self.assertEqual(self.client.get(f"/{payout_id}/").json()['id'], payout_id)
+
+    def test_list_merges_shards_by_created_at(self):
+        """Тест: список - слияние шардов по дате создания, пагинация сквозная"""
+        now = timezone.now()
+        payouts = [self.create_payout(index % len(ALIASES)) for index in range(7)]
+        for age, payout in enumerate(payouts):
+            Payout.objects.for_payout(payout.id).filter(id=payout.id).update(created_at=now - timedelta(minutes=age))
+        expected = [str(payout.id) for payout in payouts]
+
+        first = self.client.get("/?page=1&page_size=3").json()
+        third = self.client.get("/?page=3&page_size=3").json()
+
+        self.assertEqual(first['count'], 7)
+        self.assertEqual([item['id'] for item in first['items']], expected[:3])
+        self.assertEqual([item['id'] for item in third['items']], expected[6:])
+        self.assertEqual([str(payout.id) for payout in Payout.objects.list_payouts()], expected)
+
+    def test_update_and_delete_in_shard(self):
+        """Тест: изменение и удаление в шарде выплаты, связанные записи удаляются из default"""
+        payout = self.create_payout(1)
+        PayoutDeadLetter.objects.create(payout=payout, error_class='GatewayError')
+
+        self.client.patch(f"/{payout.id}/", json={"description": "updated"})
+        self.client.delete(f"/{payout.id}/")
+
+        self.assertEqual(self.stored_in(payout.id), [])
+        self.assertFalse(PayoutDeadLetter.objects.filter(payout_id=payout.id).exists())
+
+    @patch('api_payouts.services.celery_services.payout_task_proccessing_service.get_gateway_client')
+    def test_worker_processes_payout_in_its_shard(self, mock_get_client):
+        """Тест: задача идет в очередь шарда выплаты, обработка и событие webhook - в ее шарде"""
+        payout = self.create_payout(2)
+        WebhookEndpoint.objects.create(url='http://receiver.local/hook', secret='s', event_types=['completed'])
+        mock_get_client.return_value.send_payout.return_value = GatewayResponse(
+            payout_id=str(payout.id), accepted=True, transaction_id='tx-1'
+        )
+
+        with self.captureOnCommitCallbacks(using='shard_2', execute=True), \
+                patch('api_payouts.tasks.deliver_webhooks.apply_async'):
+            result = PayoutProcessingService(str(payout.id)).process()
+
+        self.assertTrue(result['success'])
+        self.assertTrue(PayoutQueueRouter.get_queue(payout.id).endswith('.2'))
+        self.assertEqual(Payout.objects.get_payout(str(payout.id)).status, Status.COMPLETED)
+        self.assertEqual(WebhookEvent.objects.get(payout_id=payout.id).status, Status.COMPLETED)
+        history = self.client.get(f"/{payout.id}/history/").json()
+        self.assertEqual([item['to_status'] for item in history['items']], ['processing', 'completed'])
+        self.assertEqual(PayoutEvent.objects.using('shard_2').filter(payout_id=payout.id).count(), 2)
+
+    @override_settings(PAYOUT_SWEEPER={**settings.PAYOUT_SWEEPER, 'BATCH_SIZE': 10, 'MAX_BATCHES': 1})
+    @patch('api_payouts.services.payout_task_service.PayoutTaskService.execute_payout')
+    def test_sweeper_and_requeue_visit_all_shards(self, mock_execute):
+        """Тест: поиск зависших выплат и повтор из dead letter работают по всем шардам"""
+        stuck = [self.create_payout(shard, status=Status.PENDING) for shard in range(len(ALIASES))]
+        for payout in stuck:
+            Payout.objects.for_payout(payout.id).filter(id=payout.id).update(
+                updated_at=timezone.now() - timedelta(hours=1)
+            )
+        failed = self.create_payout(1, status=Status.FAILED)
+        PayoutDeadLetter.objects.create(payout=failed, error_class='GatewayError')
+
+        counts = PayoutSweeperService.sweep()
+        requeued = DeadLetterService.requeue()
+
+        self.assertEqual(counts['pending'], len(ALIASES))
+        self.assertEqual(len(requeued), 1)
+        self.assertEqual(Payout.objects.get_payout(str(failed.id)).status, Status.PENDING)
+        self.assertEqual(mock_execute.call_count, len(ALIASES) + 1)
+
+
+@override_settings(PAYOUT_SHARDS=PAYOUT_SHARDS)
+class ShardedWebhookEventsTestCase(TestCase):
+    databases = set(ALIASES)
+
+    def test_events_recorded_after_shard_commit(self):
+        """Тест: событие выплаты из другого шарда пишется в default после коммита ее транзакции"""
+        WebhookEndpoint.objects.create(url='http://receiver.local/hook', secret='s', event_types=['failed'])
+        payout = Payout.objects.create(id=new_payout_id(1), amount=Decimal('1.00'), recipient_details=CARD)
+
+        with self.captureOnCommitCallbacks(using='shard_1', execute=True), \
+                patch('api_payouts.tasks.deliver_webhooks.apply_async'):
+            payout.mark_as_failed()
+            self.assertFalse(WebhookEvent.objects.exists())
+
+        self.assertEqual(WebhookEvent.objects.get().payout_id, payout.id)
+        self.assertIs(WebhookService.config(), settings.WEBHOOKS)
@@ -0,0 +1,84 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase
+
+import backend
+from api_payouts.services import payout_task_service
+from api_payouts.tasks import payout_task
+from backend.api import api
+from backend.startup import WARMUP_STEPS, warmup
+from benchmarks.import_time import parse_importtime, summarize_imports
+
+IMPORTTIME_OUTPUT = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |     encodings.utf_8
+import time:       300 |        420 |   encodings
+import time:      1000 |       1000 |     django.utils
+import time:      2000 |       3000 |   django
+import time:       500 |       3500 | backend.wsgi
+some unrelated line
+"""
+
+
+class ImportTimeReportTestCase(SimpleTestCase):
+    def test_parse_importtime(self):
+        """Тест разбора вывода -X importtime: время и вложенность модулей"""
+        entries = parse_importtime(IMPORTTIME_OUTPUT)
+        self.assertEqual([entry.module for entry in entries],
+                         ['encodings.utf_8', 'encodings', 'django.utils', 'django', 'backend.wsgi'])
+        self.assertEqual(entries[-1].depth, 0)
+        self.assertEqual(entries[1].depth, 1)
+        self.assertEqual(entries[-1].cumulative_us, 3500)
+
+    def test_summarize_imports(self):
+        """Тест итогов: общее время, тяжелые модули и пакеты"""
+        report = summarize_imports(parse_importtime(IMPORTTIME_OUTPUT), top=2)
+        self.assertEqual(report['total_ms'], 3.9)
+        self.assertEqual(report['modules'], 5)
+        self.assertEqual(report['top_modules'], [{'module': 'backend.wsgi', 'cumulative_ms': 3.5}])
+        self.assertEqual(report['top_packages'][0], {'package': 'django', 'self_ms': 3.0})
+        self.assertEqual(report['imported'], ['backend', 'django', 'encodings'])
+
+    def test_web_startup_does_not_import_celery(self):
+        """Тест: веб-процесс не импортирует Celery и Redis при загрузке"""
+        stdout = StringIO()
+        call_command('import_report', 'web', '--repeat', '1', '--json', '--forbid', 'celery', 'kombu', 'redis',
+                     stdout=stdout)
+        report = json.loads(stdout.getvalue())
+        self.assertEqual(report['target'], 'web')
+        self.assertIn('django', report['imported'])
+
+    def test_forbidden_package_fails(self):
+        """Тест: импорт запрещенного пакета - ошибка команды"""
+        with self.assertRaisesMessage(CommandError, 'django'):
+            call_command('import_report', 'settings', '--repeat', '1', '--forbid', 'django', stdout=StringIO())
+
+
+class LazyImportsTestCase(SimpleTestCase):
+    def test_payout_task_resolved_on_access(self):
+        """Тест: задача выплаты доступна из сервиса через отложенный импорт"""
+        self.assertIs(payout_task_service.payout_task, payout_task)
+        with self.assertRaises(AttributeError):
+            payout_task_service.missing
+
+    def test_celery_app_resolved_on_access(self):
+        """Тест: приложение Celery доступно как backend.celery_app"""
+        from backend.celery import app
+
+        self.assertIs(backend.celery_app, app)
+
+
+class WarmupTestCase(SimpleTestCase):
+    def test_warmup_runs_all_steps(self):
+        """Тест прогрева: все шаги выполнены, схема OpenAPI закэширована"""
+        timings = warmup()
+        self.assertEqual(set(timings), set(WARMUP_STEPS))
+        self.assertIs(api.get_openapi_schema(), api.get_openapi_schema())
+
+    def test_openapi_endpoint_uses_cached_schema(self):
+        """Тест: /api/openapi.json отдает закэшированную схему"""
+        response = self.client.get('/api/openapi.json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('/api/payouts/', response.json()['paths'])
@@ -0,0 +1,164 @@
+import asyncio
+import json
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+from django.test import TestCase, override_settings
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from api_payouts.models import Currency, Payout, Status
+from api_payouts.services.status_stream_service import (
+    PayoutStatusPublisher,
+    PayoutStatusStreamService,
+    broadcaster,
+)
+
+STATUS_STREAM = {
+    'REDIS_URL': 'redis://127.0.0.1:6379/1',
+    'CHANNEL_PREFIX': 'payouts:status:',
+    'HEARTBEAT': 0.05,
+    'MAX_DURATION': 1,
+    'RETRY_MS': 3000,
+    'QUEUE_SIZE': 2,
+    'RECONNECT_DELAY': 1.0,
+}
+
+
+def parse_events(body: str):
+    return [
+        json.loads(line[len('data: '):])
+        for line in body.splitlines()
+        if line.startswith('data: ')
+    ]
+
+
+async def read_stream(response) -> str:
+    return ''.join([chunk.decode() async for chunk in response.streaming_content])
+
+
+@override_settings(STATUS_STREAM=STATUS_STREAM)
+class PayoutStatusPublisherTestCase(TestCase):
+    def setUp(self):
+        self.payout = Payout.objects.create(
+            amount=Decimal("100.50"),
+            currency=Currency.USD,
+            recipient_details={"card_number": "5555555555554444"},
+        )
+        self.redis = MagicMock()
+        patcher = patch.object(PayoutStatusPublisher, '_redis', self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_status_change_published_after_commit(self):
+        """Тест публикации смены статуса в канал выплаты только после коммита"""
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.payout.mark_as_completed()
+            self.redis.publish.assert_not_called()
+
+        self.assertEqual(len(callbacks), 1)
+        channel, data = self.redis.publish.call_args.args
+        self.assertEqual(channel, f'payouts:status:{self.payout.id}')
+        self.assertEqual(json.loads(data)['status'], Status.COMPLETED)
+        self.assertEqual(json.loads(data)['amount'], '100.50')
+
+    def test_redis_unavailable_does_not_break_transition(self):
+        """Тест недоступности Redis: статус сохраняется, ошибка не пробрасывается"""
+        self.redis.publish.side_effect = RedisConnectionError("down")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.payout.mark_as_failed("Ошибка шлюза")
+
+        self.payout.refresh_from_db()
+        self.assertEqual(self.payout.status, Status.FAILED)
+
+
+@override_settings(STATUS_STREAM=STATUS_STREAM)
+class PayoutStatusStreamTestCase(TestCase):
+    def setUp(self):
+        self.payout = Payout.objects.create(
+            amount=Decimal("100.50"),
+            currency=Currency.USD,
+            recipient_details={"card_number": "5555555555554444"},
+        )
+        # Без Redis: события подаются в рассылку напрямую
+        patcher = patch.object(broadcaster, '_ensure_listener')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def event(self, status, currency=Currency.USD, payout_id=None):
+        return {'id': payout_id or str(self.payout.id), 'status': status, 'amount': '100.50',
+                'currency': currency, 'updated_at': None}
+
+    async def test_payout_stream_until_final_status(self):
+        """Тест потока выплаты: текущий статус, переходы, закрытие на итоговом статусе"""
+        async def publish():
+            await asyncio.sleep(0.01)
+            broadcaster.dispatch(self.event(Status.PROCESSING, payout_id='other'))
+            broadcaster.dispatch(self.event(Status.PROCESSING))
+            broadcaster.dispatch(self.event(Status.COMPLETED))
+
+        response = await self.async_client.get(f'/api/payouts/{self.payout.id}/stream/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        publisher = asyncio.create_task(publish())
+        body = await read_stream(response)
+        await publisher
+
+        self.assertTrue(body.startswith('retry: 3000'))
+        self.assertEqual(
+            [event['status'] for event in parse_events(body)],
+            [Status.PENDING, Status.PROCESSING, Status.COMPLETED],
+        )
+        self.assertEqual(broadcaster.subscriptions, set())
+
+    async def test_final_payout_stream_closes_immediately(self):
+        """Тест завершенной выплаты: один снимок статуса без подписки на события"""
+        await Payout.objects.filter(id=self.payout.id).aupdate(status=Status.CANCELLED)
+
+        response = await self.async_client.get(f'/api/payouts/{self.payout.id}/stream/')
+        body = await read_stream(response)
+
+        self.assertEqual([event['status'] for event in parse_events(body)], [Status.CANCELLED])
+
+    async def test_unknown_payout_not_found(self):
+        """Тест потока несуществующей выплаты"""
+        response = await self.async_client.get(
+            '/api/payouts/00000000-0000-4000-8000-000000000000/stream/'
+        )
+        self.assertEqual(response.status_code, 404)
+
+    async def test_filtered_stream_with_heartbeat(self):
+        """Тест потока по фильтру: только подходящие события, heartbeat, закрытие по MAX_DURATION"""
+        async def publish():
+            await asyncio.sleep(0.1)
+            broadcaster.dispatch(self.event(Status.COMPLETED, currency=Currency.RUB))
+            broadcaster.dispatch(self.event(Status.PROCESSING))
+            broadcaster.dispatch(self.event(Status.COMPLETED))
+
+        with self.settings(STATUS_STREAM={**STATUS_STREAM, 'MAX_DURATION': 0.3}):
+            response = await self.async_client.get('/api/payouts/stream/', {'currency': 'USD'})
+            publisher = asyncio.create_task(publish())
+            body = await read_stream(response)
+            await publisher
+
+        self.assertIn(': ping', body)
+        self.assertEqual(
+            [(event['status'], event['currency']) for event in parse_events(body)],
+            [(Status.PROCESSING, 'USD'), (Status.COMPLETED, 'USD')],
+        )
+
+    async def test_slow_subscriber_keeps_latest_events(self):
+        """Тест переполненной очереди подписчика: отбрасываются самые старые события"""
+        stream = PayoutStatusStreamService.stream_statuses(status=None)
+        await stream.__anext__()
+        subscription, = broadcaster.subscriptions
+
+        for status in (Status.PROCESSING, Status.FAILED, Status.COMPLETED):
+            broadcaster.dispatch(self.event(status))
+        await stream.aclose()
+
+        self.assertEqual(
+            [subscription.queue.get_nowait()['status'] for _ in range(subscription.queue.qsize())],
+            [Status.FAILED, Status.COMPLETED],
+        )
+        self.assertEqual(broadcaster.subscriptions, set())
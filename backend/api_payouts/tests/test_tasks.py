@@ -0,0 +1,528 @@
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch, MagicMock
+
+from django.test import TestCase, override_settings
+from kombu.exceptions import ChannelError
+from prometheus_client import REGISTRY
+from django.utils import timezone
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from api_payouts.metrics import STAGE_BUCKETS
+from api_payouts.models import Payout, PayoutDeadLetter, Currency, Status
+from api_payouts.tasks import payout_task, sweep_stuck_payouts
+from api_payouts.services.celery_services.payout_task_proccessing_service import (
+    PayoutProcessingService,
+    RateLimited,
+    StopProcessing,
+)
+from api_payouts.services.celery_services.payout_queue_router import PayoutSource
+from api_payouts.services.celery_services.rate_limiter import RateLimitDecision, TokenBucketRateLimiter
+from api_payouts.services.celery_services.retry_policy import RetryPolicy, get_retry_policy
+from api_payouts.services.celery_services.stage_timer import StageTimer, StageTimingAggregator, stage_aggregator
+from api_payouts.services.celery_services.worker_metrics import QueueDepthCollector
+from api_payouts.services.gateway_services import GatewayError, GatewayResponse
+
+
+RATE_LIMIT_SETTINGS = {
+    'ENABLED': True,
+    'CACHE_ALIAS': 'default',
+    'KEY_PREFIX': 'payout-rate',
+    'DEFAULT': {'RATE': 10, 'CAPACITY': 20},
+    'BUCKETS': {'USD': {'RATE': 1}},
+}
+
+
+@override_settings(PAYOUT_RATE_LIMIT=RATE_LIMIT_SETTINGS)
+class TokenBucketRateLimiterTestCase(TestCase):
+    def setUp(self):
+        self.redis = MagicMock()
+        self.script = self.redis.register_script.return_value
+        self.limiter = TokenBucketRateLimiter(redis_client=self.redis)
+
+    def test_bucket_params_per_currency(self):
+        """Тест параметров корзины по валюте"""
+        self.assertEqual(self.limiter.bucket_params('USD'), {'RATE': 1, 'CAPACITY': 20})
+        self.assertEqual(self.limiter.bucket_params('EUR'), {'RATE': 10, 'CAPACITY': 20})
+
+    def test_acquire_allowed(self):
+        """Тест успешного получения токена"""
+        self.script.return_value = [1, '19', '0']
+
+        decision = self.limiter.acquire('default', 'EUR')
+
+        self.assertTrue(decision.allowed)
+        self.assertEqual(decision.tokens, 19.0)
+        self.script.assert_called_once_with(keys=['payout-rate:default:EUR'], args=[10, 20, 1])
+
+    def test_acquire_throttled(self):
+        """Тест отказа при пустой корзине"""
+        self.script.return_value = [0, '0.5', '0.5']
+
+        decision = self.limiter.acquire('default', 'USD')
+
+        self.assertFalse(decision.allowed)
+        self.assertEqual(decision.retry_after, 0.5)
+
+    def test_redis_unavailable_fails_open(self):
+        """Тест пропуска без ограничения при недоступном Redis"""
+        self.script.side_effect = RedisConnectionError()
+
+        self.assertTrue(self.limiter.acquire('default', 'USD').allowed)
+
+    @override_settings(PAYOUT_RATE_LIMIT={**RATE_LIMIT_SETTINGS, 'ENABLED': False})
+    def test_disabled(self):
+        """Тест выключенного rate limiter"""
+        self.assertTrue(self.limiter.acquire('default', 'USD').allowed)
+        self.redis.register_script.assert_not_called()
+
+
+class PayoutRateLimitedProcessingTestCase(TestCase):
+    def setUp(self):
+        self.payout = Payout.objects.create(
+            amount=Decimal("100.50"),
+            currency=Currency.USD,
+            description="Test payout",
+            recipient_details={"card_number": "5555555555554444"},
+        )
+
+    @patch('api_payouts.services.celery_services.payout_task_proccessing_service.get_gateway_client')
+    @patch('api_payouts.services.celery_services.payout_task_proccessing_service.get_rate_limiter')
+    def test_throttled_payout_is_deferred(self, mock_get_limiter, mock_get_client):
+        """Тест откладывания выплаты без токена: статус и история не меняются"""
+        mock_get_limiter.return_value.acquire.return_value = RateLimitDecision(
+            allowed=False, bucket='default:USD', retry_after=2.5
+        )
+        events = self.payout.events.count()
+
+        with patch('api_payouts.models.payout_status_changed.send') as status_changed:
+            with self.assertRaises(RateLimited) as ctx:
+                PayoutProcessingService(str(self.payout.id)).process()
+
+        self.assertEqual(ctx.exception.retry_after, 2.5)
+        mock_get_client.return_value.send_payout.assert_not_called()
+        status_changed.assert_not_called()
+
+        self.payout.refresh_from_db()
+        self.assertEqual(self.payout.status, Status.PENDING)
+        self.assertEqual(self.payout.events.count(), events)
+
+    @patch('api_payouts.tasks.payout_task.apply_async')
+    @patch('api_payouts.tasks.PayoutProcessingService')
+    def test_task_requeues_with_countdown(self, mock_service, mock_apply_async):
+        """Тест повторной постановки задачи с задержкой без расхода попыток"""
+        mock_service.return_value.process.side_effect = RateLimited(retry_after=2.5, bucket='default:USD')
+
+        result = payout_task.apply(args=[str(self.payout.id)]).get()
+
+        self.assertTrue(result['deferred'])
+        mock_apply_async.assert_called_once()
+        self.assertEqual(mock_apply_async.call_args.kwargs['countdown'], 2.5)
+        self.assertEqual(mock_apply_async.call_args.kwargs['kwargsrepr'], "{'history': <0 записей>}")
+        self.assertIn('serializer', mock_apply_async.call_args.kwargs)
+
+
+class PayoutDuplicateTaskTestCase(TestCase):
+    def setUp(self):
+        self.payout = Payout.objects.create(
+            amount=Decimal("100.50"),
+            currency=Currency.USD,
+            description="Test payout",
+            recipient_details={"card_number": "5555555555554444"},
+        )
+        self.task = MagicMock()
+        self.task.request.id = 'task-2'
+
+    @patch('api_payouts.services.celery_services.payout_task_proccessing_service.get_gateway_client')
+    def test_payout_processed_by_other_task_is_skipped(self, mock_get_client):
+        """Тест: дубль задачи не отправляет выплату, которую обрабатывает другая задача"""
+        self.payout.claim_for_processing(task_id='task-1')
+
+        result = PayoutProcessingService(str(self.payout.id), task=self.task).process()
+
+        self.assertFalse(result['success'])
+        self.assertEqual(result['status'], Status.PROCESSING)
+        mock_get_client.return_value.send_payout.assert_not_called()
+        self.assertEqual(self.payout.events.count(), 1)
+
+    @patch('api_payouts.services.celery_services.payout_task_proccessing_service.get_gateway_client')
+    def test_claim_lost_between_read_and_update(self, mock_get_client):
+        """Тест: выплату захватили после чтения - условный UPDATE не меняет строку, отправки нет"""
+        service = PayoutProcessingService(str(self.payout.id), task=self.task)
+        service._setup()
+        Payout.objects.get(id=self.payout.id).claim_for_processing(task_id='task-1')
+
+        with self.assertRaises(StopProcessing):
+            service._set_processing()
+        mock_get_client.return_value.send_payout.assert_not_called()
+
+
+    @patch('api_payouts.services.celery_services.payout_task_proccessing_service.get_gateway_client')
+    def test_completion_lost_to_sweeper(self, mock_get_client):
+        """Тест: медленная задача не завершает выплату, которую поиск зависших уже перевел в ошибку"""
+        def send_payout(payout):
+            # Пока шла отправка, поиск зависших перевел выплату в ошибку
+            Payout.objects.get(id=payout.id).mark_as_failed(error_message='зависла')
+            return GatewayResponse(payout_id=str(payout.id), accepted=True, transaction_id='txn-1')
+
+        mock_get_client.return_value.send_payout.side_effect = send_payout
+
+        result = PayoutProcessingService(str(self.payout.id), task=self.task).process()
+
+        self.assertFalse(result['success'])
+        self.assertEqual((result['status'], result['transaction_id']), (Status.FAILED, 'txn-1'))
+        self.payout.refresh_from_db()
+        self.assertEqual(self.payout.status, Status.FAILED)
+        self.assertFalse(self.payout.events.filter(to_status=Status.COMPLETED).exists())
+
+
+class StageTimingTestCase(TestCase):
+    def setUp(self):
+        self.payout = Payout.objects.create(
+            amount=Decimal("100.50"),
+            currency=Currency.USD,
+            description="Test payout",
+            recipient_details={"card_number": "5555555555554444"},
+        )
+        stage_aggregator.flush()
+
+    @patch('api_payouts.services.celery_services.payout_task_proccessing_service.get_gateway_client')
+    def test_result_contains_stage_breakdown(self, mock_get_client):
+        """Тест разбивки длительности по этапам в результате задачи"""
+        mock_get_client.return_value.send_payout.return_value = GatewayResponse(
+            payout_id=str(self.payout.id), accepted=True, transaction_id="tx-1"
+        )
+
+        result = PayoutProcessingService(str(self.payout.id)).process()
+
+        self.assertEqual(
+            list(result['timings']),
+            ['setup', 'validation', 'processing',
+             'gateway.check_data', 'gateway.verify_balance', 'gateway.reserve_funds',
+             'gateway.prepare_transaction', 'gateway.send', 'gateway', 'completion'],
+        )
+        self.assertGreaterEqual(result['timings']['gateway'], result['timings']['gateway.send'])
+
+        stats = stage_aggregator.flush()
+        self.assertEqual(stats['gateway.send'][0], 1)
+
+    def test_aggregator_accumulates_buckets(self):
+        """Тест накопления замеров по корзинам гистограммы до выгрузки"""
+        aggregator = StageTimingAggregator(flush_interval=3600)
+        aggregator.record('setup', 2_000_000)
+        aggregator.record('setup', 5_000_000)
+        aggregator.record('setup', 20_000_000_000)
+
+        count, total_ns, max_ns, buckets, bucket_ns = aggregator.flush()['setup']
+
+        self.assertEqual((count, total_ns, max_ns), (3, 20_007_000_000, 20_000_000_000))
+        # 2 мс и 5 мс - в корзине le=0.005, 20 с - в +Inf
+        self.assertEqual(buckets[STAGE_BUCKETS.index(0.005)], 2)
+        self.assertEqual(buckets[len(STAGE_BUCKETS)], 1)
+        self.assertEqual(bucket_ns[STAGE_BUCKETS.index(0.005)], 7_000_000)
+        self.assertEqual(aggregator.flush(), {})
+
+    def test_flush_observes_histogram(self):
+        """Тест выгрузки корзин в гистограмму payout_stage_duration_seconds"""
+        aggregator = StageTimingAggregator(flush_interval=3600)
+
+        def sample(name, le):
+            return REGISTRY.get_sample_value(name, {'stage': 'test.flush', 'le': le}) or 0
+
+        before = sample('payout_stage_duration_seconds_bucket', '0.005')
+        before_le_1 = sample('payout_stage_duration_seconds_bucket', '1.0')
+        before_inf = sample('payout_stage_duration_seconds_bucket', '+Inf')
+        before_sum = REGISTRY.get_sample_value('payout_stage_duration_seconds_sum', {'stage': 'test.flush'}) or 0
+        aggregator.record('test.flush', 2_000_000)
+        aggregator.record('test.flush', 5_000_000)
+        aggregator.record('test.flush', 700_000_000)
+        aggregator.flush()
+
+        self.assertEqual(sample('payout_stage_duration_seconds_bucket', '0.005') - before, 2)
+        self.assertEqual(sample('payout_stage_duration_seconds_bucket', '1.0') - before_le_1, 3)
+        self.assertEqual(sample('payout_stage_duration_seconds_bucket', '+Inf') - before_inf, 3)
+        self.assertAlmostEqual(
+            REGISTRY.get_sample_value('payout_stage_duration_seconds_sum', {'stage': 'test.flush'}) - before_sum, 0.707
+        )
+
+    def test_flusher_runs_in_background(self):
+        """Тест выгрузки фоновым потоком без вызова flush со стороны сбора метрик"""
+        aggregator = StageTimingAggregator(flush_interval=0.01)
+        with patch.object(aggregator, 'flush', wraps=aggregator.flush) as flush:
+            aggregator.record('setup', 1_000_000)
+            for _ in range(100):
+                if flush.called:
+                    break
+                time.sleep(0.01)
+
+        self.assertTrue(flush.called)
+
+    def test_timer_records_failed_stage(self):
+        """Тест учета длительности этапа, завершившегося ошибкой"""
+        timer = StageTimer()
+
+        with self.assertRaises(ValueError):
+            with timer.stage('validation'):
+                raise ValueError()
+
+        self.assertIn('validation', timer.breakdown())
+
+
+COMPACT_RESULTS = {'MODE': 'compact', 'ERROR_MAX_LENGTH': 20}
+
+
+class TaskResultModeTestCase(TestCase):
+    def setUp(self):
+        self.payout = Payout.objects.create(
+            amount=Decimal("100.50"),
+            currency=Currency.USD,
+            description="Test payout",
+            recipient_details={"card_number": "5555555555554444"},
+        )
+        self.task = MagicMock()
+        self.task.request.id = 'task-1'
+
+    @override_settings(PAYOUT_TASK_RESULTS=COMPACT_RESULTS)
+    def test_compact_result_without_progress(self):
+        """Тест компактного результата: код и отметки времени, без состояний PROGRESS"""
+        result = PayoutProcessingService(str(self.payout.id), task=self.task).process()
+
+        self.assertEqual(list(result), ['code', 'started_at', 'finished_at'])
+        self.assertEqual(result['code'], 'completed')
+        self.assertLessEqual(result['started_at'], result['finished_at'])
+        self.task.update_state.assert_not_called()
+
+    def test_verbose_result_with_progress(self):
+        """Тест подробного режима: прогресс по этапам и подробный результат"""
+        result = PayoutProcessingService(str(self.payout.id), task=self.task).process()
+
+        self.assertTrue(result['success'])
+        states = {call.kwargs['state'] for call in self.task.update_state.call_args_list}
+        self.assertEqual(states, {'PROGRESS'})
+        self.assertEqual(self.task.update_state.call_count, 9)
+
+    @override_settings(PAYOUT_TASK_RESULTS=COMPACT_RESULTS, PAYOUT_RETRY_POLICIES={
+        'default': {'MAX_RETRIES': 0, 'BASE_DELAY': 1, 'MAX_DELAY': 1},
+    })
+    @patch('api_payouts.tasks.PayoutProcessingService')
+    def test_compact_dead_letter_result_truncates_error(self, mock_service):
+        """Тест компактного результата ошибки: код и укороченный текст"""
+        mock_service.return_value.process.side_effect = ValueError("x" * 100)
+
+        result = payout_task.apply(args=[str(self.payout.id)]).get()
+
+        self.assertEqual(result['code'], 'dead_letter')
+        self.assertEqual(result['error'], "x" * 20)
+
+    @override_settings(PAYOUT_TASK_RESULTS=COMPACT_RESULTS)
+    def test_compact_result_for_completed_payout(self):
+        """Тест компактного результата повторной обработки завершенной выплаты"""
+        self.payout.mark_as_completed()
+
+        result = PayoutProcessingService(str(self.payout.id), task=self.task).process()
+
+        self.assertEqual(list(result), ['code', 'started_at', 'finished_at'])
+        self.assertEqual(result['code'], 'skipped')
+
+    @override_settings(PAYOUT_TASK_RESULTS=COMPACT_RESULTS)
+    @patch('api_payouts.tasks.PayoutProcessingService')
+    def test_compact_result_for_stop_without_result(self, mock_service):
+        """Тест задачи: остановка обработки без результата - компактный итог skipped"""
+        mock_service.return_value.process.side_effect = StopProcessing()
+
+        result = payout_task.apply(args=[str(self.payout.id)]).get()
+
+        self.assertEqual(list(result), ['code', 'started_at', 'finished_at'])
+        self.assertEqual(result['code'], 'skipped')
+
+
+RETRY_POLICIES = {
+    'ConnectionError': {'MAX_RETRIES': 2, 'BASE_DELAY': 1, 'MAX_DELAY': 4},
+    'GatewayError': {'MAX_RETRIES': 0, 'BASE_DELAY': 1, 'MAX_DELAY': 4},
+    'default': {'MAX_RETRIES': 1, 'BASE_DELAY': 1, 'MAX_DELAY': 4},
+}
+
+
+@override_settings(PAYOUT_RETRY_POLICIES=RETRY_POLICIES)
+class PayoutRetryPolicyTestCase(TestCase):
+    def setUp(self):
+        self.payout = Payout.objects.create(
+            amount=Decimal("100.50"),
+            currency=Currency.USD,
+            description="Test payout",
+            recipient_details={"card_number": "5555555555554444"},
+        )
+
+    def test_countdown_full_jitter_with_cap(self):
+        """Тест задержки с полным джиттером и ограничением сверху"""
+        policy = RetryPolicy(max_retries=5, base_delay=2, max_delay=10)
+
+        for attempt in range(6):
+            for _ in range(20):
+                delay = policy.countdown(attempt)
+                self.assertGreaterEqual(delay, 0)
+                self.assertLessEqual(delay, min(10, 2 * 2 ** attempt))
+
+    def test_policy_lookup_by_error_class(self):
+        """Тест выбора политики по классу ошибки и его родителям"""
+        self.assertEqual(get_retry_policy(ConnectionRefusedError()).max_retries, 2)
+        self.assertEqual(get_retry_policy(GatewayError("declined")).max_retries, 0)
+        self.assertEqual(get_retry_policy(ValueError()).max_retries, 1)
+
+    @patch('api_payouts.tasks.PayoutProcessingService')
+    def test_exhausted_payout_goes_to_dead_letter(self, mock_service):
+        """Тест переноса в dead letter после исчерпания попыток с историей ошибок"""
+        mock_service.return_value.process.side_effect = ConnectionRefusedError("gateway down")
+
+        result = payout_task.apply(args=[str(self.payout.id)]).get()
+
+        self.assertTrue(result['dead_letter'])
+        self.assertEqual(mock_service.return_value.process.call_count, 3)
+
+        dead_letter = PayoutDeadLetter.objects.get(payout=self.payout)
+        self.assertEqual(dead_letter.error_class, 'ConnectionRefusedError')
+        self.assertEqual(dead_letter.attempts, 3)
+        self.assertEqual([entry['attempt'] for entry in dead_letter.history], [1, 2, 3])
+
+    @patch('api_payouts.tasks.PayoutProcessingService')
+    def test_non_retryable_error_goes_to_dead_letter_immediately(self, mock_service):
+        """Тест ошибки без повторов"""
+        mock_service.return_value.process.side_effect = GatewayError("declined")
+
+        result = payout_task.apply(args=[str(self.payout.id)]).get()
+
+        self.assertTrue(result['dead_letter'])
+        self.assertEqual(mock_service.return_value.process.call_count, 1)
+        self.assertEqual(PayoutDeadLetter.objects.get(payout=self.payout).attempts, 1)
+
+
+SWEEPER_SETTINGS = {
+    'BATCH_SIZE': 2,
+    'MAX_BATCHES': 2,
+    'DISPATCH_TIMEOUT': 900,
+    'RULES': {
+        'pending': {'AFTER': 300, 'ACTION': 'requeue'},
+        'processing': {'AFTER': 1800, 'ACTION': 'fail'},
+    },
+}
+
+
+@override_settings(PAYOUT_SWEEPER=SWEEPER_SETTINGS)
+class PayoutSweeperTestCase(TestCase):
+    def create_payout(self, status, age_seconds):
+        payout = Payout.objects.create(
+            amount=Decimal("100.50"),
+            currency=Currency.USD,
+            status=status,
+            recipient_details={"card_number": "5555555555554444"},
+        )
+        # auto_now не дает задать updated_at через save
+        Payout.objects.filter(id=payout.id).update(updated_at=timezone.now() - timedelta(seconds=age_seconds))
+        return payout
+
+    @patch('api_payouts.services.payout_task_service.PayoutTaskService.execute_payout')
+    def test_sweep_requeues_pending_and_fails_processing(self, mock_execute):
+        """Тест повторной постановки pending и перевода processing в ошибку"""
+        stuck_pending = self.create_payout(Status.PENDING, 600)
+        fresh_pending = self.create_payout(Status.PENDING, 10)
+        stuck_processing = self.create_payout(Status.PROCESSING, 3600)
+        completed = self.create_payout(Status.COMPLETED, 3600)
+
+        counts = sweep_stuck_payouts.apply().get()
+
+        self.assertEqual(counts, {'pending': 1, 'processing': 1})
+        mock_execute.assert_called_once_with(
+            str(stuck_pending.id), amount=stuck_pending.amount, currency=stuck_pending.currency,
+            source=PayoutSource.BATCH,
+        )
+
+        stuck_processing.refresh_from_db()
+        self.assertEqual(stuck_processing.status, Status.FAILED)
+        self.assertEqual(stuck_processing.description, None)
+        self.assertIn("зависла", stuck_processing.events.get(to_status=Status.FAILED).error)
+
+        stuck_pending.refresh_from_db()
+        self.assertGreater(stuck_pending.updated_at, timezone.now() - timedelta(seconds=60))
+        fresh_pending.refresh_from_db()
+        self.assertEqual(fresh_pending.status, Status.PENDING)
+        completed.refresh_from_db()
+        self.assertEqual(completed.status, Status.COMPLETED)
+
+    @patch('api_payouts.services.payout_task_service.PayoutTaskService.execute_payout')
+    def test_sweep_skips_pending_with_live_task(self, mock_execute):
+        """Тест: pending-выплата с недавно поставленной задачей повторно не ставится"""
+        queued = self.create_payout(Status.PENDING, 600)
+        lost = self.create_payout(Status.PENDING, 600)
+        Payout.objects.filter(id=queued.id).update(task_id='task-1', dispatched_at=timezone.now() - timedelta(seconds=600))
+        Payout.objects.filter(id=lost.id).update(task_id='task-2', dispatched_at=timezone.now() - timedelta(seconds=3600))
+
+        counts = sweep_stuck_payouts.apply().get()
+
+        self.assertEqual(counts['pending'], 1)
+        mock_execute.assert_called_once_with(
+            str(lost.id), amount=lost.amount, currency=lost.currency, source=PayoutSource.BATCH
+        )
+
+    @patch('api_payouts.tasks.payout_task.apply_async')
+    def test_requeue_records_dispatch(self, mock_apply_async):
+        """Тест: повторная постановка записывает ID задачи - следующий проход выплату не берет"""
+        stuck = self.create_payout(Status.PENDING, 600)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sweep_stuck_payouts.apply().get()
+
+        stuck.refresh_from_db()
+        self.assertEqual(mock_apply_async.call_args.kwargs['task_id'], stuck.task_id)
+        # Массовая повторная постановка - в очередь bulk
+        self.assertEqual(mock_apply_async.call_args.kwargs['queue'], 'payouts.bulk')
+        self.assertIsNotNone(stuck.dispatched_at)
+
+        Payout.objects.filter(id=stuck.id).update(updated_at=timezone.now() - timedelta(seconds=600))
+        self.assertEqual(sweep_stuck_payouts.apply().get()['pending'], 0)
+
+    @patch('api_payouts.services.payout_task_service.PayoutTaskService.execute_payout')
+    def test_sweep_is_bounded(self, mock_execute):
+        """Тест ограничения числа выплат за один проход"""
+        for _ in range(5):
+            self.create_payout(Status.PENDING, 600)
+
+        counts = sweep_stuck_payouts.apply().get()
+
+        self.assertEqual(counts['pending'], 4)
+        self.assertEqual(mock_execute.call_count, 4)
+
+
+class WorkerMetricsTestCase(TestCase):
+    def test_queue_depth_collector(self):
+        """Тест сбора глубины очередей у брокера"""
+        app = MagicMock()
+        channel = app.connection_for_read.return_value.__enter__.return_value.default_channel
+        channel.queue_declare.return_value = ('payouts.default', 7, 0)
+
+        metric = next(QueueDepthCollector(app).collect())
+        depths = {sample.labels['queue']: sample.value for sample in metric.samples}
+
+        self.assertEqual(depths['payouts.default'], 7)
+        self.assertIn('celery', depths)
+
+    def test_queue_depth_collector_empty_and_failed_queues(self):
+        """Тест: пустая очередь Redis (NOT_FOUND) - 0, ошибка одной очереди не прерывает сбор"""
+        app = MagicMock()
+        channel = app.connection_for_read.return_value.__enter__.return_value.default_channel
+
+        def queue_declare(queue, passive):
+            if queue == 'celery':
+                raise ChannelError(f'NOT_FOUND - no queue {queue!r}', (50, 10), 'Channel.queue_declare', '404')
+            if queue == 'payouts.high':
+                raise ChannelError('ACCESS_REFUSED', reply_code=403)
+            return queue, 3, 0
+
+        channel.queue_declare.side_effect = queue_declare
+
+        metric = next(QueueDepthCollector(app).collect())
+        depths = {sample.labels['queue']: sample.value for sample in metric.samples}
+
+        self.assertEqual(depths['celery'], 0)
+        self.assertNotIn('payouts.high', depths)
+        self.assertEqual(depths['payouts.default'], 3)
@@ -0,0 +1,189 @@
+import json
+import os
+import tempfile
+import time
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.client import Client
+from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from api_payouts.models import Currency, Payout
+from api_payouts.services.celery_services import task_tracing
+from api_payouts.services.celery_services.stage_timer import StageTimer
+from api_payouts.services.payout_task_service import PayoutTaskService
+from api_payouts.tasks import payout_task
+from backend import tracing
+
+TRACING = {**settings.TRACING, 'ENABLED': True, 'SAMPLE_RATE': 1.0}
+CARD_DATA = {'card_number': '5555555555554444', 'card_holder': 'Ivanov Ivan', 'expiry_date': '12/25'}
+
+
+def hex_id(value: int, size: int) -> str:
+    return format(value, f'0{size}x')
+
+
+class TracingTestMixin:
+    def setUp(self):
+        super().setUp()
+        self.exporter = InMemorySpanExporter()
+        self.use_provider()
+
+    def use_provider(self):
+        """Провайдер SDK по текущим TRACING с синхронной выгрузкой спанов в память"""
+        patcher = patch.object(tracing, '_provider', tracing.build_provider(SimpleSpanProcessor(self.exporter)))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def by_name(self, name):
+        return [span for span in self.exporter.get_finished_spans() if span.name == name]
+
+
+@override_settings(TRACING=TRACING)
+class TraceContextTestCase(TracingTestMixin, SimpleTestCase):
+    def test_traceparent_round_trip(self):
+        """Тест разбора и формирования заголовка traceparent"""
+        incoming = '00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01'
+        with tracing.span('child', parent=tracing.parse_traceparent(incoming)) as span:
+            self.assertTrue(tracing.current_traceparent().startswith('00-0af7651916cd43dd8448eb211c80319c-'))
+            self.assertEqual(tracing.traceparent(span), tracing.current_traceparent())
+
+        child, = self.exporter.get_finished_spans()
+        self.assertEqual(hex_id(child.parent.span_id, 16), 'b7ad6b7169203331')
+        self.assertIsNone(tracing.parse_traceparent('00-xyz-b7ad6b7169203331-01'))
+        self.assertIsNone(tracing.parse_traceparent(None))
+
+    def test_nested_spans_share_trace(self):
+        """Тест дочерних спанов: одна трасса, связь с родителем, ошибка в спане"""
+        with self.assertRaises(ValueError):
+            with tracing.span('parent'):
+                with tracing.span('child'):
+                    raise ValueError('boom')
+
+        child, parent = self.exporter.get_finished_spans()
+        self.assertEqual((child.name, parent.name), ('child', 'parent'))
+        self.assertEqual(child.context.trace_id, parent.context.trace_id)
+        self.assertEqual(child.parent.span_id, parent.context.span_id)
+        self.assertEqual(child.status.description, 'ValueError: boom')
+        self.assertIsNone(tracing.current_trace_id())
+
+    @override_settings(TRACING={**TRACING, 'SAMPLE_RATE': 0.0})
+    def test_unsampled_trace_not_exported(self):
+        """Тест несэмплированной трассы: контекст передается, спаны не экспортируются"""
+        self.use_provider()
+        with tracing.span('parent'):
+            flags = int(tracing.current_traceparent().rsplit('-', 1)[1], 16)
+            self.assertFalse(flags & 1)
+
+        self.assertEqual(self.exporter.get_finished_spans(), ())
+
+    def test_inject_trace_context_into_headers(self):
+        """Тест передачи контекста текущего спана в заголовки публикуемой задачи"""
+        headers = {}
+        task_tracing.inject_trace_context(sender='any', headers=headers)
+        self.assertEqual(headers, {})
+
+        with tracing.span('dispatch') as span:
+            task_tracing.inject_trace_context(sender='any', headers=headers)
+        self.assertEqual(headers['traceparent'], tracing.traceparent(span))
+
+    def test_file_exporter(self):
+        """Тест выгрузки спанов в файл JSON Lines пакетным процессором SDK"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'spans.jsonl')
+            with override_settings(TRACING={**TRACING, 'EXPORTER': 'file', 'FILE': path, 'FLUSH_INTERVAL': 0.01}):
+                provider = tracing.build_provider()
+            with patch.object(tracing, '_provider', provider):
+                with tracing.span('exported', attempt=1):
+                    pass
+            provider.shutdown()
+
+            with open(path) as file:
+                data = [json.loads(line) for line in file]
+
+        self.assertEqual(len(data), 1)
+        self.assertEqual(data[0]['name'], 'exported')
+        self.assertEqual(data[0]['attributes'], {'attempt': 1})
+        self.assertEqual(data[0]['service'], TRACING['SERVICE_NAME'])
+
+    @override_settings(TRACING={**TRACING, 'EXPORTER': 'otlp', 'OTLP_ENDPOINT': 'http://collector:4318/'})
+    def test_otlp_exporter(self):
+        """Тест экспортера OTLP/HTTP из SDK: адрес коллектора"""
+        exporter = tracing.build_exporter()
+
+        self.assertIsInstance(exporter, OTLPSpanExporter)
+        self.assertEqual(exporter._endpoint, 'http://collector:4318/v1/traces')
+
+
+@override_settings(TRACING=TRACING)
+class PayoutTracingTestCase(TracingTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.payout = Payout.objects.create(
+            amount=Decimal('100.00'),
+            currency=Currency.RUB,
+            recipient_details=CARD_DATA,
+        )
+
+    @patch('api_payouts.services.payout_task_service.payout_task.apply_async')
+    def test_api_request_starts_trace(self, apply_async):
+        """Тест трассы запроса API: продолжение входящего traceparent, спан постановки задачи"""
+        incoming = '00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01'
+        data = {'amount': '150.00', 'currency': 'RUB', 'recipient_details': CARD_DATA}
+        with self.captureOnCommitCallbacks(execute=True):
+            response = Client().post('/api/payouts/', data, content_type='application/json',
+                                     HTTP_TRACEPARENT=incoming)
+
+        self.assertEqual(response.status_code, 200)
+        apply_async.assert_called_once()
+
+        request_span, = self.by_name('HTTP POST api/payouts/')
+        dispatch_span, = self.by_name('payout.dispatch')
+        self.assertEqual(hex_id(request_span.context.trace_id, 32), '0af7651916cd43dd8448eb211c80319c')
+        self.assertEqual(hex_id(request_span.parent.span_id, 16), 'b7ad6b7169203331')
+        self.assertEqual(dispatch_span.parent.span_id, request_span.context.span_id)
+        self.assertEqual(response['traceparent'],
+                         f'00-0af7651916cd43dd8448eb211c80319c-{hex_id(request_span.context.span_id, 16)}-01')
+
+    @patch('api_payouts.services.payout_task_service.payout_task.apply_async')
+    def test_dispatch_without_request_starts_trace(self, apply_async):
+        """Тест постановки вне запроса (sweeper, команды): спан постановки - корень трассы"""
+        with self.captureOnCommitCallbacks(execute=True):
+            PayoutTaskService.execute_payout(str(self.payout.id))
+
+        dispatch_span, = self.by_name('payout.dispatch')
+        self.assertIsNone(dispatch_span.parent)
+        self.assertEqual(dispatch_span.attributes['payout.id'], str(self.payout.id))
+
+    @patch('api_payouts.tasks.PayoutProcessingService')
+    def test_task_continues_trace(self, mock_service):
+        """Тест продолжения трассы в задаче: ожидание в очереди отдельно от обработки"""
+        def process():
+            timer = StageTimer()
+            with timer.stage('setup'):
+                pass
+            return {'success': True}
+
+        mock_service.return_value.process.side_effect = process
+        payout_task.apply(
+            args=[str(self.payout.id)],
+            headers={'traceparent': '00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01',
+                     'enqueued_at': time.time() - 0.5},
+        ).get()
+
+        wait_span, = self.by_name('payout.queue_wait')
+        task_span, = self.by_name(payout_task.name)
+        stage_span, = self.by_name('payout.stage.setup')
+
+        self.assertEqual(hex_id(wait_span.parent.span_id, 16), 'b7ad6b7169203331')
+        self.assertEqual(hex_id(task_span.parent.span_id, 16), 'b7ad6b7169203331')
+        self.assertGreaterEqual(wait_span.end_time - wait_span.start_time, 0.5e9)
+        self.assertLessEqual(wait_span.end_time, task_span.start_time)
+        self.assertEqual(task_span.attributes['celery.state'], 'SUCCESS')
+        self.assertEqual(hex_id(stage_span.context.trace_id, 32), '0af7651916cd43dd8448eb211c80319c')
+        self.assertEqual(stage_span.parent.span_id, task_span.context.span_id)
+        self.assertIsNone(tracing.current_trace_id())
@@ -0,0 +1,274 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from api_payouts.models import Currency, Payout, Status, WebhookEndpoint, WebhookEvent
+from api_payouts.services.webhook_services import WebhookDeliveryService, WebhookService
+from api_payouts.services.webhook_services.stub_webhook_receiver import StubWebhookReceiver
+from api_payouts.tasks import deliver_pending_webhooks, deliver_webhooks
+
+SECRET = 'x' * 32
+
+
+class WebhookTestMixin:
+    def setUp(self):
+        super().setUp()
+        self.payout = Payout.objects.create(
+            amount=Decimal("100.50"),
+            currency=Currency.USD,
+            recipient_details={"card_number": "5555555555554444"},
+        )
+        self.addCleanup(WebhookDeliveryService.close_pools)
+
+    def create_endpoint(self, url='http://127.0.0.1:9/webhooks/', event_types=('completed', 'failed')):
+        return WebhookService.create_endpoint(url=url, event_types=list(event_types), secret=SECRET)
+
+    def create_events(self, endpoint, count):
+        for _ in range(count):
+            WebhookEvent.objects.create(
+                endpoint=endpoint, payout=self.payout, status=Status.COMPLETED,
+                payload={'id': str(self.payout.id), 'status': Status.COMPLETED},
+            )
+
+
+class WebhookEventRecordingTestCase(WebhookTestMixin, TestCase):
+    @patch('api_payouts.tasks.deliver_webhooks.apply_async')
+    def test_events_recorded_for_subscribed_statuses(self, apply_async):
+        """Тест записи событий только для статусов подписки и постановки доставки после коммита"""
+        completed = self.create_endpoint(event_types=['completed'])
+        failed = self.create_endpoint(event_types=['failed'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.payout.mark_as_processing()
+            self.payout.mark_as_completed()
+
+        event, = WebhookEvent.objects.all()
+        self.assertEqual(event.endpoint, completed)
+        self.assertEqual(event.payload['status'], Status.COMPLETED)
+        apply_async.assert_called_once_with(args=[completed.id], queue='webhooks')
+        self.assertFalse(failed.events.exists())
+
+    @patch.object(WebhookService, '_redis')
+    @patch('api_payouts.tasks.deliver_webhooks.apply_async')
+    def test_delivery_scheduled_once_per_endpoint(self, apply_async, mock_redis):
+        """Тест: события до старта задачи доставки ставят одну задачу на получателя"""
+        endpoint = self.create_endpoint()
+        other = Payout.objects.create(
+            amount=Decimal("10.00"), currency=Currency.USD, recipient_details={"card_number": "5555555555554444"},
+        )
+        mock_redis.return_value.set.side_effect = [True, None]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.payout.mark_as_completed()
+            other.mark_as_failed("Ошибка")
+
+        self.assertEqual(endpoint.events.count(), 2)
+        apply_async.assert_called_once_with(args=[endpoint.id], queue='webhooks')
+        mock_redis.return_value.set.assert_called_with(f'webhook-scheduled:{endpoint.id}', 1, ex=30, nx=True)
+
+    @patch('api_payouts.tasks.deliver_webhooks.apply_async')
+    def test_inactive_endpoint_skipped(self, apply_async):
+        """Тест отключенной подписки: события не записываются"""
+        endpoint = self.create_endpoint()
+        WebhookService.delete_endpoint(endpoint.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.payout.mark_as_failed("Ошибка")
+
+        self.assertFalse(WebhookEvent.objects.exists())
+        apply_async.assert_not_called()
+
+
+@override_settings(WEBHOOKS={
+    'EVENT_TYPES': ['completed', 'failed'],
+    'QUEUE': 'webhooks',
+    'BATCH_SIZE': 2,
+    'MAX_BATCHES_PER_RUN': 10,
+    'LEASE_SECONDS': 60,
+    'POOL_SIZE': 2,
+    'CONNECT_TIMEOUT': 1.0,
+    'READ_TIMEOUT': 1.0,
+    'RETRY': {'MAX_ATTEMPTS': 2, 'BASE_DELAY': 5, 'MAX_DELAY': 60},
+    'CACHE_ALIAS': 'default',
+    'SCHEDULE_KEY_PREFIX': 'webhook-scheduled',
+    'SCHEDULE_TTL': 30,
+})
+class WebhookDeliveryTestCase(WebhookTestMixin, TestCase):
+    def test_batched_signed_delivery_reuses_connection(self):
+        """Тест доставки пачками с подписью по одному keep-alive соединению"""
+        with StubWebhookReceiver(secret=SECRET) as receiver:
+            endpoint = self.create_endpoint(url=receiver.url)
+            self.create_events(endpoint, 5)
+
+            result = WebhookDeliveryService(endpoint.id).deliver()
+
+        self.assertEqual(result, {'delivered': 5, 'more': False, 'retry_in': None})
+        self.assertEqual([len(batch['events']) for batch in receiver.batches], [2, 2, 1])
+        self.assertEqual(receiver.events[0]['type'], 'payout.completed')
+        self.assertEqual(receiver.connections, 1)
+        self.assertFalse(WebhookEvent.objects.pending().exists())
+
+        endpoint.refresh_from_db()
+        self.assertIsNone(endpoint.locked_until)
+
+    def test_failed_receiver_paused_with_backoff(self):
+        """Тест ошибки получателя: пауза с джиттером, попытки событий, доставка после паузы"""
+        with StubWebhookReceiver(fail_requests=1) as receiver:
+            endpoint = self.create_endpoint(url=receiver.url)
+            self.create_events(endpoint, 1)
+
+            result = WebhookDeliveryService(endpoint.id).deliver()
+            self.assertEqual(result['delivered'], 0)
+            self.assertLessEqual(result['retry_in'], 5)
+
+            endpoint.refresh_from_db()
+            self.assertEqual(endpoint.failure_count, 1)
+            self.assertEqual(endpoint.last_error, 'HTTP 503')
+            self.assertEqual(WebhookEvent.objects.get().attempts, 1)
+
+            # Пауза еще не истекла
+            WebhookEndpoint.objects.filter(id=endpoint.id).update(
+                next_attempt_at=timezone.now() + timedelta(minutes=1)
+            )
+            self.assertEqual(WebhookDeliveryService(endpoint.id).deliver()['delivered'], 0)
+
+            WebhookEndpoint.objects.filter(id=endpoint.id).update(next_attempt_at=timezone.now())
+            self.assertEqual(WebhookDeliveryService(endpoint.id).deliver()['delivered'], 1)
+
+        endpoint.refresh_from_db()
+        self.assertEqual(endpoint.failure_count, 0)
+        self.assertIsNone(endpoint.next_attempt_at)
+
+    def test_events_dropped_after_max_attempts(self):
+        """Тест отказа от доставки события после исчерпания попыток"""
+        with StubWebhookReceiver(fail_requests=10) as receiver:
+            endpoint = self.create_endpoint(url=receiver.url)
+            self.create_events(endpoint, 1)
+
+            for _ in range(2):
+                WebhookDeliveryService(endpoint.id).deliver()
+                WebhookEndpoint.objects.filter(id=endpoint.id).update(next_attempt_at=None)
+
+        event = WebhookEvent.objects.get()
+        self.assertEqual(event.attempts, 2)
+        self.assertIsNotNone(event.failed_at)
+
+    def test_slow_receiver_does_not_block_others(self):
+        """Тест независимых очередей получателей: занятый получатель не мешает остальным"""
+        with StubWebhookReceiver() as busy_receiver, StubWebhookReceiver() as receiver:
+            busy = self.create_endpoint(url=busy_receiver.url)
+            endpoint = self.create_endpoint(url=receiver.url)
+            self.create_events(busy, 1)
+            self.create_events(endpoint, 1)
+            # Доставку медленному получателю выполняет другая задача
+            WebhookEndpoint.objects.filter(id=busy.id).update(locked_until=timezone.now() + timedelta(minutes=1))
+
+            self.assertEqual(WebhookDeliveryService(busy.id).deliver()['delivered'], 0)
+            self.assertEqual(WebhookDeliveryService(endpoint.id).deliver()['delivered'], 1)
+
+        self.assertEqual(busy_receiver.requests, 0)
+        self.assertEqual(WebhookDeliveryService.due_endpoint_ids(), [])
+
+    def test_lost_lease_stops_run_and_is_not_released(self):
+        """Тест аренды: перехваченная другой задачей аренда не продлевается и не снимается"""
+        with StubWebhookReceiver(secret=SECRET) as receiver:
+            endpoint = self.create_endpoint(url=receiver.url)
+            self.create_events(endpoint, 5)
+            service = WebhookDeliveryService(endpoint.id)
+            other_lease = timezone.now() + timedelta(minutes=5)
+            send = service._send
+
+            def send_and_lose_lease(*args):
+                send(*args)
+                # Пачка шла дольше аренды - доставку получателю взяла другая задача
+                WebhookEndpoint.objects.filter(id=endpoint.id).update(locked_until=other_lease)
+
+            with patch.object(service, '_send', side_effect=send_and_lose_lease):
+                result = service.deliver()
+
+        self.assertEqual(result['delivered'], 2)
+        self.assertEqual(len(receiver.batches), 1)
+        endpoint.refresh_from_db()
+        self.assertEqual(endpoint.locked_until, other_lease)
+
+    def test_lease_renewed_per_batch(self):
+        """Тест продления аренды перед каждой пачкой"""
+        with StubWebhookReceiver(secret=SECRET) as receiver:
+            endpoint = self.create_endpoint(url=receiver.url)
+            self.create_events(endpoint, 5)
+            service = WebhookDeliveryService(endpoint.id)
+
+            with patch.object(service, '_renew', wraps=service._renew) as renew:
+                self.assertEqual(service.deliver()['delivered'], 5)
+
+        # Перед второй, третьей и пустой четвертой выборкой
+        self.assertEqual(renew.call_count, 3)
+        endpoint.refresh_from_db()
+        self.assertIsNone(endpoint.locked_until)
+
+    @patch('api_payouts.tasks.deliver_webhooks.apply_async')
+    def test_task_requeued_after_pause(self, apply_async):
+        """Тест задачи доставки: повтор к концу паузы получателя"""
+        with StubWebhookReceiver(fail_requests=1) as receiver:
+            endpoint = self.create_endpoint(url=receiver.url)
+            self.create_events(endpoint, 1)
+            result = deliver_webhooks.apply(args=[endpoint.id]).get()
+
+        apply_async.assert_called_once_with(args=[endpoint.id], countdown=result['retry_in'], queue='webhooks')
+
+    @patch.object(WebhookService, '_redis')
+    @patch('api_payouts.tasks.deliver_webhooks.apply_async')
+    def test_task_clears_flag_and_extends_it_over_pause(self, apply_async, mock_redis):
+        """Тест: задача снимает флаг при старте, повтор после паузы ставится всегда и продлевает флаг"""
+        with StubWebhookReceiver(fail_requests=1) as receiver:
+            endpoint = self.create_endpoint(url=receiver.url)
+            self.create_events(endpoint, 1)
+            result = deliver_webhooks.apply(args=[endpoint.id]).get()
+
+        key = f'webhook-scheduled:{endpoint.id}'
+        mock_redis.return_value.delete.assert_called_once_with(key)
+        mock_redis.return_value.set.assert_called_once_with(key, 1, ex=30 + int(result['retry_in']), nx=False)
+        apply_async.assert_called_once_with(args=[endpoint.id], countdown=result['retry_in'], queue='webhooks')
+
+    @patch('api_payouts.tasks.deliver_webhooks.apply_async')
+    def test_periodic_task_picks_up_due_endpoints(self, apply_async):
+        """Тест периодической задачи: получатели с недоставленными событиями без паузы"""
+        due = self.create_endpoint()
+        paused = self.create_endpoint()
+        self.create_endpoint()
+        self.create_events(due, 2)
+        self.create_events(paused, 1)
+        WebhookEndpoint.objects.filter(id=paused.id).update(next_attempt_at=timezone.now() + timedelta(minutes=1))
+
+        self.assertEqual(deliver_pending_webhooks.apply().get(), 1)
+        apply_async.assert_called_once_with(args=[due.id], queue='webhooks')
+
+
+class WebhookApiTestCase(WebhookTestMixin, TestCase):
+    def test_webhook_crud(self):
+        """Тест регистрации, просмотра и отключения подписки"""
+        response = self.client.post(
+            "/api/webhooks/", {"url": "https://merchant.example/hooks", "event_types": ["completed"]},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        created = response.json()
+        self.assertEqual(len(created['secret']), 64)
+        self.assertEqual(created['event_types'], ['completed'])
+
+        response = self.client.get(f"/api/webhooks/{created['id']}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('secret', response.json())
+
+        self.assertEqual(self.client.get("/api/webhooks/").json()['count'], 1)
+        self.assertEqual(self.client.delete(f"/api/webhooks/{created['id']}/").status_code, 200)
+        self.assertEqual(self.client.get(f"/api/webhooks/{created['id']}/").status_code, 404)
+        self.assertEqual(self.client.get("/api/webhooks/").json()['count'], 0)
+
+    def test_invalid_url_rejected(self):
+        """Тест валидации URL получателя"""
+        response = self.client.post("/api/webhooks/", {"url": "not-a-url"}, content_type="application/json")
+        self.assertEqual(response.status_code, 422)
@@ -1,3 +1,10 @@
-from .celery import app as celery_app
+def __getattr__(name):
+    # Приложение Celery загружается при первом обращении (celery -A backend, api_payouts.tasks),
+    # а не вместе с настройками Django - веб-процессу и командам он не нужен
+    if name == 'celery_app':
+        from .celery import app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-__all__ = ('celery_app',)
\ No newline at end of file
+
+__all__ = ('celery_app',)
@@ -3,10 +3,26 @@ from django.http import JsonResponse
 from ninja import NinjaAPI
 from ninja.errors import ValidationError
 
-from api_payouts.api import router as api_app_payment_router
+from api_payouts.api import router as api_app_payment_router, dead_letter_router, webhook_router
 
 
-api = NinjaAPI(
+class PayoutsNinjaAPI(NinjaAPI):
+    """NinjaAPI с кэшем схемы OpenAPI: роуты после загрузки не меняются, схема строится один раз на процесс"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._openapi_schemas = {}
+
+    def get_openapi_schema(self, *, path_prefix=None, path_params=None):
+        if path_prefix is None:
+            path_prefix = self.get_root_path(path_params or {})
+        schema = self._openapi_schemas.get(path_prefix)
+        if schema is None:
+            schema = self._openapi_schemas[path_prefix] = super().get_openapi_schema(path_prefix=path_prefix)
+        return schema
+
+
+api = PayoutsNinjaAPI(
     title="API",
     version="1.0.0",
     description="API-Django",
@@ -15,6 +31,8 @@ api = NinjaAPI(
 )
 
 api.add_router("/payouts/", api_app_payment_router)
+api.add_router("/dead-letters/", dead_letter_router)
+api.add_router("/webhooks/", webhook_router)
 
 
 @api.exception_handler(ValidationError)
@@ -40,7 +58,7 @@ if settings.DEBUG is False:
         # Логируем для себя
         import logging
         logging.getLogger(__name__).error(
-            f"Server error: {exc}",
+            "Server error: %s", exc,
             exc_info=True
         )
 
@@ -12,16 +12,30 @@ app.conf.update(
     worker_prefetch_multiplier=1,
     task_acks_late=True,
     broker_connection_retry_on_startup=True,
-    result_backend='redis://localhost:6379/0',
-    broker_url='redis://localhost:6379/0',
-    accept_content=['json'],
-    result_serializer='json',
+    result_backend=os.environ.get('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0'),
+    broker_url=os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0'),
+    # msgpack принимается всегда: формат сообщений меняется без остановки воркеров
+    # (PAYOUT_MESSAGE_FORMAT), сериализатор результатов - CELERY_RESULT_SERIALIZER
+    accept_content=['json', 'msgpack'],
     task_serializer ='json',
     timezone='Europe/Moscow',
     task_default_queue='celery',
+    task_routes=('api_payouts.services.celery_services.payout_queue_router.route_task',),
     task_time_limit=30 * 60,
     worker_concurrency=4,
-    task_track_started=True,
 )
 
+app.conf.beat_schedule = {
+    'sweep-stuck-payouts': {
+        'task': 'api_payouts.tasks.sweep_stuck_payouts',
+        'schedule': crontab(minute='*'),
+        'options': {'queue': 'celery', 'expires': 60},
+    },
+    'deliver-pending-webhooks': {
+        'task': 'api_payouts.tasks.deliver_pending_webhooks',
+        'schedule': crontab(minute='*'),
+        'options': {'queue': 'celery', 'expires': 60},
+    },
+}
+
 app.autodiscover_tasks()
@@ -0,0 +1,202 @@
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+from django.core.signals import request_finished
+from django.db.backends.signals import connection_created
+from prometheus_client import Counter, Gauge
+
+POOL_MODES = ('psycopg', 'pgbouncer', 'none')
+
+DB_CONNECTIONS_OPENED = Counter(
+    'db_connections_opened',
+    'Новые соединения Django с БД (без пула - на каждый запрос или задачу)',
+    ['alias'],
+)
+
+DB_POOL_SIZE = Gauge(
+    'db_pool_size',
+    'Соединений в пуле psycopg (выданных и свободных)',
+    ['alias'],
+    multiprocess_mode='livesum',
+)
+
+DB_POOL_AVAILABLE = Gauge(
+    'db_pool_available',
+    'Свободных соединений в пуле psycopg',
+    ['alias'],
+    multiprocess_mode='livesum',
+)
+
+DB_POOL_WAITING = Gauge(
+    'db_pool_requests_waiting',
+    'Запросы соединения, ожидающие в очереди пула',
+    ['alias'],
+    multiprocess_mode='livesum',
+)
+
+DB_POOL_CHECKOUTS = Counter(
+    'db_pool_checkouts',
+    'Выдачи соединения из пула',
+    ['alias'],
+)
+
+DB_POOL_QUEUED = Counter(
+    'db_pool_checkouts_queued',
+    'Выдачи соединения, которым пришлось ждать свободное',
+    ['alias'],
+)
+
+DB_POOL_WAIT_SECONDS = Counter(
+    'db_pool_wait_seconds',
+    'Суммарное ожидание соединения из пула',
+    ['alias'],
+)
+
+DB_POOL_ERRORS = Counter(
+    'db_pool_errors',
+    'Ошибки пула: таймаут выдачи, ошибки подключения, потерянные соединения',
+    ['alias', 'kind'],
+)
+
+# Накопительные поля psycopg_pool.ConnectionPool.get_stats() -> счетчики
+STATS_COUNTERS = {
+    'requests_num': lambda alias, value: DB_POOL_CHECKOUTS.labels(alias=alias).inc(value),
+    'requests_queued': lambda alias, value: DB_POOL_QUEUED.labels(alias=alias).inc(value),
+    'requests_wait_ms': lambda alias, value: DB_POOL_WAIT_SECONDS.labels(alias=alias).inc(value / 1000),
+    'requests_errors': lambda alias, value: DB_POOL_ERRORS.labels(alias=alias, kind='checkout').inc(value),
+    'connections_errors': lambda alias, value: DB_POOL_ERRORS.labels(alias=alias, kind='connect').inc(value),
+    'connections_lost': lambda alias, value: DB_POOL_ERRORS.labels(alias=alias, kind='lost').inc(value),
+}
+
+
+def check_connection(conn) -> None:
+    """Проверка соединения перед выдачей из пула (параметр check пула psycopg)"""
+    conn.execute('SELECT 1')
+
+
+def build_database(mode: str, name: str, user: str, password: str, host: str, port: str,
+                   pool_min: int = 2, pool_max: int = 10, pool_timeout: float = 10.0,
+                   pool_max_idle: float = 300.0, pool_max_lifetime: float = 1800.0,
+                   conn_max_age: int = 60) -> Dict:
+    """
+    Настройки PostgreSQL для режима пула
+
+    psycopg   - пул psycopg_pool внутри процесса (OPTIONS['pool'], Django 5.1+):
+                соединение берется из пула на запрос/задачу, проверяется перед выдачей;
+    pgbouncer - внешний пул в режиме transaction: постоянные соединения Django
+                к pgbouncer с проверкой перед повторным использованием,
+                без серверных курсоров (не переживают смену транзакции);
+    none      - соединение на запрос, как в базовых настройках.
+    """
+    if mode not in POOL_MODES:
+        raise ValueError(f"Неизвестный режим пула соединений: {mode}")
+
+    database = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': name,
+        'USER': user,
+        'PASSWORD': password,
+        'HOST': host,
+        'PORT': port,
+        'CONN_MAX_AGE': 0,
+        'OPTIONS': {},
+    }
+    if mode == 'psycopg':
+        database['OPTIONS']['pool'] = {
+            'min_size': pool_min,
+            'max_size': pool_max,
+            'timeout': pool_timeout,
+            'max_idle': pool_max_idle,
+            'max_lifetime': pool_max_lifetime,
+            'check': check_connection,
+        }
+    elif mode == 'pgbouncer':
+        database.update({
+            'CONN_MAX_AGE': conn_max_age,
+            'CONN_HEALTH_CHECKS': True,
+            'DISABLE_SERVER_SIDE_CURSORS': True,
+        })
+    return database
+
+
+def get_connection_pools() -> Dict[str, object]:
+    """Открытые пулы psycopg процесса по алиасам БД (без создания новых)"""
+    backend = sys.modules.get('django.db.backends.postgresql.base')
+    if backend is None:
+        return {}
+    return dict(getattr(backend.DatabaseWrapper, '_connection_pools', {}))
+
+
+def discard_inherited_pools() -> None:
+    """
+    Забыть пулы, унаследованные от родителя при fork (gunicorn --preload, prefork Celery)
+
+    Соединения родителя в дочернем процессе не используются и не закрываются,
+    новый пул создается при первом обращении к БД.
+    """
+    backend = sys.modules.get('django.db.backends.postgresql.base')
+    if backend is not None:
+        getattr(backend.DatabaseWrapper, '_connection_pools', {}).clear()
+    pool_stats_sampler.reset()
+
+
+class PoolStatsSampler:
+    """
+    Перенос статистики пулов psycopg в метрики Prometheus
+
+    Вызывается по завершении HTTP-запроса и задачи Celery не чаще раза
+    в interval секунд; обычные Gauge/Counter работают и в режиме
+    PROMETHEUS_MULTIPROC_DIR (несколько воркеров gunicorn, prefork-пул).
+    """
+
+    def __init__(self, interval: float = 5.0):
+        self.interval = interval
+        self._last_sample = 0.0
+        self._previous: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        self._previous.clear()
+        self._last_sample = 0.0
+
+    def maybe_sample(self) -> None:
+        now = time.monotonic()
+        if now - self._last_sample < self.interval:
+            return
+        with self._lock:
+            if now - self._last_sample < self.interval:
+                return
+            self._last_sample = now
+            self.sample()
+
+    def sample(self, pools: Optional[Dict[str, object]] = None) -> None:
+        for alias, pool in (get_connection_pools() if pools is None else pools).items():
+            stats = pool.get_stats()
+            DB_POOL_SIZE.labels(alias=alias).set(stats.get('pool_size', 0))
+            DB_POOL_AVAILABLE.labels(alias=alias).set(stats.get('pool_available', 0))
+            DB_POOL_WAITING.labels(alias=alias).set(stats.get('requests_waiting', 0))
+
+            previous = self._previous.setdefault(alias, {})
+            for key, observe in STATS_COUNTERS.items():
+                value = stats.get(key, 0)
+                delta = value - previous.get(key, 0)
+                if delta > 0:
+                    observe(alias, delta)
+                previous[key] = value
+
+
+pool_stats_sampler = PoolStatsSampler()
+
+
+def count_connection_opened(sender, connection, **kwargs):
+    DB_CONNECTIONS_OPENED.labels(alias=connection.alias).inc()
+
+
+def sample_pool_stats(**kwargs):
+    pool_stats_sampler.maybe_sample()
+
+
+connection_created.connect(count_connection_opened, dispatch_uid='db_connections_opened')
+request_finished.connect(sample_pool_stats, dispatch_uid='db_pool_stats')
@@ -0,0 +1,223 @@
+import contextvars
+import heapq
+import random
+import uuid
+from contextlib import contextmanager
+from itertools import islice
+from typing import List, Optional, Sequence
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Чтение с реплик разрешено только внутри явно отмеченного контекста (безопасные
+# запросы API без недавней записи). Воркеры и все остальное читают с основной БД
+replica_reads = contextvars.ContextVar('replica_reads', default=False)
+
+
+@contextmanager
+def allow_replica_reads(enabled: bool = True):
+    """Разрешить чтение с реплик внутри блока"""
+    token = replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+def get_replicas():
+    return settings.READ_REPLICAS['ALIASES']
+
+
+def get_shards() -> List[str]:
+    """Алиасы шардов по номеру; пустой список - шардирование выключено"""
+    return settings.PAYOUT_SHARDS['ALIASES']
+
+
+def shard_aliases() -> List[str]:
+    """Базы, в которых лежат выплаты (без шардирования - только основная)"""
+    return get_shards() or [DEFAULT_DB_ALIAS]
+
+
+# Версия UUID выплаты с номером шарда (RFC 9562, версия 8 - произвольный формат)
+SHARDED_ID_VERSION = 8
+
+
+def new_payout_id(shard: Optional[int] = None) -> uuid.UUID:
+    """
+    ID новой выплаты
+
+    Без шардирования - uuid4. При шардировании номер шарда (заданный или
+    случайный из настроенных) записывается в первый байт случайного UUID с
+    версией 8: шард определяется по ID и не меняется при добавлении шардов.
+    """
+    shards = get_shards()
+    if shard is None:
+        if not shards:
+            return uuid.uuid4()
+        shard = random.randrange(len(shards))
+    raw = bytearray(uuid.uuid4().bytes)
+    raw[0] = shard
+    raw[6] = (raw[6] & 0x0F) | (SHARDED_ID_VERSION << 4)
+    return uuid.UUID(bytes=bytes(raw))
+
+
+def shard_index(payout_id) -> int:
+    """
+    Номер шарда выплаты - первый байт ID версии 8 (new_payout_id)
+
+    Номер не хранится отдельно и не требует обращения к БД. Выплаты с uuid4
+    (созданные до включения шардирования) лежат в шарде 0 - основной БД.
+    Некорректный ID или номер за пределами ALIASES относится к шарду 0 -
+    запрос к нему завершится той же ошибкой, что и без шардирования.
+    """
+    shards = get_shards()
+    if not shards:
+        return 0
+    try:
+        value = payout_id if isinstance(payout_id, uuid.UUID) else uuid.UUID(str(payout_id))
+    except ValueError:
+        return 0
+    if value.version != SHARDED_ID_VERSION or value.bytes[0] >= len(shards):
+        return 0
+    return value.bytes[0]
+
+
+def shard_for(payout_id) -> str:
+    """Алиас БД, которой принадлежит выплата"""
+    return shard_aliases()[shard_index(payout_id)]
+
+
+def is_sharded(model) -> bool:
+    return bool(get_shards()) and model._meta.label_lower in settings.PAYOUT_SHARDS['MODELS']
+
+
+class ShardRouter:
+    """
+    Маршрутизация шардированных моделей (PAYOUT_SHARDS['MODELS']) по ID выплаты
+
+    БД выбирается по ID из подсказки instance: первичный ключ выплаты или
+    payout_id связанной записи. Запросы без подсказки явно указывают шард:
+    create/bulk_create, for_payout(...) и list_payouts() у менеджера выплат.
+    Остальные модели - следующему роутеру.
+    """
+
+    def _shard_from_hints(self, model, hints) -> Optional[str]:
+        if not is_sharded(model):
+            return None
+        instance = hints.get('instance')
+        if instance is None:
+            return None
+        payout_id = self._payout_id(instance)
+        if payout_id is not None:
+            return shard_for(payout_id)
+        return instance._state.db
+
+    @staticmethod
+    def _payout_id(instance):
+        # Выплата - по первичному ключу, связанные с ней записи - по payout_id.
+        # Значение берется из __dict__: у создаваемой записи поля еще нет, а
+        # обращение к атрибуту загрузило бы его из БД (через этот же роутер)
+        if any(field.attname == 'payout_id' for field in instance._meta.concrete_fields):
+            return instance.__dict__.get('payout_id')
+        return instance.pk if is_sharded(type(instance)) else None
+
+    def db_for_read(self, model, **hints):
+        return self._shard_from_hints(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._shard_from_hints(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Связь шардированной записи с глобальной (FK без ограничения в БД) допустима,
+        # двух шардированных - только внутри одного шарда
+        sharded = [obj for obj in (obj1, obj2) if is_sharded(type(obj))]
+        if not sharded:
+            return None
+        # Новая связанная запись еще без payout_id - ее шард определит выплата
+        payout_ids = [self._payout_id(obj) for obj in sharded]
+        return len({shard_for(payout_id) for payout_id in payout_ids if payout_id is not None}) <= 1
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+class ReplicaRouter:
+    """
+    Маршрутизация чтения на реплики
+
+    Запись, чтение внутри транзакции и чтение вне контекста
+    allow_replica_reads (Celery, команды, небезопасные запросы API) - на
+    основную БД. Миграции применяются только к основной БД (и шардам).
+    """
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db in {DEFAULT_DB_ALIAS, *get_replicas()}:
+            return instance._state.db
+
+        replicas = get_replicas()
+        if not replicas or not replica_reads.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if obj1._state.db == obj2._state.db:
+            return True
+        aliases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        return obj1._state.db in aliases and obj2._state.db in aliases
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in get_replicas()
+
+
+class ShardedQuerySet:
+    """
+    Выборка из всех шардов со слиянием по сортировке
+
+    Поддерживает то, что нужно пагинации: count(), срезы и итерацию.
+    Срез [offset:offset + limit] читает из каждого шарда первые
+    offset + limit записей и сливает их (heapq.merge), поэтому стоимость
+    растет с глубиной страницы. Направление сортировки у всех полей одно.
+    """
+
+    def __init__(self, queryset, aliases: Sequence[str], ordering: Sequence[str]):
+        self.ordering = list(ordering)
+        self.fields = [field.lstrip('-') for field in self.ordering]
+        self.descending = self.ordering[0].startswith('-')
+        self.querysets = [queryset.using(alias).order_by(*self.ordering) for alias in aliases]
+
+    def _key(self, obj):
+        return tuple(getattr(obj, field) for field in self.fields)
+
+    def _merge(self, limit: Optional[int] = None):
+        parts = [list(queryset[:limit]) if limit is not None else queryset for queryset in self.querysets]
+        return heapq.merge(*parts, key=self._key, reverse=self.descending)
+
+    def all(self) -> 'ShardedQuerySet':
+        return self
+
+    def count(self) -> int:
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def __iter__(self):
+        return iter(self._merge())
+
+    def __getitem__(self, item):
+        if isinstance(item, int):
+            if item < 0:
+                raise IndexError('Отрицательные индексы не поддерживаются')
+            items = self[item:item + 1]
+            if not items:
+                raise IndexError(item)
+            return items[0]
+
+        start, stop = item.start or 0, item.stop
+        if start < 0 or (stop is not None and stop < 0) or item.step not in (None, 1):
+            raise ValueError('Поддерживаются только срезы с неотрицательными границами без шага')
+        return list(islice(self._merge(stop), start, stop))
@@ -0,0 +1,67 @@
+import os
+
+from django.http import HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds',
+    'Длительность обработки HTTP-запроса',
+    ['method', 'route', 'status'],
+    buckets=LATENCY_BUCKETS,
+)
+
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    'http_requests_in_flight',
+    'HTTP-запросы в обработке',
+    multiprocess_mode='livesum',
+)
+
+HTTP_DB_QUERIES = Histogram(
+    'http_request_db_queries',
+    'Количество SQL-запросов на HTTP-запрос',
+    ['route'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100),
+)
+
+HTTP_DB_SECONDS = Histogram(
+    'http_request_db_duration_seconds',
+    'Суммарное время SQL-запросов на HTTP-запрос',
+    ['route'],
+    buckets=LATENCY_BUCKETS,
+)
+
+HTTP_QUERY_BUDGET_EXCEEDED = Counter(
+    'http_query_budget_exceeded',
+    'Запросы, превысившие бюджет SQL-запросов маршрута',
+    ['route'],
+)
+
+
+def get_registry():
+    """
+    Реестр метрик процесса
+
+    При заданном PROMETHEUS_MULTIPROC_DIR (gunicorn с несколькими воркерами,
+    prefork-пул Celery) метрики собираются из файлов всех процессов.
+    """
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def metrics_view(request):
+    """Эндпоинт /metrics в формате Prometheus"""
+    return HttpResponse(generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,55 @@
+import time
+
+from django.conf import settings
+
+from ..db_router import allow_replica_reads
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Чтение с реплик для безопасных запросов API с прилипанием к основной БД
+
+    После записи (небезопасный метод, ответ без ошибки сервера) клиент
+    получает cookie READ_REPLICAS['COOKIE'] со сроком STICKY_SECONDS - пока
+    она действует, его чтения идут на основную БД, и только что созданная
+    выплата не теряется из-за отставания реплики. Заголовок PRIMARY_HEADER: 1
+    (nginx ставит его запросам обновления микрокэша) тоже ведет чтение на
+    основную БД.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        config = settings.READ_REPLICAS
+        self.cookie = config['COOKIE']
+        self.sticky_seconds = config['STICKY_SECONDS']
+        self.prefixes = tuple(config['PATH_PREFIXES'])
+        self.primary_header = config['PRIMARY_HEADER']
+
+    def __call__(self, request):
+        use_replica = (
+            request.method in SAFE_METHODS
+            and request.path.startswith(self.prefixes)
+            and not self.is_sticky(request)
+            and request.headers.get(self.primary_header) != '1'
+        )
+        with allow_replica_reads(use_replica):
+            response = self.get_response(request)
+
+        if request.method not in SAFE_METHODS and response.status_code < 500:
+            response.set_cookie(
+                self.cookie,
+                str(int(time.time() + self.sticky_seconds)),
+                max_age=self.sticky_seconds,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    def is_sticky(self, request) -> bool:
+        value = request.COOKIES.get(self.cookie)
+        try:
+            return value is not None and float(value) > time.time()
+        except ValueError:
+            return False
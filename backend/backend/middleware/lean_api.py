@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.contrib.auth import middleware as auth
+from django.contrib.messages import middleware as messages
+from django.contrib.sessions import middleware as sessions
+from django.middleware import clickjacking, csrf
+
+
+def is_api_request(request) -> bool:
+    config = settings.LEAN_API
+    return config['ENABLED'] and request.path_info.startswith(tuple(config['PATH_PREFIXES']))
+
+
+class PagesOnlyMixin:
+    """
+    Middleware для страниц (админка): запросы к API (LEAN_API['PATH_PREFIXES']) идут мимо
+
+    Ninja API не использует сессии, пользователя, сообщения и CSRF-cookie, а
+    clickjacking-заголовок для JSON не нужен. Классы остаются подклассами
+    middleware Django - проверки админки (admin.E408-E410) проходят.
+    """
+
+    def __call__(self, request):
+        if is_api_request(request):
+            return self.get_response(request)
+        return super().__call__(request)
+
+
+class SessionMiddleware(PagesOnlyMixin, sessions.SessionMiddleware):
+    pass
+
+
+class CsrfViewMiddleware(PagesOnlyMixin, csrf.CsrfViewMiddleware):
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        # process_view вызывается обработчиком Django отдельно от __call__
+        if is_api_request(request):
+            return None
+        return super().process_view(request, callback, callback_args, callback_kwargs)
+
+
+class AuthenticationMiddleware(PagesOnlyMixin, auth.AuthenticationMiddleware):
+    pass
+
+
+class MessageMiddleware(PagesOnlyMixin, messages.MessageMiddleware):
+    pass
+
+
+class XFrameOptionsMiddleware(PagesOnlyMixin, clickjacking.XFrameOptionsMiddleware):
+    pass
@@ -0,0 +1,44 @@
+import time
+
+from ..metrics import HTTP_DB_QUERIES, HTTP_DB_SECONDS, HTTP_REQUEST_SECONDS, HTTP_REQUESTS_IN_FLIGHT
+from ..query_counter import count_queries
+
+
+def get_route(request) -> str:
+    """Шаблон маршрута запроса (например, api/payouts/<payout_id>/) - ограниченная кардинальность"""
+    match = getattr(request, 'resolver_match', None)
+    return match.route if match is not None else 'unresolved'
+
+
+class PrometheusMiddleware:
+    """
+    Метрики HTTP-запросов
+
+    Время обработки по маршрутам, число запросов в обработке,
+    количество и время SQL-запросов. Должен стоять первым в MIDDLEWARE.
+    Счетчик SQL-запросов один на запрос: он сохраняется в request.query_counter,
+    его читает QueryBudgetMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            with count_queries() as queries:
+                request.query_counter = queries
+                response = self.get_response(request)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+
+        route = get_route(request)
+        HTTP_REQUEST_SECONDS.labels(
+            method=request.method,
+            route=route,
+            status=response.status_code,
+        ).observe(time.perf_counter() - start)
+        HTTP_DB_QUERIES.labels(route=route).observe(queries.count)
+        HTTP_DB_SECONDS.labels(route=route).observe(queries.duration)
+        return response
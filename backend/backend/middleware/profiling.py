@@ -0,0 +1,66 @@
+import logging
+import os
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.core.exceptions import MiddlewareNotUsed
+
+from ..profiling import MODES, Profile, read_token
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilingMiddleware:
+    """
+    Профилирование отдельного запроса по требованию
+
+    Включается PROFILING['ENABLED']; при выключенном Django не добавляет
+    middleware в цепочку. Профиль снимается, если запрос несет подписанный
+    заголовок PROFILING['HEADER'] (токен - manage.py profile_token) или если
+    сотрудник (is_staff) передал ?profile=cprofile|sampling.
+    Имя файла профиля в PROFILING['DIR'] возвращается в заголовке X-Profile-File.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING['ENABLED']:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.header = 'HTTP_' + settings.PROFILING['HEADER'].upper().replace('-', '_')
+
+    def __call__(self, request):
+        mode = self.get_mode(request)
+        if mode is None:
+            return self.get_response(request)
+
+        profile = Profile(mode, name=f'{request.method} {request.path}').start()
+        try:
+            response = self.get_response(request)
+        finally:
+            path = profile.stop()
+            logger.info("Профиль запроса %s %s записан в %s", request.method, request.path, path)
+
+        response['X-Profile-File'] = os.path.basename(path)
+        return response
+
+    def get_mode(self, request):
+        token = request.META.get(self.header)
+        if token:
+            return read_token(token)
+
+        mode = request.GET.get('profile')
+        if mode in MODES:
+            user = self.get_user(request)
+            if user is not None and user.is_staff:
+                return mode
+        return None
+
+    @staticmethod
+    def get_user(request):
+        """Пользователь запроса; для API (без сессий и AuthenticationMiddleware) - по cookie сессии"""
+        user = getattr(request, 'user', None)
+        session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        if user is None and session_key:
+            request.session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+            user = get_user(request)
+        return user
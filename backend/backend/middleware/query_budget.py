@@ -0,0 +1,72 @@
+import logging
+import time
+
+from django.conf import settings
+
+from ..metrics import HTTP_QUERY_BUDGET_EXCEEDED
+from ..query_counter import count_queries
+from .metrics import get_route
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    """Запрос выполнил больше SQL-запросов, чем разрешено бюджетом маршрута"""
+
+    def __init__(self, key: str, count: int, budget: int):
+        self.key = key
+        self.count = count
+        self.budget = budget
+        super().__init__(f"{key}: {count} SQL-запросов при бюджете {budget}")
+
+
+def get_query_budget(method: str, route: str):
+    """Бюджет SQL-запросов для маршрута: ключ '<METHOD> <route>', None - без ограничения"""
+    config = settings.QUERY_BUDGETS
+    return config['ROUTES'].get(f'{method} {route}', config.get('DEFAULT'))
+
+
+def check_query_budget(method: str, route: str, count: int) -> None:
+    """Сравнить число запросов с бюджетом: предупреждение или исключение в зависимости от MODE"""
+    mode = settings.QUERY_BUDGETS['MODE']
+    budget = get_query_budget(method, route)
+    if mode == 'off' or budget is None or count <= budget:
+        return
+
+    error = QueryBudgetExceeded(f'{method} {route}', count, budget)
+    HTTP_QUERY_BUDGET_EXCEEDED.labels(route=route).inc()
+    if mode == 'raise':
+        raise error
+    logger.warning("Превышен бюджет SQL-запросов - %s", error)
+
+
+class QueryBudgetMiddleware:
+    """
+    Бюджет SQL-запросов по маршрутам
+
+    Берет счетчик запросов PrometheusMiddleware (request.query_counter; без
+    него считает сам), отдает число запросов и время в БД в заголовке Server-Timing
+    и сверяет количество с QUERY_BUDGETS: MODE 'warn' - пишет в лог,
+    'raise' - бросает QueryBudgetExceeded (для тестов и отладки).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        # Запросы уже считает PrometheusMiddleware - вторая обертка execute_wrapper не нужна
+        queries = getattr(request, 'query_counter', None)
+        if queries is None:
+            with count_queries() as queries:
+                response = self.get_response(request)
+        else:
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+
+        response['Server-Timing'] = (
+            f'db;desc="{queries.count} queries";dur={queries.duration * 1000:.2f}, '
+            f'app;dur={total * 1000:.2f}'
+        )
+        check_query_budget(request.method, get_route(request), queries.count)
+        return response
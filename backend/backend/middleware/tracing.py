@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .. import tracing
+from .metrics import get_route
+
+
+class TracingMiddleware:
+    """
+    Корневой спан HTTP-запроса
+
+    Продолжает трассу из входящего заголовка traceparent или начинает новую;
+    спан текущий на время обработки, поэтому задачи, поставленные из
+    запроса, получают его контекст в заголовках. Идентификатор трассы
+    возвращается в заголовке ответа traceparent.
+    Включается TRACING['ENABLED']; при выключенном middleware не подключается.
+    """
+
+    def __init__(self, get_response):
+        if not settings.TRACING['ENABLED']:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        parent = tracing.parse_traceparent(request.META.get('HTTP_TRACEPARENT'))
+        with tracing.span(f'HTTP {request.method}', parent=parent, **{'http.method': request.method}) as span:
+            response = self.get_response(request)
+            route = get_route(request)
+            span.update_name(f'HTTP {request.method} {route}')
+            span.set_attribute('http.route', route)
+            span.set_attribute('http.status_code', response.status_code)
+
+        response[tracing.TRACEPARENT_HEADER] = tracing.traceparent(span)
+        return response
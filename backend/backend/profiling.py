@@ -0,0 +1,147 @@
+import cProfile
+import json
+import os
+import re
+import sys
+import threading
+import time
+from typing import Optional
+from uuid import uuid4
+
+from django.conf import settings
+from django.core import signing
+
+MODES = ('cprofile', 'sampling')
+SIGNING_SALT = 'backend.profiling'
+
+
+def get_config():
+    return settings.PROFILING
+
+
+def make_token(mode: str = 'cprofile') -> str:
+    """Подписанный токен для заголовка профилирования (значение - режим профилировщика)"""
+    if mode not in MODES:
+        raise ValueError(f"Неизвестный режим профилирования: {mode}")
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign(mode)
+
+
+def read_token(token: Optional[str]) -> Optional[str]:
+    """Режим профилирования из токена или None, если токен не задан, подделан или просрочен"""
+    if not token:
+        return None
+    try:
+        mode = signing.TimestampSigner(salt=SIGNING_SALT).unsign(token, max_age=get_config()['TOKEN_MAX_AGE'])
+    except signing.BadSignature:
+        return None
+    return mode if mode in MODES else None
+
+
+def task_headers(mode: str = 'cprofile') -> dict:
+    """Заголовки задачи Celery, включающие профилирование: apply_async(..., headers=task_headers())"""
+    return {'profile': make_token(mode)}
+
+
+class SamplingProfiler:
+    """
+    Сэмплирующий профилировщик одного потока
+
+    Фоновый поток раз в interval секунд снимает стек профилируемого потока;
+    результат сохраняется в формате speedscope (https://www.speedscope.app).
+    """
+
+    def __init__(self, interval: float = 0.001):
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.frames = []
+        self.frame_index = {}
+        self.samples = []
+        self.weights = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def enable(self):
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def disable(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is not None:
+                self.samples.append(self._stack(frame))
+                self.weights.append(now - last)
+            last = now
+
+    def _stack(self, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            key = (code.co_name, code.co_filename, code.co_firstlineno)
+            index = self.frame_index.get(key)
+            if index is None:
+                index = self.frame_index[key] = len(self.frames)
+                self.frames.append({'name': key[0], 'file': key[1], 'line': key[2]})
+            stack.append(index)
+            frame = frame.f_back
+        stack.reverse()
+        return stack
+
+    def dump_stats(self, path: str, name: str = ''):
+        profile = {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'name': name,
+            'exporter': 'backend.profiling',
+            'shared': {'frames': self.frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': name,
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': sum(self.weights),
+                'samples': self.samples,
+                'weights': self.weights,
+            }],
+        }
+        with open(path, 'w') as file:
+            json.dump(profile, file)
+
+
+class Profile:
+    """Профиль одного запроса или задачи: cProfile (.prof, pstats) или сэмплы (.speedscope.json)"""
+
+    def __init__(self, mode: str, name: str):
+        self.mode = mode
+        self.name = name
+        if mode == 'sampling':
+            self.profiler = SamplingProfiler(interval=get_config()['SAMPLING_INTERVAL'])
+        else:
+            self.profiler = cProfile.Profile()
+        self.started_at = time.time()
+
+    def start(self):
+        self.profiler.enable()
+        return self
+
+    def stop(self) -> str:
+        """Остановить профилировщик и записать профиль на диск, вернуть путь к файлу"""
+        self.profiler.disable()
+        directory = str(get_config()['DIR'])
+        os.makedirs(directory, exist_ok=True)
+
+        stamp = time.strftime('%Y%m%dT%H%M%S', time.gmtime(self.started_at))
+        slug = re.sub(r'[^A-Za-z0-9_.-]+', '_', self.name).strip('_')[:80] or 'profile'
+        extension = 'speedscope.json' if self.mode == 'sampling' else 'prof'
+        path = os.path.join(directory, f'{stamp}-{uuid4().hex[:8]}-{slug}.{extension}')
+
+        if self.mode == 'sampling':
+            self.profiler.dump_stats(path, name=self.name)
+        else:
+            self.profiler.dump_stats(path)
+        return path
@@ -48,15 +48,27 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'backend.middleware.metrics.PrometheusMiddleware',
+    'backend.middleware.tracing.TracingMiddleware',
+    'backend.middleware.query_budget.QueryBudgetMiddleware',
+    'backend.middleware.db_routing.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    # Сессии, CSRF, пользователь, сообщения и X-Frame-Options - только для страниц (админка), см. LEAN_API
+    'backend.middleware.lean_api.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'backend.middleware.lean_api.CsrfViewMiddleware',
+    'backend.middleware.lean_api.AuthenticationMiddleware',
+    'backend.middleware.profiling.ProfilingMiddleware',
+    'backend.middleware.lean_api.MessageMiddleware',
+    'backend.middleware.lean_api.XFrameOptionsMiddleware',
 ]
 
+# Запросы к API по PATH_PREFIXES проходят мимо middleware страниц (LEAN_API_ENABLED=False - полная цепочка)
+LEAN_API = {
+    'ENABLED': env.bool('LEAN_API_ENABLED', default=True),
+    'PATH_PREFIXES': ['/api/'],
+}
+
 ROOT_URLCONF = 'backend.urls'
 
 TEMPLATES = [
@@ -87,6 +99,37 @@ DATABASES = {
     }
 }
 
+# Локальные шарды выплат - файлы sqlite рядом с основной БД: алиасы из PAYOUT_SHARD_ALIASES
+# (в prod - DB_SHARD_HOSTS, в тестах - backend.settings_pytest)
+LOCAL_SHARD_ALIASES = env.list('PAYOUT_SHARD_ALIASES', default=[])
+for shard_alias in [alias for alias in LOCAL_SHARD_ALIASES if alias != 'default']:
+    DATABASES[shard_alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'db_{shard_alias}.sqlite3',
+    }
+
+# Горизонтальное шардирование выплат: ALIASES - алиасы DATABASES по номеру шарда
+# (пусто - все в default). Номер шарда записывается в ID выплаты при создании
+# (db_router.new_payout_id), поэтому добавление шарда в конец списка не переносит
+# существующие выплаты; порядок алиасов менять нельзя. Реквизиты получателя и история
+# статусов лежат в шарде выплаты, глобальные таблицы (webhook, dead letter, auth) - в default
+PAYOUT_SHARDS = {
+    'ALIASES': LOCAL_SHARD_ALIASES,
+    'MODELS': ['api_payouts.payout', 'api_payouts.payoutrecipient', 'api_payouts.payoutevent'],
+}
+
+# Чтение с реплик (алиасы из DATABASES) для безопасных запросов API по PATH_PREFIXES;
+# после записи клиент STICKY_SECONDS читает с основной БД (cookie COOKIE)
+DATABASE_ROUTERS = ['backend.db_router.ShardRouter', 'backend.db_router.ReplicaRouter']
+READ_REPLICAS = {
+    'ALIASES': [],
+    'PATH_PREFIXES': ['/api/'],
+    'STICKY_SECONDS': env.int('DB_STICKY_SECONDS', default=5),
+    'COOKIE': 'db_primary_until',
+    # Заголовок '1' - читать с основной БД без cookie (запрос обновления микрокэша от nginx)
+    'PRIMARY_HEADER': 'X-Read-Primary',
+}
+
 
 
 
@@ -133,6 +176,12 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+LOG_FORMAT = env('LOG_FORMAT', default='json')
+# Не зависит от DEBUG: профили (settings_prod) переопределяют DEBUG после того, как LOGGING собран
+LOG_LEVEL = env('LOG_LEVEL', default='INFO')
+
+# Обработчики console/file вызываются из фонового потока (backend.structured_logging.BackgroundHandler, 'queue'),
+# логгеры пишут только в очередь. Построчные записи этапов обработки выплат сэмплируются.
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -145,31 +194,59 @@ LOGGING = {
             'format': '{levelname} {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'backend.structured_logging.JsonFormatter',
+        },
+    },
+    'filters': {
+        'stage_sampling': {
+            '()': 'backend.structured_logging.SamplingFilter',
+            'rate': env.float('LOG_STAGE_SAMPLE_RATE', default=0.1),
+        },
     },
     'handlers': {
         'console': {
             'level': 'DEBUG',
             'class': 'logging.StreamHandler',
-            'formatter': 'simple'
+            'formatter': 'json' if LOG_FORMAT == 'json' else 'simple',
         },
         'file': {
             'level': 'ERROR',
             'class': 'logging.FileHandler',
             'filename': os.path.join(BASE_DIR, 'django_errors.log'),
-            'formatter': 'verbose',
+            'formatter': 'json' if LOG_FORMAT == 'json' else 'verbose',
+        },
+        # Имя должно идти по алфавиту после целевых обработчиков (dictConfig создает их по порядку)
+        'queue': {
+            'class': 'backend.structured_logging.BackgroundHandler',
+            'targets': ['console', 'file'],
         },
     },
     'loggers': {
         'django': {
-            'handlers': ['console', 'file'],
+            'handlers': ['queue'],
             'level': 'INFO',
             'propagate': True,
         },
         'api_app_payment': {
-            'handlers': ['console', 'file'],
-            'level': 'DEBUG' if DEBUG else 'INFO',
+            'handlers': ['queue'],
+            'level': LOG_LEVEL,
             'propagate': False,
         },
+        'api_payouts': {
+            'handlers': ['queue'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+        'backend': {
+            'handlers': ['queue'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+        'api_payouts.stages': {
+            'filters': ['stage_sampling'],
+            'level': env('LOG_STAGE_LEVEL', default=LOG_LEVEL),
+        },
     },
 }
 
@@ -181,4 +258,214 @@ CACHES = {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
         }
     }
-}
\ No newline at end of file
+}
+
+# Платежная система: клиент выбирается по пути к классу,
+# остальные ключи передаются в конструктор (в нижнем регистре)
+PAYMENT_GATEWAY = {
+    'CLIENT': env(
+        'PAYMENT_GATEWAY_CLIENT',
+        default='api_payouts.services.gateway_services.SimulatedGatewayClient',
+    ),
+    'NAME': env('PAYMENT_GATEWAY_NAME', default='default'),
+    'URL': env('PAYMENT_GATEWAY_URL', default='http://127.0.0.1:8090'),
+    'POOL_SIZE': env.int('PAYMENT_GATEWAY_POOL_SIZE', default=10),
+    'CONNECT_TIMEOUT': env.float('PAYMENT_GATEWAY_CONNECT_TIMEOUT', default=3.0),
+    'READ_TIMEOUT': env.float('PAYMENT_GATEWAY_READ_TIMEOUT', default=10.0),
+}
+
+
+# Маршрутизация задач выплат: <QUEUE_PREFIX>.<high|default|bulk>[.<shard>]
+PAYOUT_ROUTING = {
+    'QUEUE_PREFIX': 'payouts',
+    # При шардировании БД шард очереди - шард выплаты: воркеры очереди работают с одной БД
+    'SHARDS': env.int('PAYOUT_QUEUE_SHARDS', default=max(1, len(PAYOUT_SHARDS['ALIASES']))),
+    # Разовые выплаты не больше этой суммы идут в очередь high
+    'HIGH_PRIORITY_MAX_AMOUNT': {
+        'RUB': 100_000,
+        'USD': 1_000,
+        'EUR': 1_000,
+    },
+    # Массовая повторная постановка (поиск зависших, повтор из dead letter) идет в очередь bulk
+    # и не вытесняет новые выплаты из high/default
+    'BULK_SOURCES': ['batch'],
+}
+
+# Формат сообщений задач выплат: сериализатор json | msgpack и сжатие тела
+# (zlib, gzip, bzip2, lzma; None - без сжатия). QUEUES - переопределения по приоритету
+# очереди (high/default/bulk). Воркеры принимают оба сериализатора и любое сжатие
+PAYOUT_TASK_SERIALIZER = env('PAYOUT_TASK_SERIALIZER', default='json')
+PAYOUT_TASK_COMPRESSION = env('PAYOUT_TASK_COMPRESSION', default=None)
+PAYOUT_MESSAGE_FORMAT = {
+    'SERIALIZER': PAYOUT_TASK_SERIALIZER,
+    'COMPRESSION': PAYOUT_TASK_COMPRESSION,
+    'QUEUES': {
+        'bulk': {
+            'SERIALIZER': env('PAYOUT_BULK_TASK_SERIALIZER', default=PAYOUT_TASK_SERIALIZER),
+            'COMPRESSION': env('PAYOUT_BULK_TASK_COMPRESSION', default=PAYOUT_TASK_COMPRESSION),
+        },
+    },
+}
+
+
+# Ограничение частоты отправки в платежную систему (token bucket в Redis),
+# корзина на пару платежная система/валюта. RATE - токенов в секунду.
+PAYOUT_RATE_LIMIT = {
+    'ENABLED': env.bool('PAYOUT_RATE_LIMIT_ENABLED', default=False),
+    'CACHE_ALIAS': 'default',
+    'KEY_PREFIX': 'payout-rate',
+    'DEFAULT': {'RATE': 50, 'CAPACITY': 100},
+    'BUCKETS': {
+        'RUB': {'RATE': 100, 'CAPACITY': 200},
+    },
+}
+
+
+# Политики повторов задачи выплаты по классам ошибок (имя класса из MRO исключения).
+# Задержка - random(0, min(MAX_DELAY, BASE_DELAY * 2^n)), после MAX_RETRIES - dead letter.
+PAYOUT_RETRY_POLICIES = {
+    'ConnectionError': {'MAX_RETRIES': 8, 'BASE_DELAY': 2, 'MAX_DELAY': 600},
+    'TimeoutError': {'MAX_RETRIES': 8, 'BASE_DELAY': 2, 'MAX_DELAY': 600},
+    'GatewayError': {'MAX_RETRIES': 2, 'BASE_DELAY': 30, 'MAX_DELAY': 300},
+    'default': {'MAX_RETRIES': 3, 'BASE_DELAY': 10, 'MAX_DELAY': 300},
+}
+
+
+# Результаты payout_task в бэкенде результатов Celery (CELERY_RESULT_BACKEND, можно отдельную БД Redis):
+# verbose - подробный словарь, состояния STARTED и PROGRESS по этапам;
+# compact - код итога и отметки времени, без STARTED/PROGRESS.
+# Все ключи результатов живут CELERY_RESULT_EXPIRES секунд
+PAYOUT_TASK_RESULTS = {
+    'MODE': env('PAYOUT_TASK_RESULT_MODE', default='verbose'),
+    'ERROR_MAX_LENGTH': 200,
+}
+CELERY_RESULT_EXPIRES = env.int(
+    'CELERY_RESULT_EXPIRES', default=600 if PAYOUT_TASK_RESULTS['MODE'] == 'compact' else 24 * 3600
+)
+CELERY_TASK_TRACK_STARTED = PAYOUT_TASK_RESULTS['MODE'] == 'verbose'
+# Сериализатор результатов (json | msgpack) - один на бэкенд, одинаковый у API и воркеров;
+# результаты, записанные до смены, не читаются и истекают по CELERY_RESULT_EXPIRES
+CELERY_RESULT_SERIALIZER = env('CELERY_RESULT_SERIALIZER', default='json')
+
+
+# Периодический поиск зависших выплат (расписание - beat_schedule в backend/celery.py):
+# AFTER - порог в секундах с последнего обновления
+PAYOUT_SWEEPER = {
+    'BATCH_SIZE': 500,
+    'MAX_BATCHES': 10,
+    # Задача, поставленная меньше DISPATCH_TIMEOUT секунд назад, считается живой (ждет в очереди
+    # или в countdown) - pending-выплату с такой задачей повторно не ставим
+    'DISPATCH_TIMEOUT': env.int('PAYOUT_DISPATCH_TIMEOUT', default=15 * 60),
+    'RULES': {
+        'pending': {'AFTER': 5 * 60, 'ACTION': 'requeue'},
+        'processing': {'AFTER': 30 * 60, 'ACTION': 'fail'},
+    },
+}
+
+
+# Webhook-уведомления мерчантов о смене статуса выплат (задачи доставки - в очереди QUEUE).
+# Пауза получателя после ошибки - random(0, min(MAX_DELAY, BASE_DELAY * 2^n)),
+# событие отбрасывается после MAX_ATTEMPTS неудачных попыток
+WEBHOOKS = {
+    'EVENT_TYPES': ['completed', 'failed'],
+    'QUEUE': 'webhooks',
+    'BATCH_SIZE': 100,
+    'MAX_BATCHES_PER_RUN': 10,
+    # Аренда доставки получателю на одну пачку (продлевается перед следующей),
+    # должна быть больше CONNECT_TIMEOUT + READ_TIMEOUT
+    'LEASE_SECONDS': 120,
+    'POOL_SIZE': 4,
+    'CONNECT_TIMEOUT': 3.0,
+    'READ_TIMEOUT': 10.0,
+    'RETRY': {'MAX_ATTEMPTS': 12, 'BASE_DELAY': 5, 'MAX_DELAY': 3600},
+    # Одна задача доставки на получателя: флаг в Redis (CACHE_ALIAS) ставится вместе с задачей
+    # и снимается при ее старте, события до старта ее не дублируют. TTL - на случай потери задачи
+    'CACHE_ALIAS': 'default',
+    'SCHEDULE_KEY_PREFIX': 'webhook-scheduled',
+    'SCHEDULE_TTL': 30,
+}
+
+
+# Микрокэш nginx для GET /api/payouts/ (nginx/nginx.conf, TTL 1 с): после изменения выплаты
+# приложение перезапрашивает PATHS через NGINX_URL с заголовком REFRESH_HEADER - nginx
+# обходит кэш и сохраняет свежий ответ. REFRESH_SECRET должен совпадать с секретом nginx
+MICRO_CACHE = {
+    'ENABLED': env.bool('MICRO_CACHE_ENABLED', default=False),
+    'NGINX_URL': env('MICRO_CACHE_NGINX_URL', default='http://nginx'),
+    'REFRESH_HEADER': 'X-Cache-Refresh',
+    'REFRESH_SECRET': env('MICRO_CACHE_REFRESH_SECRET', default=''),
+    'PATHS': ['/api/payouts/{payout_id}/', '/api/payouts/'],
+    'POOL_SIZE': 4,
+    'TIMEOUT': 0.5,
+    # Окно склейки обновлений: изменения выплат за это время обновляются одной пачкой
+    'DEBOUNCE_SECONDS': env.float('MICRO_CACHE_DEBOUNCE_SECONDS', default=0.2),
+}
+
+
+# Порт HTTP-экспортера метрик Celery-воркера (не задан - экспортер не запускается)
+CELERY_WORKER_METRICS_PORT = env.int('CELERY_WORKER_METRICS_PORT', default=None)
+
+# Период выгрузки агрегированной длительности этапов обработки выплат, сек
+STAGE_TIMINGS_FLUSH_INTERVAL = env.float('STAGE_TIMINGS_FLUSH_INTERVAL', default=10.0)
+
+# Бюджет SQL-запросов на HTTP-запрос: ключ '<METHOD> <шаблон маршрута>'.
+# MODE: warn - предупреждение в лог, raise - исключение (тесты), off - только Server-Timing.
+# Бюджеты - для выплат в одной БД; список при шардировании - 2 запроса на шард
+QUERY_BUDGETS = {
+    'MODE': env('QUERY_BUDGET_MODE', default='warn'),
+    'DEFAULT': None,
+    'ROUTES': {
+        'GET api/payouts/': 2,
+        # Выплата, ее реквизиты получателя и запись о поставленной задаче
+        'POST api/payouts/': 3,
+        # Реквизиты получателя - JOIN в том же запросе и повтор на основной БД при отставании реплики
+        'GET api/payouts/<payout_id>/': 2,
+        'GET api/payouts/<payout_id>/history/': 3,
+        'GET api/payouts/stream/': 0,
+        'GET api/payouts/<payout_id>/stream/': 2,
+        # Чтение, запись и реквизиты для ответа (загружаются по обращению)
+        'PATCH api/payouts/<payout_id>/': 3,
+        # Удаление каскадом: реквизиты, история статусов, dead letters, события webhook
+        'DELETE api/payouts/<payout_id>/': 6,
+        'GET api/dead-letters/': 2,
+        'GET api/dead-letters/<int:dead_letter_id>/': 1,
+        'GET api/webhooks/': 2,
+        'POST api/webhooks/': 1,
+        'GET api/webhooks/<int:endpoint_id>/': 1,
+        'DELETE api/webhooks/<int:endpoint_id>/': 2,
+    },
+}
+
+# Профилирование отдельных запросов и задач по требованию.
+# Токен заголовка: manage.py profile_token --mode cprofile|sampling
+PROFILING = {
+    'ENABLED': env.bool('PROFILING_ENABLED', default=False),
+    'HEADER': 'X-Profile',
+    'TOKEN_MAX_AGE': env.int('PROFILING_TOKEN_MAX_AGE', default=3600),
+    'DIR': env('PROFILING_DIR', default=os.path.join(BASE_DIR, 'profiles')),
+    'SAMPLING_INTERVAL': 0.001,
+}
+
+# Трассировка API -> очередь -> обработка (W3C traceparent в заголовках задач Celery).
+# Спаны - OpenTelemetry SDK; экспорт: file - JSON Lines в TRACING_FILE, otlp - коллектор по OTLP/HTTP
+TRACING = {
+    'ENABLED': env.bool('TRACING_ENABLED', default=False),
+    'SERVICE_NAME': env('TRACING_SERVICE_NAME', default='payouts'),
+    'SAMPLE_RATE': env.float('TRACING_SAMPLE_RATE', default=1.0),
+    'EXPORTER': env('TRACING_EXPORTER', default='file'),
+    'FILE': env('TRACING_FILE', default=os.path.join(BASE_DIR, 'traces', 'spans.jsonl')),
+    'OTLP_ENDPOINT': env('TRACING_OTLP_ENDPOINT', default='http://localhost:4318'),
+    'FLUSH_INTERVAL': 1.0,
+}
+
+# Поток статусов выплат (SSE): события из Payout.mark_as_* через Redis pub/sub.
+# Для тысяч ожидающих клиентов - ASGI-сервер (uvicorn backend.asgi:application)
+STATUS_STREAM = {
+    'REDIS_URL': env('STATUS_STREAM_REDIS_URL', default='redis://127.0.0.1:6379/1'),
+    'CHANNEL_PREFIX': 'payouts:status:',
+    'HEARTBEAT': 15,
+    'MAX_DURATION': env.int('STATUS_STREAM_MAX_DURATION', default=300),
+    'RETRY_MS': 3000,
+    'QUEUE_SIZE': 100,
+    'RECONNECT_DELAY': 1.0,
+}
@@ -0,0 +1,59 @@
+from .settings import *
+from .db_pool import build_database
+
+DEBUG = env.bool('DEBUG', default=False)
+SECRET_KEY = env('SECRET_KEY', default=SECRET_KEY)
+ALLOWED_HOSTS = env.list('ALLOWED_HOSTS', default=['localhost'])
+
+
+# Пул соединений с БД (DB_POOL_MODE):
+# psycopg   - пул psycopg_pool в каждом процессе gunicorn/Celery (нужен psycopg[binary,pool]);
+#             суммарно процессов * DB_POOL_MAX_SIZE не должно превышать max_connections PostgreSQL
+# pgbouncer - DB_HOST указывает на pgbouncer (pool_mode = transaction), постоянные соединения к нему
+# none      - соединение на каждый запрос/задачу
+DB_POOL_MODE = env('DB_POOL_MODE', default='psycopg')
+
+DATABASES = {
+    'default': build_database(
+        DB_POOL_MODE,
+        name=env('POSTGRES_DB'),
+        user=env('POSTGRES_USER'),
+        password=env('POSTGRES_PASSWORD'),
+        host=env('POSTGRES_HOST', default='localhost'),
+        port=env('POSTGRES_PORT', default='5432'),
+        pool_min=env.int('DB_POOL_MIN_SIZE', default=2),
+        pool_max=env.int('DB_POOL_MAX_SIZE', default=10),
+        pool_timeout=env.float('DB_POOL_TIMEOUT', default=10.0),
+        pool_max_idle=env.float('DB_POOL_MAX_IDLE', default=300.0),
+        pool_max_lifetime=env.float('DB_POOL_MAX_LIFETIME', default=1800.0),
+        conn_max_age=env.int('DB_CONN_MAX_AGE', default=60),
+    ),
+}
+
+
+# Реплики только для чтения: DB_REPLICA_HOSTS=replica1,replica2 -> алиасы replica_1, replica_2
+for index, replica_host in enumerate(env.list('DB_REPLICA_HOSTS', default=[]), start=1):
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST': replica_host,
+        'PORT': env('DB_REPLICA_PORT', default=DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+READ_REPLICAS = {**READ_REPLICAS, 'ALIASES': [alias for alias in DATABASES if alias.startswith('replica_')]}
+
+
+# Шарды выплат: DB_SHARD_HOSTS=shard1,shard2 -> шард 0 - default, шарды 1..N - алиасы shard_1, shard_2
+for index, shard_host in enumerate(env.list('DB_SHARD_HOSTS', default=[]), start=1):
+    DATABASES[f'shard_{index}'] = {
+        **DATABASES['default'],
+        'HOST': shard_host,
+        'PORT': env('DB_SHARD_PORT', default=DATABASES['default']['PORT']),
+    }
+
+SHARD_ALIASES = [alias for alias in DATABASES if alias.startswith('shard_')]
+PAYOUT_SHARDS = {**PAYOUT_SHARDS, 'ALIASES': ['default', *SHARD_ALIASES] if SHARD_ALIASES else []}
+PAYOUT_ROUTING = {
+    **PAYOUT_ROUTING,
+    'SHARDS': env.int('PAYOUT_QUEUE_SHARDS', default=max(1, len(PAYOUT_SHARDS['ALIASES']))),
+}
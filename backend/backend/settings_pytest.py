@@ -0,0 +1,9 @@
+from .settings import *  # noqa: F401,F403
+
+# Профиль тестов (pytest.ini): два локальных шарда выплат для тестов шардирования и
+# отставания реплики; ALIASES не задаются - тесты включают шарды через override_settings
+for shard_alias in ['shard_1', 'shard_2']:
+    DATABASES.setdefault(shard_alias, {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'db_{shard_alias}.sqlite3',
+    })
@@ -0,0 +1,160 @@
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import QueueListener
+from typing import Iterable
+
+from .tracing import current_trace_id
+
+log_context = contextvars.ContextVar('log_context', default={})
+
+# Атрибуты LogRecord, которые не считаются пользовательскими полями (extra)
+RESERVED_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+
+@contextmanager
+def bind_log_context(**fields):
+    """Добавить поля (payout_id, task_id, ...) ко всем записям лога внутри блока"""
+    token = log_context.set({**log_context.get(), **fields})
+    try:
+        yield
+    finally:
+        log_context.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Переносит поля текущего контекста и trace_id в запись - в потоке, где запись создана"""
+
+    def filter(self, record):
+        if not hasattr(record, 'trace_id'):
+            trace_id = current_trace_id()
+            if trace_id is not None:
+                record.trace_id = trace_id
+        for key, value in log_context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Сэмплирование записей логгера с долей rate
+
+    Записи одной выплаты (payout_id из контекста) сохраняются или
+    отбрасываются целиком, чтобы в логе оставалась полная цепочка этапов.
+    Записи уровня WARNING и выше проходят всегда.
+    """
+
+    def __init__(self, rate: float = 1.0, name: str = ''):
+        super().__init__(name)
+        self.rate = float(rate)
+
+    def filter(self, record):
+        if self.rate >= 1 or record.levelno >= logging.WARNING:
+            return True
+        payout_id = getattr(record, 'payout_id', None) or log_context.get().get('payout_id')
+        if payout_id:
+            return zlib.crc32(str(payout_id).encode()) % 10_000 < self.rate * 10_000
+        return random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """Запись лога одной строкой JSON: время, уровень, логгер, сообщение, контекст и extra-поля"""
+
+    def format(self, record):
+        data = {
+            'ts': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in RESERVED_ATTRS and not key.startswith('_'):
+                data[key] = value
+        if record.exc_info:
+            data['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data['exc_info'] = record.exc_text
+        if record.stack_info:
+            data['stack_info'] = self.formatStack(record.stack_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class BackgroundHandler(logging.Handler):
+    """
+    Неблокирующий обработчик: запись кладется в очередь, форматирование
+    и I/O выполняют обработчики targets в потоке QueueListener
+
+    Сообщение не форматируется в вызывающем потоке (в отличие от
+    logging.handlers.QueueHandler), поэтому аргументы записи должны быть
+    неизменяемыми значениями. При переполненной очереди запись отбрасывается.
+    Поток запускается при первой записи и заново после fork (prefork-пул Celery).
+    """
+
+    def __init__(self, targets: Iterable[str] = (), maxsize: int = 10_000, level=logging.NOTSET):
+        super().__init__(level)
+        self.maxsize = maxsize
+        self.dropped = 0
+        self.queue = None
+        self.listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self.addFilter(ContextFilter())
+
+        # dictConfig создает обработчики в алфавитном порядке имен: целевые должны быть уже созданы.
+        # Ссылки держим сами - в logging обработчики хранятся по слабым ссылкам
+        self.targets = []
+        for name in targets:
+            handler = get_handler_by_name(name)
+            if handler is None:
+                raise ValueError(f"Обработчик {name} не найден: он должен быть объявлен и идти по имени раньше")
+            self.targets.append(handler)
+
+    def emit(self, record):
+        if self._pid != os.getpid():
+            self._start()
+        if record.exc_info and not record.exc_text:
+            # Трассировку форматируем сразу: объекты стека могут измениться к моменту записи
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self.queue = queue.Queue(self.maxsize)
+            self.listener = QueueListener(self.queue, *self.targets, respect_handler_level=True)
+            self.listener.start()
+            self._pid = os.getpid()
+            atexit.register(self.flush_and_stop)
+
+    def flush_and_stop(self):
+        """Дописать накопленные записи и остановить поток (при выходе из процесса)"""
+        if self.listener is not None and self._pid == os.getpid():
+            self.listener.stop()
+            self.listener = None
+            self._pid = None
+
+    def close(self):
+        self.flush_and_stop()
+        super().close()
+
+
+def get_handler_by_name(name: str):
+    """Обработчик, созданный dictConfig, по имени (logging.getHandlerByName в Python 3.12+)"""
+    getter = getattr(logging, 'getHandlerByName', None)
+    if getter is not None:
+        return getter(name)
+    return logging._handlers.get(name)
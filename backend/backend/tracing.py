@@ -0,0 +1,189 @@
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Optional, Sequence
+
+from django.conf import settings
+from opentelemetry import context as otel_context
+from opentelemetry import trace
+from opentelemetry.context import Context
+from opentelemetry.trace import Span, Status, StatusCode
+from opentelemetry.trace.propagation.tracecontext import TraceContextTextMapPropagator
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_HEADER = 'traceparent'
+
+_propagator = TraceContextTextMapPropagator()
+
+
+def get_config():
+    return settings.TRACING
+
+
+def is_enabled() -> bool:
+    return get_config()['ENABLED']
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[Context]:
+    """Контекст OpenTelemetry с удаленным родителем из заголовка traceparent или None"""
+    if not value:
+        return None
+    parent = _propagator.extract({TRACEPARENT_HEADER: value})
+    return parent if trace.get_current_span(parent).get_span_context().is_valid else None
+
+
+def traceparent(span: Span) -> str:
+    """Заголовок traceparent спана"""
+    carrier = {}
+    _propagator.inject(carrier, context=trace.set_span_in_context(span))
+    return carrier[TRACEPARENT_HEADER]
+
+
+def current_traceparent() -> Optional[str]:
+    carrier = {}
+    _propagator.inject(carrier)
+    return carrier.get(TRACEPARENT_HEADER)
+
+
+def current_context() -> Context:
+    """Текущий контекст - родитель для спанов, начатых позже (например, после коммита)"""
+    return otel_context.get_current()
+
+
+def current_trace_id() -> Optional[str]:
+    span_context = trace.get_current_span().get_span_context()
+    return trace.format_trace_id(span_context.trace_id) if span_context.is_valid else None
+
+
+def start_span(name: str, parent: Optional[Context] = None, start_ns: Optional[int] = None,
+               **attributes) -> Optional[Span]:
+    """
+    Новый спан - дочерний для parent, текущего спана или корневой
+
+    Корневой спан сэмплируется с долей TRACING['SAMPLE_RATE'], дочерний -
+    по решению родителя. При выключенной трассировке возвращает None.
+    """
+    if not is_enabled():
+        return None
+    return get_tracer().start_span(name, context=parent, start_time=start_ns, attributes=attributes)
+
+
+@contextmanager
+def span(name: str, parent: Optional[Context] = None, **attributes):
+    """Спан на время блока; внутри блока он текущий для дочерних спанов и заголовков задач"""
+    if not is_enabled():
+        yield None
+        return
+    with get_tracer().start_as_current_span(name, context=parent, attributes=attributes) as new_span:
+        yield new_span
+
+
+def activate(span_: Span):
+    """Сделать спан текущим вне контекстного менеджера; вернуть токен для deactivate"""
+    return otel_context.attach(trace.set_span_in_context(span_))
+
+
+def deactivate(token) -> None:
+    otel_context.detach(token)
+
+
+def set_error(span_: Span, message: str) -> None:
+    span_.set_status(Status(StatusCode.ERROR, message))
+
+
+class FileSpanExporter:
+    """Экспортер SDK: спаны построчно в JSON (JSON Lines) - для локальной разработки без коллектора"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence) -> 'SpanExportResult':
+        from opentelemetry.sdk.trace.export import SpanExportResult
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock, open(self.path, 'a') as file:
+            for span_ in spans:
+                file.write(json.dumps(self.to_dict(span_), ensure_ascii=False, default=str) + '\n')
+        return SpanExportResult.SUCCESS
+
+    @staticmethod
+    def to_dict(span_) -> dict:
+        return {
+            'trace_id': trace.format_trace_id(span_.context.trace_id),
+            'span_id': trace.format_span_id(span_.context.span_id),
+            'parent_span_id': trace.format_span_id(span_.parent.span_id) if span_.parent else None,
+            'name': span_.name,
+            'start_time_ns': span_.start_time,
+            'end_time_ns': span_.end_time,
+            'duration_ms': round((span_.end_time - span_.start_time) / 1e6, 3),
+            'attributes': dict(span_.attributes),
+            'error': span_.status.description if span_.status.status_code is StatusCode.ERROR else None,
+            'service': span_.resource.attributes.get('service.name'),
+        }
+
+    def shutdown(self) -> None:
+        pass
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
+
+
+def build_exporter():
+    """Экспортер по настройке TRACING['EXPORTER']: otlp - коллектор по OTLP/HTTP, file - JSON Lines"""
+    config = get_config()
+    if config['EXPORTER'] == 'otlp':
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        return OTLPSpanExporter(endpoint=config['OTLP_ENDPOINT'].rstrip('/') + '/v1/traces')
+    return FileSpanExporter(config['FILE'])
+
+
+def build_provider(span_processor=None):
+    """
+    TracerProvider SDK по TRACING: имя сервиса, сэмплирование, пакетный экспорт
+
+    SDK импортируется только при включенной трассировке - веб-процесс без
+    нее не платит за импорт. Пакетный процессор SDK сам перезапускает поток
+    экспорта после fork (prefork Celery, gunicorn).
+    """
+    from opentelemetry.sdk.resources import SERVICE_NAME, Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    config = get_config()
+    provider = TracerProvider(
+        resource=Resource.create({SERVICE_NAME: config['SERVICE_NAME']}),
+        sampler=ParentBased(TraceIdRatioBased(config['SAMPLE_RATE'])),
+    )
+    if span_processor is None:
+        span_processor = BatchSpanProcessor(build_exporter(), schedule_delay_millis=config['FLUSH_INTERVAL'] * 1000)
+    provider.add_span_processor(span_processor)
+    return provider
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_tracer():
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = build_provider()
+    return _provider.get_tracer('backend.tracing')
+
+
+def reset_provider() -> None:
+    """Выгрузить спаны и сбросить провайдер (после изменения TRACING)"""
+    global _provider
+    if _provider is not None:
+        _provider.shutdown()
+    _provider = None
@@ -2,10 +2,12 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from .api import api
+from .metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/', api.urls, name='api')
+    path('api/', api.urls, name='api'),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 
@@ -0,0 +1,7 @@
+"""
+Нагрузочные тесты и бенчмарки сервиса выплат
+
+Запуск - через management-команды с настройками benchmarks.settings:
+    python manage.py seed_payouts 1000000 --settings=benchmarks.settings
+    python manage.py bench_api --settings=benchmarks.settings --output result.json
+"""
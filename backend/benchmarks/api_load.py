@@ -0,0 +1,106 @@
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from api_payouts.services.gateway_services.http_connection_pool import HttpConnectionPool
+
+from .fixtures import RECIPIENT_DETAILS
+from .stats import summarize
+
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+
+@dataclass
+class Endpoint:
+    """Эндпоинт под нагрузкой: метод, генератор пути и тела запроса"""
+    name: str
+    method: str
+    make_path: Callable[[random.Random], str]
+    make_body: Optional[Callable[[random.Random], bytes]] = None
+
+
+def build_endpoints(payout_ids: List[str], max_page: int = 100) -> Dict[str, Endpoint]:
+    """Горячие эндпоинты API выплат"""
+    def create_body(rng):
+        return json.dumps({
+            'amount': f'{rng.randint(100, 100_000) / 100:.2f}',
+            'currency': rng.choice(['RUB', 'USD', 'EUR']),
+            'description': 'benchmark',
+            'recipient_details': RECIPIENT_DETAILS,
+        }).encode()
+
+    return {
+        'list_payouts': Endpoint(
+            'list_payouts', 'GET', lambda rng: f'/api/payouts/?page={rng.randint(1, max_page)}',
+        ),
+        'get_payout': Endpoint(
+            'get_payout', 'GET', lambda rng: f'/api/payouts/{rng.choice(payout_ids)}/',
+        ),
+        'create_payout': Endpoint(
+            'create_payout', 'POST', lambda rng: '/api/payouts/', create_body,
+        ),
+    }
+
+
+def run_endpoint(base_url: str, endpoint: Endpoint, concurrency: int = 8, duration: float = 10.0,
+                 requests: Optional[int] = None, warmup: int = 20, seed: int = 0) -> Dict[str, float]:
+    """
+    Нагрузить эндпоинт concurrency клиентами
+
+    Каждый клиент - поток с keep-alive соединением из общего пула; нагрузка
+    идет duration секунд или до requests запросов. Возвращает сводку stats.summarize.
+    """
+    pool = HttpConnectionPool(base_url, max_size=concurrency, read_timeout=30.0)
+    rng = random.Random(seed)
+    for _ in range(warmup):
+        _send(pool, endpoint, rng)
+
+    latencies: List[float] = []
+    errors = [0]
+    issued = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client(index):
+        client_rng = random.Random(seed + index + 1)
+        local_latencies, local_errors = [], 0
+        while time.monotonic() < deadline:
+            if requests is not None:
+                with lock:
+                    if issued[0] >= requests:
+                        break
+                    issued[0] += 1
+
+            start = time.perf_counter()
+            ok = _send(pool, endpoint, client_rng)
+            if ok:
+                local_latencies.append(time.perf_counter() - start)
+            else:
+                local_errors += 1
+
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    pool.close()
+
+    return summarize(latencies, errors[0], elapsed)
+
+
+def _send(pool: HttpConnectionPool, endpoint: Endpoint, rng: random.Random) -> bool:
+    body = endpoint.make_body(rng) if endpoint.make_body else None
+    try:
+        status, _ = pool.request(endpoint.method, endpoint.make_path(rng), body=body, headers=JSON_HEADERS)
+    except (OSError, TimeoutError):
+        return False
+    return status < 400
@@ -0,0 +1,114 @@
+import logging
+import random
+import time
+import uuid
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from django.db import connection, transaction
+
+from api_payouts.models import Currency, Payout, Status
+from backend.db_router import shard_aliases
+
+logger = logging.getLogger(__name__)
+
+RECIPIENT_DETAILS = {
+    "card_number": "5555555555554444",
+    "card_holder": "Ivanov Ivan",
+    "expiry_date": "12/25",
+}
+
+# ID подряд по индексу от одной случайной точки в sample_uuids
+SAMPLE_RUN = 10
+
+# Распределение статусов, близкое к рабочему: большая часть выплат завершена
+STATUS_WEIGHTS = {
+    Status.COMPLETED: 80,
+    Status.PENDING: 8,
+    Status.PROCESSING: 4,
+    Status.FAILED: 6,
+    Status.CANCELLED: 2,
+}
+
+
+def build_payouts(count: int, rng: random.Random, recipient_details: Dict = RECIPIENT_DETAILS):
+    """Несохраненные выплаты со случайной суммой, валютой и статусом"""
+    currencies = list(Currency.values)
+    statuses = rng.choices(list(STATUS_WEIGHTS), weights=list(STATUS_WEIGHTS.values()), k=count)
+    return [
+        Payout(
+            amount=Decimal(rng.randint(100, 10_000_000)) / 100,
+            currency=rng.choice(currencies),
+            recipient_details=recipient_details,
+            status=status,
+            description='benchmark',
+        )
+        for status in statuses
+    ]
+
+
+def seed_payouts(count: int, batch_size: int = 10_000, seed: int = 0,
+                 recipient_details: Dict = RECIPIENT_DETAILS) -> float:
+    """
+    Быстрое наполнение таблиц выплат и реквизитов получателей через bulk_create
+
+    Вставка идет пачками внутри одной транзакции; для sqlite на время
+    вставки отключается синхронная запись на диск. Возвращает время в секундах.
+    """
+    rng = random.Random(seed)
+    start = time.perf_counter()
+
+    if connection.vendor == 'sqlite' and not connection.in_atomic_block:
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous = OFF')
+            cursor.execute('PRAGMA journal_mode = WAL')
+
+    with transaction.atomic():
+        created = 0
+        while created < count:
+            size = min(batch_size, count - created)
+            Payout.objects.bulk_create(build_payouts(size, rng, recipient_details), batch_size=size)
+            created += size
+            if created % (batch_size * 10) == 0:
+                logger.info("Создано %s из %s выплат", created, count)
+
+    elapsed = time.perf_counter() - start
+    logger.info("Создано %s выплат за %.1f с", count, elapsed)
+    return elapsed
+
+
+def sample_uuids(querysets: List, limit: int, seed: Optional[int] = None) -> List[uuid.UUID]:
+    """
+    Случайная выборка UUID из выборок querysets (values_list первичного ключа)
+
+    Без ORDER BY RANDOM() - полной сортировки таблицы: от случайной точки
+    между наименьшим и наибольшим ID берутся SAMPLE_RUN следующих ID по
+    индексу первичного ключа, около limit / SAMPLE_RUN коротких запросов.
+    Таблица не больше limit строк возвращается целиком.
+    """
+    rng = random.Random(seed)
+    querysets = [queryset.order_by('pk') for queryset in querysets]
+    heads = [list(queryset[:limit + 1]) for queryset in querysets]
+    if sum(len(head) for head in heads) <= limit:
+        ids = [pk for head in heads for pk in head]
+        rng.shuffle(ids)
+        return ids
+
+    ranges = [(queryset, head[0].int, queryset.last().int) for queryset, head in zip(querysets, heads) if head]
+    ids = set()
+    for _ in range(limit):
+        queryset, low, high = rng.choice(ranges)
+        start = uuid.UUID(int=rng.randint(low, high))
+        ids.update(queryset.filter(pk__gte=start)[:SAMPLE_RUN])
+        if len(ids) >= limit:
+            break
+    ids = sorted(ids)
+    rng.shuffle(ids)
+    return ids[:limit]
+
+
+def sample_payout_ids(limit: int = 1000, seed: Optional[int] = None, using: Optional[str] = None) -> List[str]:
+    """Случайная выборка ID существующих выплат для запросов к get_payout (по всем БД выплат или using)"""
+    aliases = [using] if using else shard_aliases()
+    querysets = [Payout.objects.using(alias).values_list('id', flat=True) for alias in aliases]
+    return [str(pk) for pk in sample_uuids(querysets, limit, seed)]
@@ -0,0 +1,80 @@
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List
+
+from django.conf import settings
+
+# Что импортирует процесс до готовности к работе
+TARGETS = {
+    'settings': 'import django; django.setup()',
+    'web': (
+        'from backend.wsgi import application; '
+        'from django.urls import get_resolver; get_resolver().url_patterns'
+    ),
+    'worker': 'import django; django.setup(); import api_payouts.tasks',
+}
+
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$')
+
+
+@dataclass
+class ImportEntry:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+    @property
+    def package(self) -> str:
+        return self.module.split('.')[0]
+
+
+def parse_importtime(output: str) -> List[ImportEntry]:
+    """Строки вывода python -X importtime: собственное и суммарное время импорта модулей"""
+    entries = []
+    for line in output.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append(ImportEntry(module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return entries
+
+
+def measure_imports(target: str) -> List[ImportEntry]:
+    """Импорты цели target в чистом процессе интерпретатора"""
+    env = {**os.environ}
+    env.setdefault('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', TARGETS[target]],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, timeout=120,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Импорт цели {target} завершился с кодом {result.returncode}: {result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def summarize_imports(entries: List[ImportEntry], top: int = 20) -> Dict:
+    """Итог: общее время, самые тяжелые модули (по суммарному времени) и пакеты (по собственному)"""
+    packages = defaultdict(int)
+    for entry in entries:
+        packages[entry.package] += entry.self_us
+
+    heaviest = sorted((entry for entry in entries if entry.depth == 0),
+                      key=lambda entry: entry.cumulative_us, reverse=True)
+    return {
+        'total_ms': round(sum(entry.self_us for entry in entries) / 1000, 1),
+        'modules': len(entries),
+        'top_modules': [
+            {'module': entry.module, 'cumulative_ms': round(entry.cumulative_us / 1000, 1)}
+            for entry in heaviest[:top]
+        ],
+        'top_packages': [
+            {'package': package, 'self_ms': round(self_us / 1000, 1)}
+            for package, self_us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+        ],
+        'imported': sorted(packages),
+    }
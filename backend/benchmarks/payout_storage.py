@@ -0,0 +1,169 @@
+import random
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from django.db import connection
+from django.db.utils import DatabaseError
+from django.utils import timezone
+
+from api_payouts.models import Payout, PayoutRecipient, Status
+
+from .fixtures import RECIPIENT_DETAILS, sample_payout_ids
+from .stats import summarize
+
+SPLIT_TABLE = 'bench_payout_split'
+INLINE_TABLE = 'bench_payout_inline'
+OPERATIONS = ('status_update', 'list_page', 'detail')
+
+
+def padded_recipient_details(extra_bytes: int) -> Dict:
+    """Реквизиты с полем address на extra_bytes символов - получатель с адресом и данными KYC"""
+    if not extra_bytes:
+        return RECIPIENT_DETAILS
+    return {**RECIPIENT_DETAILS, 'address': 'x' * extra_bytes}
+
+
+class StorageLayouts:
+    """
+    Две раскладки одних и тех же выплат в текущей БД на время замера
+
+    split - копия таблицы выплат без реквизитов (реквизиты - в PayoutRecipient),
+    inline - копия с колонкой recipient_details, как до выноса реквизитов.
+    У копий одинаковые индексы; рабочие таблицы не изменяются.
+    """
+
+    def __init__(self):
+        self.quote = connection.ops.quote_name
+        self.payout_table = self.quote(Payout._meta.db_table)
+        self.recipient_table = self.quote(PayoutRecipient._meta.db_table)
+        # Старая колонка реквизитов (двойная запись до ее удаления) в раскладки не входит
+        self.fields = [field for field in Payout._meta.concrete_fields if field.name != 'legacy_recipient_details']
+        self.columns = ', '.join(self.quote(field.column) for field in self.fields)
+
+    def __enter__(self) -> 'StorageLayouts':
+        self.drop()
+        with connection.cursor() as cursor:
+            cursor.execute(f'CREATE TABLE {SPLIT_TABLE} AS SELECT {self.columns} FROM {self.payout_table}')
+            cursor.execute(
+                f'CREATE TABLE {INLINE_TABLE} AS SELECT {self._prefixed("p")}, r.details AS recipient_details '
+                f'FROM {self.payout_table} p JOIN {self.recipient_table} r ON r.payout_id = p.id'
+            )
+            for table in (SPLIT_TABLE, INLINE_TABLE):
+                cursor.execute(f'CREATE UNIQUE INDEX {table}_id ON {table} (id)')
+                cursor.execute(f'CREATE INDEX {table}_created_at ON {table} (created_at)')
+                cursor.execute(f'ANALYZE {table}')
+        return self
+
+    def __exit__(self, *exc_info):
+        self.drop()
+
+    @staticmethod
+    def drop():
+        with connection.cursor() as cursor:
+            for table in (SPLIT_TABLE, INLINE_TABLE):
+                cursor.execute(f'DROP TABLE IF EXISTS {table}')
+
+    def _prefixed(self, alias: str) -> str:
+        return ', '.join(f'{alias}.{self.quote(field.column)}' for field in self.fields)
+
+    def sample_ids(self, limit: int) -> List:
+        """
+        Случайные ID для запросов к копиям - в формате колонки id БД
+
+        Копии содержат те же ID, что и таблица выплат этой БД: выборка идет
+        по ее индексу первичного ключа (sample_payout_ids), без ORDER BY RANDOM().
+        """
+        pk = Payout._meta.pk
+        return [pk.get_db_prep_value(uuid.UUID(payout_id), connection)
+                for payout_id in sample_payout_ids(limit, using=connection.alias)]
+
+    def queries(self, layout: str) -> Dict[str, str]:
+        """SQL операций раскладки: смена статуса, страница списка, выплата по ID с реквизитами"""
+        if layout == 'inline':
+            table, details_column, join = INLINE_TABLE, 'p.recipient_details', ''
+        else:
+            table, details_column = SPLIT_TABLE, 'r.details'
+            join = f' LEFT JOIN {self.recipient_table} r ON r.payout_id = p.id'
+        return {
+            'status_update': f'UPDATE {table} SET status = %s, updated_at = %s WHERE id = %s',
+            # Список читает все колонки строки - как ORM без only()
+            'list_page': f'SELECT * FROM {table} ORDER BY created_at DESC LIMIT %s OFFSET %s',
+            'detail': f'SELECT {self._prefixed("p")}, {details_column} FROM {table} p{join} WHERE p.id = %s',
+        }
+
+
+def table_bytes(table: str) -> Optional[int]:
+    """Размер таблицы с индексами; None, если БД его не сообщает (sqlite без dbstat)"""
+    with connection.cursor() as cursor:
+        try:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT pg_total_relation_size(%s)', [table])
+            else:
+                cursor.execute('SELECT SUM(pgsize) FROM dbstat WHERE name = %s OR tbl_name = %s', [table, table])
+        except DatabaseError:
+            return None
+        return cursor.fetchone()[0]
+
+
+def _timed(run: Callable[[random.Random], None], samples: int, rng: random.Random) -> Dict:
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(samples):
+        begin = time.perf_counter()
+        run(rng)
+        latencies.append(time.perf_counter() - begin)
+    return summarize(latencies, errors=0, elapsed=time.perf_counter() - started)
+
+
+def measure_layout(layouts: StorageLayouts, layout: str, payout_ids: List, samples: int,
+                   page_size: int, max_page: int, seed: int = 0) -> Dict:
+    """Задержка операций раскладки (каждая смена статуса - отдельная транзакция)"""
+    sql = layouts.queries(layout)
+    statuses = [Status.PROCESSING, Status.PENDING]
+
+    def status_update(rng):
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        with connection.cursor() as cursor:
+            cursor.execute(sql['status_update'], [rng.choice(statuses), now, rng.choice(payout_ids)])
+
+    def list_page(rng):
+        with connection.cursor() as cursor:
+            cursor.execute(sql['list_page'], [page_size, rng.randrange(max_page) * page_size])
+            cursor.fetchall()
+
+    def detail(rng):
+        with connection.cursor() as cursor:
+            cursor.execute(sql['detail'], [rng.choice(payout_ids)])
+            cursor.fetchone()
+
+    operations = {'status_update': status_update, 'list_page': list_page, 'detail': detail}
+    report = {name: _timed(operations[name], samples, random.Random(seed)) for name in OPERATIONS}
+    table = INLINE_TABLE if layout == 'inline' else SPLIT_TABLE
+    report['table_bytes'] = table_bytes(table)
+    return report
+
+
+def storage_report(samples: int = 2000, page_size: int = 10, max_page: int = 100, seed: int = 0) -> Dict:
+    """
+    Реквизиты в строке выплаты (inline) против отдельной таблицы (split)
+
+    Замеры на копиях текущих выплат. split_to_inline - отношение средней
+    задержки split к inline (меньше 1 - выигрыш отдельной таблицы). Для
+    split таблица выплат без реквизитов, detail - с JOIN реквизитов.
+    """
+    with StorageLayouts() as layouts:
+        payout_ids = layouts.sample_ids(limit=1000)
+        if not payout_ids:
+            return {}
+        report = {
+            layout: measure_layout(layouts, layout, payout_ids, samples, page_size, max_page, seed)
+            for layout in ('inline', 'split')
+        }
+
+    report['split_to_inline'] = {
+        name: round(report['split'][name]['mean_ms'] / report['inline'][name]['mean_ms'], 2)
+        if report['inline'][name]['mean_ms'] else None
+        for name in OPERATIONS
+    }
+    return report
@@ -0,0 +1,132 @@
+import uuid
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+from unittest.mock import patch
+
+from django.db import transaction
+from django.test import override_settings
+
+from api_payouts.models import Currency, Payout
+from api_payouts.tasks import payout_task
+from api_payouts.services.celery_services.task_results import RESULT_MODES
+
+from .fixtures import RECIPIENT_DETAILS
+
+KEY_PREFIX = 'celery-task-meta-'
+# Накладные расходы Redis на строковый ключ с TTL (dictEntry, объекты, запись в expires, заголовки sds),
+# без округления аллокатора - оценка для режима без сервера
+REDIS_KEY_OVERHEAD = 90
+MILLION = 1_000_000
+
+
+class RecordingBackend:
+    """Бэкенд результатов, который не пишет в Redis, а запоминает закодированные значения"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.writes: List[Tuple[str, str, bytes]] = []
+
+    def store_result(self, task_id, result, state, traceback=None, request=None, **kwargs):
+        meta = self.backend._get_result_meta(result=result, state=state, traceback=traceback, request=request)
+        meta['task_id'] = task_id
+        value = self.backend.encode(meta)
+        self.writes.append((task_id, state, value.encode() if isinstance(value, str) else value))
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+
+class _Request:
+    """Минимальный контекст задачи для метаданных результата"""
+
+    def __init__(self, task_id):
+        self.id = task_id
+        self.task = payout_task.name
+        self.args = []
+        self.kwargs = {}
+        self.hostname = 'report@localhost'
+        self.retries = 0
+        self.delivery_info = {}
+        self.ignore_result = False
+
+
+def record_payout_writes(mode: str) -> List[Tuple[str, str, bytes]]:
+    """
+    Записи в бэкенд результатов за обработку одной выплаты в режиме mode
+
+    Выплата создается и обрабатывается в транзакции, которая откатывается.
+    STARTED (task_track_started) и итоговый SUCCESS добавляются так, как их пишет воркер.
+    """
+    task = payout_task._get_current_object()
+    recorder = RecordingBackend(task.backend)
+    task_id = str(uuid.uuid4())
+    with override_settings(PAYOUT_TASK_RESULTS={'MODE': mode, 'ERROR_MAX_LENGTH': 200}), \
+            patch.object(type(task), 'backend', recorder):
+        with transaction.atomic():
+            payout = Payout.objects.create(amount=Decimal('1234.56'), currency=Currency.RUB,
+                                           recipient_details=RECIPIENT_DETAILS, description='report')
+            if mode == 'verbose':
+                recorder.store_result(task_id, {'pid': 1, 'hostname': 'report@localhost'}, 'STARTED',
+                                      request=_Request(task_id))
+            result = payout_task.apply(args=[str(payout.id)], task_id=task_id).get()
+            recorder.store_result(task_id, result, 'SUCCESS', request=_Request(task_id))
+            transaction.set_rollback(True)
+    return recorder.writes
+
+
+def measure_redis(redis_client, writes, samples: int, ttl: int) -> float:
+    """Средний MEMORY USAGE итогового ключа по samples копиям (ключи удаляются)"""
+    _, _, value = writes[-1]
+    keys = [f'{KEY_PREFIX}{uuid.uuid4()}' for _ in range(samples)]
+    pipe = redis_client.pipeline()
+    for key in keys:
+        pipe.set(key, value, ex=ttl)
+    pipe.execute()
+    try:
+        pipe = redis_client.pipeline()
+        for key in keys:
+            pipe.memory_usage(key, samples=0)
+        return sum(pipe.execute()) / samples
+    finally:
+        redis_client.delete(*keys)
+
+
+def memory_report(ttl_by_mode: Dict[str, int], rate: float, redis_client=None, samples: int = 1000) -> Dict:
+    """
+    Память бэкенда результатов на выплату и на миллион выплат по режимам
+
+    Без TTL ключи копятся: память растет с числом выплат (per_million_mb).
+    С TTL в Redis живут только результаты за последние TTL секунд:
+    steady_state_mb - при потоке rate выплат в секунду.
+    """
+    report = {}
+    for mode in RESULT_MODES:
+        writes = record_payout_writes(mode)
+        task_id, _, value = writes[-1]
+        if redis_client is not None:
+            key_bytes = measure_redis(redis_client, writes, samples, ttl_by_mode[mode])
+            source = 'redis'
+        else:
+            key_bytes = len(KEY_PREFIX) + len(task_id) + len(value) + REDIS_KEY_OVERHEAD
+            source = 'estimate'
+
+        ttl = ttl_by_mode[mode]
+        report[mode] = {
+            'writes_per_payout': len(writes),
+            'states': [state for _, state, _ in writes],
+            'bytes_written_per_payout': sum(len(item) for _, _, item in writes),
+            'value_bytes': len(value),
+            'key_bytes': round(key_bytes, 1),
+            'memory_source': source,
+            'per_million_mb': round(key_bytes * MILLION / 2 ** 20, 1),
+            'ttl_seconds': ttl,
+            'steady_state_mb': round(key_bytes * rate * ttl / 2 ** 20, 1),
+            'sample_value': value.decode(),
+        }
+    return report
+
+
+def format_ratio(report: Dict, key: str) -> Optional[float]:
+    verbose, compact = report['verbose'][key], report['compact'][key]
+    return round(verbose / compact, 1) if compact else None
@@ -0,0 +1,148 @@
+import base64
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.utils import timezone
+from kombu import Connection, Producer
+from kombu.compression import decompress
+from kombu.serialization import dumps, loads, prepare_accept_content
+from kombu.utils import json
+
+from api_payouts.services.celery_services.payout_queue_router import PAYOUT_TASK_NAME
+from api_payouts.services.celery_services.retry_policy import history_kwargsrepr
+from api_payouts.services.celery_services.task_results import RESULT_MODES
+
+ACCEPT = prepare_accept_content(['json', 'msgpack'])
+SERIALIZERS = ('json', 'msgpack')
+FORMATS = ('json', 'msgpack', 'json+zlib', 'msgpack+zlib')
+QUEUE = 'payouts.default'
+
+
+def parse_format(name: str) -> Tuple[str, Optional[str]]:
+    """'msgpack+zlib' -> ('msgpack', 'zlib')"""
+    serializer, _, compression = name.partition('+')
+    return serializer, compression or None
+
+
+def retry_history(retries: int) -> List[Dict]:
+    """История ошибок, которую задача накапливает в kwargs к попытке retries + 1"""
+    return [
+        {
+            'attempt': attempt,
+            'error_class': 'ConnectionError',
+            'error': 'HTTPConnectionPool(host=gateway, port=443): Read timed out. (read timeout=10)',
+            'at': timezone.now().isoformat(),
+        }
+        for attempt in range(1, retries + 1)
+    ]
+
+
+class BrokerCodec:
+    """
+    Кодирование задачи выплаты так, как ее кладет в Redis kombu
+
+    Тело сериализуется и сжимается Producer, виртуальный транспорт
+    кодирует его в base64 и вместе с заголовками пишет в список JSON-конвертом.
+    Декодирование повторяет путь воркера: конверт, base64, распаковка, десериализация.
+    """
+
+    def __init__(self):
+        self.connection = Connection('memory://')
+        self.channel = self.connection.default_channel
+        self.producer = Producer(self.channel, auto_declare=False)
+
+    def close(self):
+        self.connection.release()
+
+    @staticmethod
+    def task_message(payout_id: str, history: List[Dict]):
+        from backend.celery import app
+
+        return app.amqp.create_task_message(
+            str(uuid.uuid4()), PAYOUT_TASK_NAME, args=[payout_id], kwargs={'history': history}, countdown=1,
+            kwargsrepr=history_kwargsrepr(history) if history else None,
+        )
+
+    def encode(self, message, serializer: str, compression: Optional[str]) -> Tuple[bytes, int]:
+        """Строка в списке Redis и размер тела после сериализации и сжатия"""
+        headers = dict(message.headers)
+        body, content_type, content_encoding = self.producer._prepare(
+            message.body, serializer, None, None, compression, headers,
+        )
+        envelope = self.channel.prepare_message(
+            body, 0, content_type, content_encoding, headers, dict(message.properties, delivery_mode=2),
+        )
+        self.channel._inplace_augment_message(envelope, '', QUEUE)
+        return json.dumps(envelope).encode(), len(body)
+
+    @staticmethod
+    def decode(raw: bytes):
+        envelope = json.loads(raw)
+        body = base64.b64decode(envelope['body'])
+        compression = envelope['headers'].get('compression')
+        if compression:
+            body = decompress(body, compression)
+        return loads(body, envelope['content-type'], envelope['content-encoding'], accept=ACCEPT)
+
+
+def _per_call_us(func, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return round((time.perf_counter() - started) / iterations * 1_000_000, 2)
+
+
+def measure_message(codec: BrokerCodec, message, name: str, iterations: int) -> Dict:
+    serializer, compression = parse_format(name)
+    raw, body_bytes = codec.encode(message, serializer, compression)
+    return {
+        'body_bytes': body_bytes,
+        'broker_bytes': len(raw),
+        'encode_us': _per_call_us(lambda: codec.encode(message, serializer, compression), iterations),
+        'decode_us': _per_call_us(lambda: codec.decode(raw), iterations),
+    }
+
+
+def result_sizes() -> Dict:
+    """Размер итогового результата payout_task в бэкенде по режиму и сериализатору"""
+    from .result_memory import record_payout_writes
+
+    report = {}
+    for mode in RESULT_MODES:
+        _, _, value = record_payout_writes(mode)[-1]
+        meta = loads(value, 'application/json', 'utf-8', accept=ACCEPT)
+        report[mode] = {serializer: len(dumps(meta, serializer=serializer)[2]) for serializer in SERIALIZERS}
+    return report
+
+
+def serialization_report(formats: Iterable[str] = FORMATS, iterations: int = 5000, retries: int = 3,
+                         include_results: bool = True) -> Dict:
+    """
+    Байты в брокере и время кодирования/декодирования задачи выплаты по форматам
+
+    first_attempt - первая постановка, retry - задача с историей retries ошибок.
+    vs_json - отношение к json без сжатия (меньше 1 - выигрыш).
+    """
+    formats = list(formats)
+    payout_id = str(uuid.uuid4())
+    codec = BrokerCodec()
+    report = {'messages': {}}
+    try:
+        for scenario, history in (('first_attempt', []), ('retry', retry_history(retries))):
+            message = codec.task_message(payout_id, history)
+            rows = {name: measure_message(codec, message, name, iterations) for name in formats}
+            baseline = rows.get('json') or measure_message(codec, message, 'json', iterations)
+            for row in rows.values():
+                row['vs_json'] = {
+                    key: round(row[key] / baseline[key], 2) if baseline[key] else None
+                    for key in ('broker_bytes', 'encode_us', 'decode_us')
+                }
+            report['messages'][scenario] = rows
+    finally:
+        codec.close()
+
+    if include_results:
+        report['results'] = result_sizes()
+    report['meta'] = {'iterations': iterations, 'retries': retries}
+    return report
@@ -0,0 +1,92 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+
+APPLICATIONS = {
+    'wsgi': 'backend.wsgi:application',
+    'asgi': 'backend.asgi:application',
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class LocalServer:
+    """
+    Локальный gunicorn для нагрузочного теста
+
+    kind='wsgi' - синхронные воркеры (threads > 1 - gthread),
+    kind='asgi' - воркеры uvicorn (нужен пакет uvicorn).
+    Брокер Celery в процессе сервера - в памяти, чтобы create_payout не зависел от Redis.
+    """
+
+    def __init__(self, kind: str = 'wsgi', workers: int = 4, threads: int = 1, port: int = 0,
+                 startup_timeout: float = 30.0):
+        self.kind = kind
+        self.workers = workers
+        self.threads = threads
+        self.port = port or free_port()
+        self.startup_timeout = startup_timeout
+        self.process = None
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.port}'
+
+    def command(self):
+        command = [
+            sys.executable, '-m', 'gunicorn', APPLICATIONS[self.kind],
+            '-c', str(settings.BASE_DIR / 'gunicorn.conf.py'),
+            '-b', f'127.0.0.1:{self.port}',
+            '-w', str(self.workers),
+            '--log-level', 'warning',
+        ]
+        if self.kind == 'asgi':
+            command += ['-k', 'uvicorn.workers.UvicornWorker']
+        elif self.threads > 1:
+            command += ['--threads', str(self.threads)]
+        return command
+
+    def start(self):
+        env = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE,
+            'CELERY_BROKER_URL': 'memory://',
+            'CELERY_RESULT_BACKEND': 'cache+memory://',
+        }
+        self.process = subprocess.Popen(self.command(), cwd=settings.BASE_DIR, env=env)
+
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"gunicorn завершился с кодом {self.process.returncode}")
+            try:
+                with socket.create_connection(('127.0.0.1', self.port), timeout=0.5):
+                    return self
+            except OSError:
+                time.sleep(0.2)
+
+        self.stop()
+        raise RuntimeError(f"gunicorn не запустился за {self.startup_timeout} с")
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
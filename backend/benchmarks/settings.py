@@ -0,0 +1,49 @@
+from backend.settings import *  # noqa: F401,F403
+
+# Отдельная БД для бенчмарков: sqlite-файл или локальный Postgres (BENCHMARK_DB=postgres)
+if env('BENCHMARK_DB', default='sqlite') == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': env('POSTGRES_DB', default='payouts_benchmark'),
+            'USER': env('POSTGRES_USER', default='postgres'),
+            'PASSWORD': env('POSTGRES_PASSWORD', default=''),
+            'HOST': env('POSTGRES_HOST', default='localhost'),
+            'PORT': env('POSTGRES_PORT', default='5432'),
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': env('BENCHMARK_SQLITE_PATH', default=str(BASE_DIR / 'benchmark.sqlite3')),
+            'OPTIONS': {'timeout': 30},
+        }
+    }
+
+DEBUG = False
+ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
+
+# Бенчмарк не должен зависеть от Redis: кэш в памяти процесса
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+PAYOUT_RATE_LIMIT = {**PAYOUT_RATE_LIMIT, 'ENABLED': False}
+
+# Бюджеты запросов проверяются тестами, под нагрузкой оставляем только Server-Timing
+QUERY_BUDGETS = {**QUERY_BUDGETS, 'MODE': 'off'}
+
+LOGGING['loggers']['django']['level'] = 'WARNING'
+
+# Файловый транспорт kombu: брокер без сервера, общий для процессов воркера (bench_worker)
+if env('BENCHMARK_BROKER_DIR', default=''):
+    CELERY_BROKER_TRANSPORT_OPTIONS = {
+        'data_folder_in': env('BENCHMARK_BROKER_DIR'),
+        'data_folder_out': env('BENCHMARK_BROKER_DIR'),
+        'control_folder': env('BENCHMARK_BROKER_DIR'),
+        # Транспорт опрашивает каталог; по умолчанию раз в секунду, что занижает пропускную способность
+        'polling_interval': 0.01,
+    }
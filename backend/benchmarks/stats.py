@@ -0,0 +1,27 @@
+import math
+from typing import Dict, List
+
+
+def percentile(sorted_values: List[float], percent: float) -> float:
+    """Перцентиль по отсортированным значениям (метод nearest-rank)"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(percent / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, float]:
+    """Сводка по эндпоинту: запросы в секунду и перцентили задержки в миллисекундах"""
+    values = sorted(latencies)
+    total = len(values) + errors
+    return {
+        'requests': total,
+        'errors': errors,
+        'duration_s': round(elapsed, 3),
+        'rps': round(total / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(values, 50) * 1000, 2),
+        'p95_ms': round(percentile(values, 95) * 1000, 2),
+        'p99_ms': round(percentile(values, 99) * 1000, 2),
+        'mean_ms': round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+        'max_ms': round(values[-1] * 1000, 2) if values else 0.0,
+    }
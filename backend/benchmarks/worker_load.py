@@ -0,0 +1,198 @@
+import glob
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+from django.conf import settings
+
+from api_payouts.models import Payout, Status
+from api_payouts.services.celery_services.payout_queue_router import PayoutPriority, PayoutQueueRouter
+from api_payouts.services.gateway_services.stub_gateway_server import StubGatewayServer
+
+from . import worker_probe
+from .fixtures import build_payouts
+
+POOLS = ('solo', 'prefork', 'threads', 'gevent', 'eventlet')
+GREEN_POOLS = ('gevent', 'eventlet')
+FINAL_STATUSES = (Status.COMPLETED, Status.FAILED)
+
+
+def pool_available(pool: str) -> bool:
+    """Зеленые пулы требуют установленного gevent/eventlet"""
+    if pool not in GREEN_POOLS:
+        return True
+    try:
+        __import__(pool)
+    except ImportError:
+        return False
+    return True
+
+
+class WorkerBenchmark:
+    """
+    Пропускная способность payout_task под разными пулами воркера
+
+    Создает N выплат, ставит задачи в очередь и запускает отдельный процесс
+    `celery worker` с пулом pool. Брокер - Redis (broker='redis://...') или
+    файловый транспорт kombu (broker='filesystem'), которому не нужен сервер.
+    Счетчики обращений к брокеру, бэкенду результатов и БД собирает worker_probe.
+    """
+
+    def __init__(self, broker: str = 'filesystem', result_backend: Optional[str] = None,
+                 gateway_latency: float = 0.0, prefetch_multiplier: Optional[int] = None, timeout: float = 600.0):
+        self.broker = broker
+        self.result_backend = result_backend
+        self.gateway_latency = gateway_latency
+        self.timeout = timeout
+        # Файловый транспорт работает через синхронный цикл воркера: при исчерпанном prefetch
+        # он ждет до 2 секунд, поэтому без сервера брокера prefetch по умолчанию увеличен
+        if prefetch_multiplier is None:
+            prefetch_multiplier = 64 if broker == 'filesystem' else 1
+        self.prefetch_multiplier = prefetch_multiplier
+        self.queue = PayoutQueueRouter.queue_name(PayoutPriority.DEFAULT)
+
+    def run(self, pool: str, concurrency: int, count: int, seed: int = 0) -> Dict[str, float]:
+        if not pool_available(pool):
+            return {'pool': pool, 'concurrency': concurrency, 'skipped': f'{pool} не установлен'}
+
+        with tempfile.TemporaryDirectory(prefix='payout-bench-') as workdir:
+            env = self._environment(workdir)
+            self._configure_producer(env)
+
+            payouts = build_payouts(count, random.Random(seed))
+            for payout in payouts:
+                payout.status = Status.PENDING
+            Payout.objects.bulk_create(payouts, batch_size=1000)
+            ids = [str(payout.id) for payout in payouts]
+
+            from api_payouts.tasks import payout_task
+            from backend.celery import app
+
+            worker_probe.install(app)
+            worker_probe.reset()
+            message_options = PayoutQueueRouter.message_options(self.queue)
+            with app.connection_for_write() as connection:
+                for payout_id in ids:
+                    payout_task.apply_async(args=[payout_id], queue=self.queue, connection=connection,
+                                            **message_options)
+            producer = worker_probe.snapshot()['counters']
+
+            gateway = None
+            if self.gateway_latency:
+                gateway = StubGatewayServer(latency=self.gateway_latency).start()
+                env['PAYMENT_GATEWAY_CLIENT'] = 'api_payouts.services.gateway_services.HttpGatewayClient'
+                env['PAYMENT_GATEWAY_URL'] = gateway.url
+                env['PAYMENT_GATEWAY_POOL_SIZE'] = str(max(concurrency, 10))
+
+            try:
+                done = self._run_worker(env, pool, concurrency, ids)
+            finally:
+                if gateway is not None:
+                    gateway.stop()
+
+            return self._report(
+                pool, concurrency, self.prefetch_multiplier, count, done, producer, env['BENCHMARK_PROBE_DIR']
+            )
+
+    def _environment(self, workdir: str) -> Dict[str, str]:
+        probe_dir = os.path.join(workdir, 'probe')
+        os.makedirs(probe_dir)
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE, 'BENCHMARK_PROBE_DIR': probe_dir}
+
+        if self.broker == 'filesystem':
+            broker_dir = os.path.join(workdir, 'broker')
+            os.makedirs(broker_dir)
+            env['CELERY_BROKER_URL'] = 'filesystem://'
+            env['BENCHMARK_BROKER_DIR'] = broker_dir
+            env['CELERY_RESULT_BACKEND'] = self.result_backend or f'file://{os.path.join(workdir, "results")}'
+            os.makedirs(os.path.join(workdir, 'results'))
+        else:
+            env['CELERY_BROKER_URL'] = self.broker
+            env['CELERY_RESULT_BACKEND'] = self.result_backend or self.broker
+        return env
+
+    @staticmethod
+    def _configure_producer(env: Dict[str, str]) -> None:
+        """Настроить брокер и бэкенд результатов процесса, ставящего задачи"""
+        from backend.celery import app
+
+        app.conf.broker_url = env['CELERY_BROKER_URL']
+        app.conf.result_backend = env['CELERY_RESULT_BACKEND']
+        if 'BENCHMARK_BROKER_DIR' in env:
+            app.conf.broker_transport_options = {
+                'data_folder_in': env['BENCHMARK_BROKER_DIR'],
+                'data_folder_out': env['BENCHMARK_BROKER_DIR'],
+                'control_folder': env['BENCHMARK_BROKER_DIR'],
+            }
+        else:
+            app.conf.broker_transport_options = {}
+        app._backend = app._get_backend()
+
+    def _run_worker(self, env, pool, concurrency, ids) -> int:
+        command = [
+            sys.executable, '-m', 'celery', '-A', 'backend', 'worker',
+            '--pool', pool, '--concurrency', str(concurrency),
+            '--prefetch-multiplier', str(self.prefetch_multiplier),
+            '-Q', self.queue, '-I', 'benchmarks.worker_probe',
+            '--without-gossip', '--without-mingle', '--without-heartbeat',
+            '--loglevel', os.environ.get('BENCHMARK_WORKER_LOGLEVEL', 'warning'), '-n', f'bench-{pool}@%h',
+        ]
+        process = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+
+        deadline = time.monotonic() + self.timeout
+        done = 0
+        try:
+            while time.monotonic() < deadline and process.poll() is None:
+                done = Payout.objects.filter(id__in=ids, status__in=FINAL_STATUSES).count()
+                if done >= len(ids):
+                    break
+                time.sleep(0.5)
+        finally:
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+                try:
+                    process.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+        return done
+
+    @staticmethod
+    def _report(pool, concurrency, prefetch_multiplier, count, done, producer, probe_dir) -> Dict[str, float]:
+        totals = Counter()
+        started, finished = [], []
+        for path in glob.glob(os.path.join(probe_dir, '*.json')):
+            with open(path) as file:
+                stats = json.load(file)
+            totals.update(stats['counters'])
+            if stats['first_started']:
+                started.append(stats['first_started'])
+            if stats['last_finished']:
+                finished.append(stats['last_finished'])
+
+        elapsed = max(finished) - min(started) if started and finished else 0.0
+        per_payout = max(done, 1)
+        broker = sum(value for key, value in totals.items() if key.startswith('broker_'))
+        broker += producer.get('broker_publish', 0)
+        backend = sum(value for key, value in totals.items() if key.startswith('backend_'))
+
+        return {
+            'pool': pool,
+            'concurrency': concurrency,
+            'prefetch_multiplier': prefetch_multiplier,
+            'payouts': count,
+            'processed': done,
+            'tasks': totals['tasks'],
+            'duration_s': round(elapsed, 3),
+            'payouts_per_second': round(done / elapsed, 1) if elapsed else 0.0,
+            'broker_round_trips_per_payout': round(broker / per_payout, 2),
+            'backend_round_trips_per_payout': round(backend / per_payout, 2),
+            'db_queries_per_payout': round(totals['db_queries'] / per_payout, 2),
+            'operations': dict(totals, producer_publish=producer.get('broker_publish', 0)),
+        }
@@ -0,0 +1,111 @@
+"""
+Счетчики обращений к брокеру, бэкенду результатов и БД в процессе воркера
+
+Подключается к воркеру через `celery worker -I benchmarks.worker_probe`;
+при остановке каждый процесс пишет свои счетчики в BENCHMARK_PROBE_DIR/<pid>.json.
+"""
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+from celery.signals import task_postrun, task_prerun, worker_process_shutdown, worker_shutdown
+
+counters = Counter()
+timestamps = {'first_started': None, 'last_finished': None}
+_lock = threading.Lock()
+_installed = False
+
+# Методы канала kombu: _get/_brpop_read - чтение из очереди (у файлового транспорта - включая пустые опросы)
+BROKER_METHODS = {
+    '_put': 'broker_publish',
+    '_get': 'broker_fetch',
+    '_brpop_read': 'broker_fetch',
+    'basic_ack': 'broker_ack',
+    'basic_reject': 'broker_ack',
+}
+BACKEND_METHODS = ('get', 'mget', 'set', 'delete', 'incr', 'expire')
+
+
+def _count(name):
+    with _lock:
+        counters[name] += 1
+
+
+def _wrap(cls, method, counter):
+    original = getattr(cls, method, None)
+    if original is None or getattr(original, '_probe', False):
+        return
+
+    def wrapper(*args, **kwargs):
+        _count(counter)
+        return original(*args, **kwargs)
+
+    wrapper._probe = True
+    setattr(cls, method, wrapper)
+
+
+def install(app=None):
+    """Обернуть методы канала брокера, бэкенда результатов и курсора БД счетчиками"""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+
+    from django.db.backends.utils import CursorWrapper
+
+    if app is None:
+        from backend.celery import app
+
+    with app.connection_for_write() as connection:
+        channel_class = connection.transport.Channel
+    for method, counter in BROKER_METHODS.items():
+        _wrap(channel_class, method, counter)
+    for method in BACKEND_METHODS:
+        _wrap(type(app.backend), method, f'backend_{method}')
+
+    _wrap(CursorWrapper, 'execute', 'db_queries')
+    _wrap(CursorWrapper, 'executemany', 'db_queries')
+
+
+def reset():
+    with _lock:
+        counters.clear()
+        timestamps.update(first_started=None, last_finished=None)
+
+
+def snapshot():
+    with _lock:
+        return {'pid': os.getpid(), 'counters': dict(counters), **timestamps}
+
+
+@task_prerun.connect
+def _task_started(**kwargs):
+    now = time.time()
+    with _lock:
+        if timestamps['first_started'] is None or now < timestamps['first_started']:
+            timestamps['first_started'] = now
+
+
+@task_postrun.connect
+def _task_finished(**kwargs):
+    now = time.time()
+    with _lock:
+        counters['tasks'] += 1
+        if timestamps['last_finished'] is None or now > timestamps['last_finished']:
+            timestamps['last_finished'] = now
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def _dump(**kwargs):
+    directory = os.environ.get('BENCHMARK_PROBE_DIR')
+    if not directory:
+        return
+    with open(os.path.join(directory, f'{os.getpid()}.json'), 'w') as file:
+        json.dump(snapshot(), file)
+
+
+if os.environ.get('BENCHMARK_PROBE_DIR'):
+    install()
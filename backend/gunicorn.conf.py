@@ -0,0 +1,37 @@
+import os
+
+# Загрузка Django и прогрев (backend.startup.warmup) в мастере до fork: перезапуск
+# и добавление воркеров не повторяют импорт и настройку приложения.
+# GUNICORN_PRELOAD=0 - загрузка в каждом воркере (например, для --reload)
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') not in ('0', 'false', 'False')
+
+
+def when_ready(server):
+    """Прогрев в мастере после предзагрузки приложения"""
+    if server.cfg.preload_app:
+        from backend.startup import warmup
+
+        warmup()
+
+
+def post_worker_init(worker):
+    """Прогрев воркера до первого запроса, если приложение не предзагружено"""
+    if not worker.cfg.preload_app:
+        from backend.startup import warmup
+
+        warmup()
+
+
+def child_exit(server, worker):
+    """Удаление файлов метрик завершившегося воркера (режим PROMETHEUS_MULTIPROC_DIR)"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
+
+
+def post_fork(server, worker):
+    """Пулы соединений с БД, созданные до fork (--preload), воркеру не передаются"""
+    from backend.db_pool import discard_inherited_pools
+
+    discard_inherited_pools()